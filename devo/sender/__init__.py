@@ -1,4 +1,12 @@
 # coding=utf-8
-from .data import Sender, SenderConfigTCP, SenderConfigSSL, DevoSenderException
+from .data import Sender, SenderChannel, SenderConfigTCP, SenderConfigSSL, DevoSenderException
 from .transformsyslog import *
 from .lookup import Lookup
+from .queued import OverflowPolicy, QueuedHandler, QueuedSender
+from .async_data import AsyncSender
+from .pool import PoolSelection, SenderPool
+from .relays import RelaySet
+from .spool import FsyncPolicy, Spool
+from .parallel import ParallelSender
+from .transports import (SenderConfigFile, SenderConfigMemory, SenderConfigNull,
+                         SenderConfigUnix, SenderTransport, Sink)
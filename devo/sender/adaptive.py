@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Runtime tuning of the zip buffer size and the compression level"""
+
+import logging
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LEVEL = 6
+"""Level used by zlib for Z_DEFAULT_COMPRESSION (-1)"""
+
+
+class ZipSample:
+    """Measurements of one zip buffer sent"""
+
+    __slots__ = (
+        "events",
+        "raw_bytes",
+        "zipped_bytes",
+        "fill_time",
+        "compress_time",
+        "write_time",
+        "queue_depth",
+    )
+
+    def __init__(
+        self,
+        events: int,
+        raw_bytes: int,
+        zipped_bytes: int,
+        fill_time: float,
+        compress_time: float,
+        write_time: float,
+        queue_depth: int = 0,
+    ):
+        self.events: int = events
+        self.raw_bytes: int = raw_bytes
+        self.zipped_bytes: int = zipped_bytes
+        self.fill_time: float = fill_time
+        """Seconds from the first event of the buffer until it was sent"""
+        self.compress_time: float = compress_time
+        """Seconds spent compressing the buffer"""
+        self.write_time: float = write_time
+        """Seconds spent writing the buffer to the socket"""
+        self.queue_depth: int = queue_depth
+        """Full buffers waiting to be sent when it was sent"""
+
+
+class ZipAutotuner:
+    """
+    Controller that adjusts the flush threshold and the compression level of
+    a zip buffer from the measurements of the buffers sent.
+
+    Every `window` buffers it compares the latency of the events (time to
+    fill the buffer, compress it and write it) with the target:
+
+    + Over the target, the threshold is reduced so the buffers are sent sooner.
+    + Under half of the target, the threshold is increased: bigger buffers
+      are compressed better and cost less per event.
+
+    And it compares where the time goes:
+
+    + Compression takes much longer than writing, the data is almost not
+      compressible, or full buffers are waiting for the worker: the level
+      is lowered.
+    + Writing takes much longer than compression: the level is raised, so
+      less bytes are written.
+
+    Each decision is logged and kept in `decisions`.
+
+    :param latency_target: Maximum seconds an event should wait in the buffer
+    :param min_length: Minimum flush threshold, in compressed bytes
+    :param max_length: Maximum flush threshold, in compressed bytes
+    :param min_level: Minimum compression level
+    :param max_level: Maximum compression level
+    :param window: Buffers measured before each decision
+    :param inflight: Full buffers that can wait for the worker, when there is one
+
+    >>>con.autotune_zip(latency_target=0.5)
+
+    See Also:
+        Sender
+    """
+
+    def __init__(
+        self,
+        latency_target: float = 1.0,
+        min_length: int = 4096,
+        max_length: int = 4 * 1024 * 1024,
+        min_level: int = 1,
+        max_level: int = 9,
+        window: int = 5,
+        inflight: int = 0,
+    ):
+        if latency_target <= 0 or min_length <= 0 or min_length > max_length:
+            raise ValueError("Wrong autotuning limits")
+        if not 0 <= min_level <= max_level <= 9:
+            raise ValueError("Wrong compression level limits")
+        self.latency_target = latency_target
+        self.min_length = min_length
+        self.max_length = max_length
+        self.min_level = min_level
+        self.max_level = max_level
+        self.window = window
+        self.inflight = inflight
+        self.decisions: deque = deque(maxlen=100)
+        """Last decisions taken, as dicts"""
+        self.__samples: list = []
+
+    def observe(self, sample: ZipSample, length: int, level: int) -> tuple:
+        """
+        Register the measurements of a buffer sent
+
+        :param sample: ZipSample of the buffer
+        :param length: Current flush threshold
+        :param level: Current compression level
+        :return: (length, level) to use from now on
+        """
+        self.__samples.append(sample)
+        if len(self.__samples) < self.window:
+            return length, level
+        samples, self.__samples = self.__samples, []
+
+        count = len(samples)
+        events = sum(sample.events for sample in samples)
+        raw_bytes = sum(sample.raw_bytes for sample in samples) or 1
+        zipped_bytes = sum(sample.zipped_bytes for sample in samples)
+        fill_time = sum(sample.fill_time for sample in samples) / count
+        compress_time = sum(sample.compress_time for sample in samples) / count
+        write_time = sum(sample.write_time for sample in samples) / count
+        queue_depth = max(sample.queue_depth for sample in samples)
+        latency = fill_time
+        ratio = zipped_bytes / raw_bytes
+        if level < 0:
+            level = DEFAULT_LEVEL
+
+        new_length, reasons = length, []
+        if latency > self.latency_target:
+            new_length = max(
+                self.min_length, int(length * max(0.5, self.latency_target / latency))
+            )
+            reasons.append("latency %.3fs over target" % latency)
+        elif latency < self.latency_target / 2:
+            new_length = min(self.max_length, int(length * 1.5))
+            reasons.append("latency %.3fs under half the target" % latency)
+
+        new_level = level
+        backlog = self.inflight and queue_depth >= self.inflight
+        if level > self.min_level and (
+            backlog or ratio > 0.9 or compress_time > 2 * write_time
+        ):
+            new_level = level - 1
+            reasons.append(
+                "buffers waiting for the worker" if backlog
+                else "ratio %.2f, data not compressible" % ratio if ratio > 0.9
+                else "compression %.4fs over writing %.4fs" % (compress_time, write_time)
+            )
+        elif level < self.max_level and write_time > 2 * compress_time and ratio <= 0.9:
+            new_level = level + 1
+            reasons.append("writing %.4fs over compression %.4fs" % (write_time, compress_time))
+        new_level = min(max(new_level, self.min_level), self.max_level)
+
+        if new_length != length or new_level != level:
+            decision = {
+                "length": (length, new_length),
+                "level": (level, new_level),
+                "events_per_second": events / ((fill_time * count) or 1),
+                "ratio": ratio,
+                "latency": latency,
+                "reasons": reasons,
+            }
+            self.decisions.append(decision)
+            log.info(
+                "Devo-ZipAutotuner|length %d -> %d, level %d -> %d (%s)",
+                length, new_length, level, new_level, ", ".join(reasons),
+            )
+        return new_length, new_level
+
+    def reset(self) -> None:
+        """Discard the measurements not yet used"""
+        self.__samples = []
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""Asyncio version of the Sender, to send data to Devo from coroutines
+without blocking the event loop"""
+
+import asyncio
+import time
+from typing import Iterable, Optional
+
+from devo.common import Configuration, get_log, get_stream_handler
+
+from .data import (ERROR_MSGS, DevoSenderException, Sender, SenderBuffer,
+                   SenderConfigSSL, SenderConfigTCP, encode_multiline, encode_record)
+from .transformsyslog import COMPOSE, COMPOSE_BYTES
+from .transports import SenderConfigUnix
+
+
+class AsyncSender:
+    """
+    Class that manages the connection to the data collector from asyncio code
+
+    It uses the same configuration objects, framing and zip buffer as
+    `Sender`, but the connection is an asyncio stream: writes apply
+    backpressure through `drain()` and the end of the connection is detected
+    by a task reading the downstream channel, so no extra syscalls are made
+    before each write.
+
+    :param config: SenderConfigSSL, SenderConfigTCP, SenderConfigUnix or
+     dict object
+    :param con_type: TCP or SSL, default SSL, you can pass it in
+    config object too
+    :param timeout: timeout for connection and writes
+    :param inactivity_timeout: inactivity timeout for Ingestion balancer, so connection is
+     restarted before reaching
+    :param debug: For more info in console/logger output
+    :param logger: logger. Default sys.console
+    :param buffer_timeout: Seconds after which the zip buffer is flushed even
+     if it is not full. None disables it
+
+    >>>async with AsyncSender(engine_config) as con:
+    ...     await con.send(tag='my.app.devo_sender.test', msg='test of msg')
+
+    See Also:
+        Sender
+    """
+
+    def __init__(
+        self,
+        config=None,
+        con_type=None,
+        inactivity_timeout=30,
+        timeout=30,
+        debug=False,
+        logger=None,
+        buffer_timeout: Optional[float] = None,
+    ):
+        if config is None:
+            raise DevoSenderException(ERROR_MSGS.PROBLEMS_WITH_SENDER_ARGS)
+
+        if isinstance(config, (dict, Configuration)):
+            timeout = config.get("timeout", timeout)
+            debug = config.get("debug", debug)
+            config = Sender._from_dict(config=config, con_type=con_type)
+
+        self.reconnection = 0
+        self.debug = debug
+        self.socket_timeout = timeout
+        self.inactivity_timeout = inactivity_timeout
+        self.socket_max_connection = 3600 * 1000
+        self.last_message = int(time.time())
+        self.timestart = int(round(time.time() * 1000))
+        self.buffer = SenderBuffer()
+        self.buffer_timeout = buffer_timeout
+        self.logger = (
+            logger
+            if logger
+            else get_log(
+                handler=get_stream_handler(
+                    msg_format="%(asctime)s|%(levelname)s|Devo-AsyncSender|%(message)s"
+                )
+            )
+        )
+        self._sender_config = config
+
+        self.__reader: Optional[asyncio.StreamReader] = None
+        self.__writer: Optional[asyncio.StreamWriter] = None
+        self.__watcher: Optional[asyncio.Task] = None
+        self.__ssl_context = None
+        self.__connect_lock = asyncio.Lock()
+        self.__flush_handle: Optional[asyncio.TimerHandle] = None
+        self.__flush_tasks: set = set()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    def buffer_size(self, size=19500):
+        """
+        Set buffer size for AsyncSender, in compressed bytes
+
+        :param size: New size of buffer. Default 19500
+        :return True or False
+        """
+        try:
+            self.buffer.length = size
+            return True
+        except Exception:
+            return False
+
+    def compression_level(self, cl=-1):
+        """
+        Set compression level for zipped data, see `Sender.compression_level`
+
+        :param cl: (Compression_level). Default -1
+        :return True or False
+        """
+        try:
+            self.buffer.compression_level = cl
+            return True
+        except Exception:
+            return False
+
+    def __status(self) -> bool:
+        """
+        Connection status, check if it's open. It does not touch the socket
+        """
+        if self.__writer is None or self.__writer.is_closing():
+            return False
+        # The watcher task finishes when the endpoint closes the connection
+        if self.__watcher is None or self.__watcher.done():
+            return False
+        if self.socket_max_connection < int(round(time.time() * 1000)) - self.timestart:
+            return False
+        # If there is no activity for longer than the inactivity timeout, the
+        # balancer may have already closed the connection
+        if int(time.time()) - self.last_message > self.inactivity_timeout:
+            return False
+        return True
+
+    async def connect(self):
+        """
+        Open the connection if it is not already open (or it is not usable
+        anymore)
+        """
+        async with self.__connect_lock:
+            if self.__status():
+                return
+            await self.__disconnect()
+
+            ssl_context = None
+            is_ssl = isinstance(self._sender_config, SenderConfigSSL)
+            if is_ssl:
+                if self.__ssl_context is None:
+                    self.__ssl_context = self._sender_config.ssl_context()
+                    if not self._sender_config.has_certificates():
+                        self.logger.warning(
+                            "One or more of CA certificate, private or public certificate is not"
+                            " provided and TLS unsecure connection is established"
+                        )
+                ssl_context = self.__ssl_context
+
+            if isinstance(self._sender_config, (SenderConfigSSL, SenderConfigTCP)):
+                host, port = self._sender_config.address
+                opening = asyncio.open_connection(host, port, ssl=ssl_context)
+            elif isinstance(self._sender_config, SenderConfigUnix):
+                opening = asyncio.open_unix_connection(self._sender_config.address)
+            else:
+                # The sinks of the other transports are not streams
+                raise DevoSenderException(ERROR_MSGS.SOCKET_CANT_CONNECT_UNKNOWN_ERROR)
+            try:
+                self.__reader, self.__writer = await asyncio.wait_for(
+                    opening, self.socket_timeout
+                )
+            except (OSError, asyncio.TimeoutError) as error:
+                if isinstance(self._sender_config, SenderConfigUnix):
+                    raise DevoSenderException(
+                        ERROR_MSGS.TRANSPORT_CONN_ESTABLISHMENT
+                        % (self._sender_config.name, str(error))
+                    ) from error
+                message = (
+                    ERROR_MSGS.SSL_CONN_ESTABLISHMENT_SOCKET
+                    if is_ssl
+                    else ERROR_MSGS.TCP_CONN_ESTABLISHMENT_SOCKET
+                )
+                raise DevoSenderException(message % str(error)) from error
+
+            self.__watcher = asyncio.create_task(self.__watch(self.__reader))
+            self.last_message = int(time.time())
+            self.timestart = int(round(time.time() * 1000))
+            self.reconnection += 1
+            if self.debug:
+                self.logger.debug(
+                    "Conected to %s|%s"
+                    % (repr(self.__writer.get_extra_info("peername")), str(self.reconnection))
+                )
+
+    @staticmethod
+    async def __watch(reader: asyncio.StreamReader):
+        """Consume the downstream channel until the endpoint closes it"""
+        try:
+            while await reader.read(65536):
+                pass
+        except (ConnectionError, OSError):
+            pass
+
+    async def __disconnect(self):
+        writer, watcher = self.__writer, self.__watcher
+        self.__reader = self.__writer = self.__watcher = None
+        if watcher is not None:
+            watcher.cancel()
+        if writer is not None:
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), self.socket_timeout)
+            except Exception:  # Try else continue
+                self.logger.warning(ERROR_MSGS.CLOSING_ERROR)
+
+    async def __write(self, content: bytes):
+        """
+        Write content waiting for the transport to have room for it
+        :param content: The content to be sent
+        :raises DevoSenderException: if data cannot be sent or timeout is reached
+        """
+        if not self.__status():
+            await self.connect()
+        try:
+            self.__writer.write(content)
+            await asyncio.wait_for(self.__writer.drain(), self.socket_timeout)
+        except (OSError, asyncio.TimeoutError) as error:
+            await self.__disconnect()
+            raise DevoSenderException(ERROR_MSGS.SOCKET_ERROR % str(error)) from error
+        self.last_message = int(time.time())
+        if self.debug:
+            self.logger.debug("sent|size|%d" % len(content))
+
+    async def send_raw(self, record, multiline=False, zip=False):
+        """
+        Send raw messages to the collector
+
+        >>>await con.send_raw('<14>Jan  1 00:00:00 MacBook-Pro-de-X.local'
+        ...                   'my.app.devo_sender.test: txt test')
+        """
+        if multiline:
+            record = encode_multiline(record)
+        else:
+            record = encode_record(record)
+        if not record:
+            raise DevoSenderException(ERROR_MSGS.SEND_ERROR)
+        await self.__write(record)
+        return 1
+
+    def __frame(self, tag, msg, **kwargs):
+        """Compose the event as it is written to the connection"""
+        if isinstance(msg, bytes):
+            msg = COMPOSE_BYTES % (Sender.compose_mem(tag, bytes=True, **kwargs), msg)
+            if msg[-1:] != b"\n":
+                msg += b"\n"
+        else:
+            if msg[-1:] != "\n":
+                msg += "\n"
+            msg = COMPOSE % (Sender.compose_mem(tag, **kwargs), msg)
+        if kwargs.get("multiline", False):
+            return encode_multiline(msg)
+        return encode_record(msg)
+
+    async def send(self, tag, msg, **kwargs):
+        """
+        Creates the raw message and send. Same arguments as `Sender.send`
+
+        >>>await con.send(tag='my.app.devo_sender.test', msg='test of msg')
+        """
+        if kwargs.get("zip", False):
+            if isinstance(msg, bytes):
+                return await self.fill_buffer(
+                    COMPOSE_BYTES % (Sender.compose_mem(tag, bytes=True, **kwargs), msg)
+                )
+            if not kwargs.get("multiline", False):
+                msg = COMPOSE % (Sender.compose_mem(tag, **kwargs), msg)
+                return await self.fill_buffer(msg.encode("utf-8", "replace"))
+        await self.__write(self.__frame(tag, msg, **kwargs))
+        return 1
+
+    async def send_many(self, tag, msgs: Iterable, **kwargs):
+        """
+        Creates the raw messages and send all of them with one write. Same
+        arguments as `send`, with an iterable of messages
+
+        :return: Number of events sent (or added to the zip buffer)
+        """
+        if kwargs.get("zip", False):
+            sent = 0
+            for msg in msgs:
+                sent += await self.send(tag, msg, **kwargs)
+            return sent
+
+        frames = [self.__frame(tag, msg, **kwargs) for msg in msgs]
+        if frames:
+            await self.__write(b"".join(frames))
+        return len(frames)
+
+    async def fill_buffer(self, msg: bytes):
+        """
+        Add the message to the zip buffer, flushing it when it is full
+        :param msg: bytes
+        :return: Number of events sent
+        """
+        if msg[-1:] != b"\n":
+            msg += b"\n"
+        self.buffer.add(msg)
+        self.buffer.events += 1
+        if self.buffer.compressed_length > self.buffer.length:
+            return await self.flush()
+        self.__schedule_flush()
+        return 0
+
+    def __schedule_flush(self):
+        if self.buffer_timeout and self.__flush_handle is None:
+            self.__flush_handle = asyncio.get_running_loop().call_later(
+                self.buffer_timeout, self.__timed_flush
+            )
+
+    def __timed_flush(self):
+        self.__flush_handle = None
+        task = asyncio.ensure_future(self.flush())
+        self.__flush_tasks.add(task)
+        task.add_done_callback(self.__flush_done)
+
+    def __flush_done(self, task: asyncio.Task):
+        self.__flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error("%s: %s" % (ERROR_MSGS.FLUSHING_BUFFER_ERROR, task.exception()))
+
+    async def flush(self):
+        """
+        Compress and send the content of the zip buffer. If the write fails,
+        the events are kept in the buffer for the next flush
+        :return: Number of events sent
+        """
+        if self.__flush_handle is not None:
+            self.__flush_handle.cancel()
+            self.__flush_handle = None
+        if not self.buffer.raw_length:
+            return 0
+        events = self.buffer.events
+        batch = self.buffer.swap()
+        self.buffer.events = 0
+        try:
+            await self.__write(batch.finish())
+        except Exception as error:
+            # Put back before the events added while it was being written
+            self.buffer.text_buffer = batch.text + self.buffer.text_buffer
+            self.buffer.events += events
+            self.__schedule_flush()
+            raise DevoSenderException(ERROR_MSGS.FLUSHING_BUFFER_ERROR) from error
+        return events
+
+    async def aclose(self):
+        """
+        Flush the zip buffer and close the connection
+        """
+        try:
+            await self.flush()
+        finally:
+            if self.__flush_tasks:
+                await asyncio.gather(*self.__flush_tasks, return_exceptions=True)
+            self.buffer.close()
+            await self.__disconnect()
@@ -0,0 +1,468 @@
+# -*- coding: utf-8 -*-
+"""Bulk ingestion of files: the files, and byte ranges of the big ones split
+on line boundaries, are shared out among worker processes, each one with its
+own Sender, connection and zip buffer"""
+
+import glob
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from typing import Callable, Optional
+
+from .data import ERROR_MSGS, DevoSenderException, Sender
+from .files import DEFAULT_READ_SIZE, _skip_header, is_gzip_file, read_lines, send_file, send_lines
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 256 * 1024 * 1024
+"""Bytes of the parts in which the big files are split"""
+
+PROGRESS_INTERVAL = 1.0
+"""Seconds between progress reports"""
+
+
+def find_files(patterns) -> list:
+    """
+    Find the files of a list of globs, files and directories. Directories
+    are walked recursively and `**` matches any number of directories
+
+    :param patterns: Iterable of globs or paths, as `str` or `Path`
+    :return: Paths of the files, sorted and without duplicates
+    """
+    files, seen = [], set()
+    for pattern in patterns:
+        pattern = os.path.expanduser(str(pattern))
+        if os.path.isdir(pattern):
+            found = [
+                os.path.join(root, name) for root, _, names in os.walk(pattern) for name in names
+            ]
+        else:
+            found = glob.glob(pattern, recursive=True)
+        for path in sorted(found):
+            if os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                files.append(path)
+    if not files:
+        raise DevoSenderException(ERROR_MSGS.NO_FILES_FOUND % ", ".join(map(str, patterns)))
+    return files
+
+
+class Shard:
+    """Part of a file sent by a worker: the lines that start in a byte range.
+    Gzip files cannot be split and are always sent whole (`end` is None)"""
+
+    __slots__ = ("path", "start", "end", "size")
+
+    def __init__(self, path: str, start: int = 0, end: Optional[int] = None, size: int = 0):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.size = size
+        """Size of the whole file"""
+
+    @property
+    def length(self) -> int:
+        """Bytes of the file in the shard"""
+        return (self.size if self.end is None else self.end) - self.start
+
+    def __repr__(self):
+        return "Shard(%r, %r, %r)" % (self.path, self.start, self.end)
+
+
+def plan_shards(files, shard_size: Optional[int] = DEFAULT_SHARD_SIZE) -> list:
+    """
+    Split the files in shards of up to `shard_size` bytes, so the big files
+    are sent by several workers. Gzip files are not split
+
+    :param files: Paths of the files
+    :param shard_size: Bytes of each shard. None or 0 does not split the files
+    :return: List of Shard
+    """
+    shards = []
+    for path in files:
+        size = os.path.getsize(path)
+        if is_gzip_file(path):
+            shards.append(Shard(path, 0, None, size))
+            continue
+        step = shard_size if shard_size and shard_size > 0 else max(size, 1)
+        for start in range(0, max(size, 1), step):
+            shards.append(Shard(path, start, min(start + step, size), size))
+    return shards
+
+
+class LineRange:
+    """
+    Binary file object that reads the lines that start in a byte range of a
+    file: the line that starts before the range is skipped and the last line
+    is read to its end, even if it ends after the range. The ranges of a file
+    split at any offsets read every line exactly once
+
+    :param file: Binary file object, seekable
+    :param start: First byte of the range
+    :param end: Byte after the range
+
+    >>>with open('events.log', 'rb') as file:
+    ...     for lines in read_lines(LineRange(file, 1024 * 1024, 2048 * 1024)):
+    ...         con.send_many('my.app.devo_sender.test', lines, zip=True)
+    """
+
+    def __init__(self, file, start: int, end: int):
+        self.file = file
+        self.end = end
+        file.seek(max(start - 1, 0))
+        if start > 0:
+            # The line that starts before the range is of the previous range
+            while True:
+                skipped = file.readline(DEFAULT_READ_SIZE)
+                if not skipped or skipped[-1:] == b"\n":
+                    break
+        self.__remaining = end - file.tell()
+        self.__last = b"\n"
+
+    def read(self, size: int = -1) -> bytes:
+        if self.__remaining > 0:
+            data = self.file.read(self.__remaining if size < 0 else min(size, self.__remaining))
+            if not data:
+                # The file is shorter than when it was split
+                self.__remaining = 0
+                return data
+            self.__remaining -= len(data)
+            self.__last = data[-1:]
+            return data
+        if self.__last == b"\n":
+            return b""
+        # The last line of the range ends after it
+        data = self.file.readline(size if size > 0 else -1)
+        self.__last = data[-1:] if data else b"\n"
+        return data
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+
+def send_shard(
+    con: Sender,
+    shard: Shard,
+    tag=None,
+    raw: bool = False,
+    zip: bool = False,
+    header: bool = False,
+    chunk_size: int = DEFAULT_READ_SIZE,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """
+    Send the lines of a shard, as `send_file`
+
+    :param con: Sender
+    :param shard: Shard
+    :param tag: Tag of the events
+    :param raw: The lines are events to send as they are
+    :param zip: Send the lines through the zip buffer, flushed at the end
+    :param header: Skip the first line of the file, if the shard starts it
+    :param chunk_size: Bytes read at once
+    :param progress: Called with the events and the bytes of the file read
+     after sending each batch of lines
+    :return: Number of events sent
+    """
+    if shard.end is None:
+        events = send_file(con, shard.path, tag=tag, raw=raw, zip=zip, header=header,
+                           chunk_size=chunk_size)
+        if progress is not None:
+            progress(events, shard.length)
+        return events
+
+    with open(shard.path, "rb") as file:
+        lines = LineRange(file, shard.start, shard.end)
+        batches = _skip_header(read_lines(lines, chunk_size), header and shard.start == 0)
+        if progress is not None:
+            batches = _reported(batches, lines, shard, progress)
+        return send_lines(con, batches, tag, raw, zip)
+
+
+def _reported(batches, lines: LineRange, shard: Shard, progress):
+    done = shard.start
+    for batch in batches:
+        yield batch
+        position = min(lines.tell(), shard.end)
+        progress(sum(1 for line in batch if line), position - done)
+        done = position
+    progress(0, shard.end - done)
+
+
+class BulkProgress:
+    """Counters of a bulk ingestion, updated by the reports of the workers"""
+
+    def __init__(self, shards: list):
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.shards = len(shards)
+        self.events: int = 0
+        """Events sent"""
+        self.read_bytes: int = 0
+        """Bytes of the files read"""
+        self.total_bytes: int = sum(shard.length for shard in shards)
+        self.failed: list = []
+        """(Shard, error message) of the shards that could not be sent"""
+        self.files: dict = {}
+        """Path to [bytes read, size, shards left, events] of every file"""
+        for shard in shards:
+            file = self.files.setdefault(shard.path, [0, shard.size, 0, 0])
+            file[2] += 1
+        self.__zipped: dict = {}
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        """MB of the files read per second"""
+        return self.read_bytes / 1e6 / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def compression_ratio(self) -> Optional[float]:
+        """Raw bytes per compressed byte of the zip buffers sent, None
+        without zipped data"""
+        raw = sum(zipped[0] for zipped in self.__zipped.values())
+        compressed = sum(zipped[1] for zipped in self.__zipped.values())
+        return raw / compressed if compressed else None
+
+    @property
+    def completed_files(self) -> int:
+        return sum(1 for file in self.files.values() if not file[2])
+
+    def completion(self, path: str) -> float:
+        """
+        Fraction of a file sent
+
+        :param path: Path of the file
+        :return: From 0.0 to 1.0
+        """
+        read, size, left, _ = self.files[path]
+        if not left:
+            return 1.0
+        return min(read / size, 1.0) if size else 0.0
+
+    def update(self, worker: int, path: str, events: int, read: int, zipped: tuple):
+        self.events += events
+        self.read_bytes += read
+        file = self.files[path]
+        file[0] += read
+        file[3] += events
+        self.__zipped[worker] = zipped
+
+    def done(self, shard: Shard, error: Optional[str] = None) -> bool:
+        """Count a shard as finished. Return True if its file is complete"""
+        file = self.files[shard.path]
+        file[2] -= 1
+        if error is not None:
+            self.failed.append((shard, error))
+        return not file[2]
+
+    def __str__(self):
+        ratio = self.compression_ratio
+        return "%d/%d files | %d events (%.0f/s) | %.1f/%.1f MB (%.1f MB/s)%s" % (
+            self.completed_files,
+            len(self.files),
+            self.events,
+            self.events_per_second,
+            self.read_bytes / 1e6,
+            self.total_bytes / 1e6,
+            self.mb_per_second,
+            "" if ratio is None else " | ratio %.1f" % ratio,
+        )
+
+
+def _worker(index, config, con_type, options, kwargs, tasks, results):
+    """Main function of a worker process"""
+    try:
+        con = Sender(config=config, con_type=con_type, **kwargs)
+        if options.get("buffer_size"):
+            con.buffer_size(size=options["buffer_size"])
+        if options.get("compression_level") is not None:
+            con.compression_level(cl=options["compression_level"])
+    except Exception as error:
+        results.put(("ready", index, None, 0, 0, None, str(error)))
+        return
+    results.put(("ready", index, None, 0, 0, None, None))
+
+    interval = options["interval"]
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        number, shard = task
+        pending = [0, 0, time.time()]
+
+        def progress(events, read):
+            pending[0] += events
+            pending[1] += read
+            if time.time() - pending[2] >= interval:
+                zipped = (con.zipped_raw_bytes, con.zipped_bytes)
+                results.put(("progress", index, number, pending[0], pending[1], zipped, None))
+                pending[:] = [0, 0, time.time()]
+
+        error = None
+        try:
+            send_shard(
+                con,
+                shard,
+                tag=options["tag"],
+                raw=options["raw"],
+                zip=options["zip"],
+                header=options["header"],
+                chunk_size=options["chunk_size"],
+                progress=progress,
+            )
+        except Exception as exception:
+            error = str(exception)
+            log.error("Devo-BulkSender|worker %d|%s: %s", index, shard, error)
+        zipped = (con.zipped_raw_bytes, con.zipped_bytes)
+        results.put(("done", index, number, pending[0], pending[1], zipped, error))
+    con.close()
+    results.put(("exit", index, None, 0, 0, None, None))
+
+
+def bulk_send(
+    files,
+    config=None,
+    con_type=None,
+    tag=None,
+    raw: bool = False,
+    zip: bool = True,
+    header: bool = False,
+    processes: Optional[int] = None,
+    shard_size: Optional[int] = DEFAULT_SHARD_SIZE,
+    chunk_size: int = DEFAULT_READ_SIZE,
+    buffer_size: Optional[int] = None,
+    compression_level: Optional[int] = None,
+    interval: float = PROGRESS_INTERVAL,
+    on_progress: Optional[Callable[[BulkProgress], None]] = None,
+    on_file: Optional[Callable[[str, BulkProgress], None]] = None,
+    mp_context=None,
+    **kwargs
+) -> BulkProgress:
+    """
+    Send the lines of several files from a pool of worker processes.
+
+    The files are split in shards of `shard_size` bytes on line boundaries
+    (gzip files are sent whole, with `send_gzip_file`) and the workers take
+    the shards in order, each one with its own `Sender`, connection and zip
+    buffer, so reading, composing, compressing and writing the events uses
+    several cores. There is no order between the events of different shards.
+
+    :param files: Paths of the files, or globs and directories to find them
+     with `find_files`
+    :param config: SenderConfigSSL, SenderConfigTCP or dict object, as in
+     `Sender`. With start methods other than fork, it must be picklable
+    :param con_type: TCP or SSL, as in `Sender`
+    :param tag: Tag of the events
+    :param raw: The lines are events to send as they are
+    :param zip: Send the lines through the zip buffers
+    :param header: Skip the first line of every file
+    :param processes: Number of worker processes. Default: number of CPUs,
+     up to the number of shards
+    :param shard_size: Bytes of the shards. None or 0 does not split the files
+    :param chunk_size: Bytes read at once
+    :param buffer_size: Zip buffer size of the workers, as in `Sender.buffer_size`
+    :param compression_level: Compression level of the workers, as in
+     `Sender.compression_level`
+    :param interval: Seconds between progress reports of the workers
+    :param on_progress: Called with the BulkProgress every `interval` seconds
+     and at the end
+    :param on_file: Called with the path and the BulkProgress when every shard
+     of a file is sent
+    :param mp_context: multiprocessing context or start method name
+    :param kwargs: Any other `Sender` argument (timeout, inactivity_timeout...)
+    :return: BulkProgress. The shards that could not be sent are in `failed`
+
+    >>>progress = bulk_send(['/var/log/archive/**/*.log'], config=engine_config,
+    ...                     tag='my.app.devo_sender.test', processes=8)
+    >>>progress.events, progress.failed
+
+    See Also:
+        ParallelSender, send_file
+    """
+    if config is None:
+        raise DevoSenderException(ERROR_MSGS.PROBLEMS_WITH_SENDER_ARGS)
+    if mp_context is None or isinstance(mp_context, str):
+        mp_context = multiprocessing.get_context(mp_context)
+    shards = plan_shards(find_files(files), shard_size)
+    progress = BulkProgress(shards)
+    processes = max(min(processes or os.cpu_count() or 1, len(shards)), 1)
+
+    tasks = mp_context.Queue()
+    results = mp_context.Queue()
+    for task in enumerate(shards):
+        tasks.put(task)
+    for _ in range(processes):
+        tasks.put(None)
+    options = {
+        "tag": tag,
+        "raw": raw,
+        "zip": zip,
+        "header": header,
+        "chunk_size": chunk_size,
+        "buffer_size": buffer_size,
+        "compression_level": compression_level,
+        "interval": interval,
+    }
+    workers = [
+        mp_context.Process(
+            target=_worker,
+            args=(index, config, con_type, options, kwargs, tasks, results),
+            name="devo-sender-bulk-%d" % index,
+            daemon=True,
+        )
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        pending = set(range(len(shards)))
+        running = set(range(processes))
+        report = time.time() + interval
+        while running:
+            try:
+                kind, index, number, events, read, zipped, error = results.get(
+                    timeout=max(report - time.time(), 0.01)
+                )
+            except queue.Empty:
+                # A worker that ended will never report
+                running = {number for number in running if workers[number].is_alive()}
+            else:
+                if kind == "ready" and error is not None:
+                    raise DevoSenderException(ERROR_MSGS.PARALLEL_WORKER_ERROR % error)
+                if kind == "exit":
+                    running.discard(index)
+                elif kind in ("progress", "done"):
+                    shard = shards[number]
+                    progress.update(index, shard.path, events, read, zipped)
+                    if kind == "done":
+                        pending.discard(number)
+                        if progress.done(shard, error) and on_file is not None:
+                            on_file(shard.path, progress)
+            if time.time() >= report:
+                report = time.time() + interval
+                if on_progress is not None:
+                    on_progress(progress)
+        for number in sorted(pending):
+            progress.done(shards[number], "the worker process ended")
+        for worker in workers:
+            worker.join()
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+    progress.finished = time.time()
+    if on_progress is not None:
+        on_progress(progress)
+    return progress
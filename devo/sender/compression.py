@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Parallel gzip compression of zip buffers, in the style of pigz"""
+
+import os
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Optional
+
+DEFAULT_CHUNK_SIZE = 128 * 1024
+"""Raw bytes of each piece compressed in parallel"""
+
+_executors: dict = {}
+_executors_lock = Lock()
+
+
+def compression_executor(workers: int) -> ThreadPoolExecutor:
+    """
+    Thread pool shared by every buffer compressed with the same number of
+    workers. zlib releases the GIL while it compresses, so the pieces are
+    compressed by several cores at the same time
+
+    :param workers: Number of threads of the pool
+    :return: ThreadPoolExecutor
+    """
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="devo-sender-gzip"
+            )
+            _executors[workers] = executor
+        return executor
+
+
+def compress_member(data: bytes, compression_level: int = -1) -> bytes:
+    """
+    Compress data as a complete gzip member
+
+    :param data: Raw bytes
+    :param compression_level: zlib compression level
+    :return: Gzip member
+    """
+    compressor = zlib.compressobj(compression_level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _timed_compress_member(data: bytes, compression_level: int) -> tuple:
+    start = time.perf_counter()
+    member = compress_member(data, compression_level)
+    return member, time.perf_counter() - start
+
+
+class ParallelZipBatch:
+    """Zip batch compressed by several threads.
+
+    The events are grouped in pieces of `chunk_size` raw bytes, always split
+    at event boundaries, and each piece is compressed as an independent gzip
+    member by a thread pool as soon as it is complete. The batch is the
+    concatenation of the members, which is a valid gzip stream. It has the
+    same interface as `ZipBatch`.
+
+    :param compression_level: zlib compression level
+    :param workers: Threads compressing the pieces. Default: number of CPUs
+    :param chunk_size: Raw bytes of each piece
+    """
+
+    def __init__(
+        self,
+        compression_level: int = -1,
+        workers: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.compression_level: int = compression_level
+        self.workers: int = workers or os.cpu_count() or 1
+        self.chunk_size: int = chunk_size
+        self.length: int = 0
+        """Compressed bytes of the pieces already compressed"""
+        self.raw_length: int = 0
+        """Raw bytes added to the batch"""
+        self.started: float = 0.0
+        """Time the first event was added"""
+        self.compress_time: float = 0.0
+        """Seconds spent by the threads compressing the pieces already compressed"""
+        self.__executor = compression_executor(self.workers)
+        self.__chunks: list = []
+        self.__piece: list = []
+        self.__piece_length: int = 0
+        self.__members: list = []
+        self.__measured: int = 0
+
+    def add(self, msg: bytes) -> None:
+        """Add one event, compressing the current piece if it is complete
+
+        :param msg: Already framed event, as bytes
+        """
+        if not self.raw_length:
+            self.started = time.time()
+        self.__chunks.append(msg)
+        self.__piece.append(msg)
+        self.raw_length += len(msg)
+        self.__piece_length += len(msg)
+        if self.__piece_length >= self.chunk_size:
+            self.__submit()
+        self.__measure()
+
+    def __submit(self):
+        piece = b"".join(self.__piece)
+        self.__piece, self.__piece_length = [], 0
+        self.__members.append(
+            self.__executor.submit(_timed_compress_member, piece, self.compression_level)
+        )
+        # Do not get too far ahead of the compression: wait for the oldest
+        # piece when every worker has two pieces waiting
+        while len(self.__members) - self.__measured > 2 * self.workers:
+            self.__count(self.__members[self.__measured])
+
+    def __count(self, member: Future):
+        zipped, seconds = member.result()
+        self.length += len(zipped)
+        self.compress_time += seconds
+        self.__measured += 1
+
+    def __measure(self):
+        while (
+            self.__measured < len(self.__members) and self.__members[self.__measured].done()
+        ):
+            self.__count(self.__members[self.__measured])
+
+    @property
+    def text(self) -> bytes:
+        """Raw (uncompressed) content of the batch"""
+        return b"".join(self.__chunks)
+
+    def members(self) -> list:
+        """Compress the last piece and wait for every piece
+
+        :return: List of gzip members, one per piece, in order
+        """
+        if self.__piece:
+            self.__submit()
+        if not self.__members:
+            return [compress_member(b"", self.compression_level)]
+        for member in self.__members[self.__measured:]:
+            self.__count(member)
+        return [member.result()[0] for member in self.__members]
+
+    def finish(self) -> bytes:
+        """Compress the last piece and wait for every piece
+
+        :return: Concatenated gzip members of the batch
+        """
+        return b"".join(self.members())
+
+
+def _after_fork():
+    # The threads of the pools do not exist in a forked child
+    global _executors, _executors_lock
+    _executors = {}
+    _executors_lock = Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -4,16 +4,20 @@ and sending of data to Devo"""
 
 import errno
 import logging
-import select
+import os
+import selectors
 import socket
 import ssl
 import sys
 import time
+import weakref
 import zlib
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from functools import lru_cache, partial
 from pathlib import Path
 from ssl import SSLWantReadError, SSLWantWriteError
-from threading import Thread, Lock, Event
+from threading import Lock, RLock
 from typing import Optional, Callable
 import warnings
 
@@ -23,13 +27,39 @@ from OpenSSL import SSL, crypto
 
 from devo.common import Configuration, get_log, get_stream_handler
 
+from .adaptive import ZipAutotuner, ZipSample
+from .compression import DEFAULT_CHUNK_SIZE, ParallelZipBatch
+from .monitor import ConnectionMonitor, wait_for_socket
+from .pipeline import ZipPipeline
+from .relays import RelaySet
+from .rotation import (DEFAULT_ROTATION_LEAD, PreparedConnection, closing_executor,
+                       rotation_executor)
+from .spool import Spool, SpoolShipper
+from .staging import DEFAULT_STAGING_SIZE, ThreadStaging
+from .timer import DeadlineTimer, TimerHandle, flush_executor, shared_timer
 from .transformsyslog import (COMPOSE, COMPOSE_BYTES, FACILITY_USER, FORMAT_MY,
                               FORMAT_MY_BYTES, SEVERITY_INFO, priority_map)
+from .transports import (SenderConfigFile, SenderConfigNull, SenderConfigUnix,
+                         SenderTransport, Sink)
 
 PYPY = hasattr(sys, "pypy_version_info")
 
+SMALL_WRITE_SIZE = 64 * 1024
+"""Chunks up to this size are joined to the header of their frame instead of
+writing the header on its own"""
+
 log = logging.getLogger(__name__)
 
+_senders: weakref.WeakSet = weakref.WeakSet()
+"""Senders of the process, reset in the child after a fork"""
+
+
+def _call_if_alive(method: weakref.WeakMethod, *args):
+    # Timer callbacks do not keep their Sender alive
+    method = method()
+    if method is not None:
+        method(*args)
+
 
 class ERROR_MSGS(str, Enum):
 
@@ -78,6 +108,17 @@ class ERROR_MSGS(str, Enum):
     CLOSING_ERROR = "Error closing connection"
     FLUSHING_BUFFER_ERROR = "Error flushing buffer"
     ERROR_AFTER_TIMEOUT = "Timeout reached"
+    SENDER_CLOSED = "Sender is closed"
+    SPOOL_ERROR = "Error writing to the spool: %s"
+    WRONG_QUEUE_SIZE = '"queue_size" must have a value greater than 0'
+    NO_CONNECTION_AVAILABLE = "No connection of the pool is available"
+    PARALLEL_WORKER_ERROR = "Error starting a worker process: %s"
+    GZIP_ERROR = "Error reading the gzip file: %s"
+    NO_TAG_FOR_LINES = "A tag is required to send lines that are not syslog framed"
+    NO_FILES_FOUND = "No files found in %s"
+    BULK_SHARDS_FAILED = "%d of %d parts of the files could not be sent"
+    MULTILINE_LENGTH_ERROR = "The multiline event has %d bytes instead of the %d of its frame"
+    TRANSPORT_CONN_ESTABLISHMENT = "Error when opening the %s connection: %s"
 
 
 class DevoSenderException(Exception):
@@ -101,11 +142,27 @@ class DevoSenderException(Exception):
         return self.message
 
 
-class SenderConfigSSL:
+class SSLContextCache:
+    """SSL context of a `SenderConfigSSL`, with the settings and the PKCS#12
+    material it was created from and the TLS sessions of its connections.
+    It is shared by the shallow copies of the configuration"""
+
+    __slots__ = ("context", "settings", "lock", "pkcs_material", "sessions")
+
+    def __init__(self):
+        self.context: Optional[ssl.SSLContext] = None
+        self.settings: Optional[tuple] = None
+        self.lock = Lock()
+        self.pkcs_material: Optional[tuple] = None
+        self.sessions: dict = {}
+
+
+class SenderConfigSSL(SenderTransport):
     """
     Configuration SSL class.
 
-    :param address: (tuple) (Server address, port)
+    :param address: (tuple) (Server address, port), or a list of them (or a
+    `RelaySet`) to fail over between several relays
     :param key: (str) key src file
     :param cert:  (str) cert src file
     :param chain:  (str) chain src file
@@ -125,6 +182,8 @@ class SenderConfigSSL:
 
     """
 
+    name = "SSL"
+
     def __init__(
         self,
         address=None,
@@ -137,8 +196,9 @@ class SenderConfigSSL:
         verify_mode=None,
         verify_config=False,
     ):
-        if not isinstance(address, tuple):
-            raise DevoSenderException(ERROR_MSGS.ADDRESS_TUPLE)
+        self.relays: Optional[RelaySet] = relays_from_address(address, ERROR_MSGS.ADDRESS_TUPLE)
+        if self.relays is not None:
+            address = self.relays.endpoints[0].address
         try:
             self.address = address
             self.key = key
@@ -152,6 +212,7 @@ class SenderConfigSSL:
             self.verify_mode = verify_mode
         except Exception as error:
             raise DevoSenderException(ERROR_MSGS.WRONG_SSL_CONFIG % str(error)) from error
+        self.__tls = SSLContextCache()
 
         if self.verify_config:
             self.check_config_files_path()
@@ -286,6 +347,190 @@ class SenderConfigSSL:
             ERROR_MSGS.CERTIFICATE_IN_ADDRESS_IS_NOT_COMPATIBLE % (self.address[0], self.chain)
         )
 
+    def has_certificates(self) -> bool:
+        """
+        Check if key, cert and chain are all provided (or a PKCS#12 file), so
+        the connection can be verified.
+
+        :return: Boolean true if all of them are set
+        """
+        return self.pkcs is not None or (
+            self.key is not None and self.chain is not None and self.cert is not None
+        )
+
+    def __getstate__(self):
+        # The context, the TLS sessions and the lock are not copied, so the
+        # configuration can be sent to other processes
+        state = self.__dict__.copy()
+        del state["_SenderConfigSSL__tls"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__tls = SSLContextCache()
+
+    def __copy__(self):
+        # Shallow copies share the SSL context and the TLS sessions, so the
+        # connections of a SenderPool load the certificates only once and
+        # resume the sessions of each other
+        config = self.__class__.__new__(self.__class__)
+        config.__dict__.update(self.__dict__)
+        return config
+
+    def ssl_context(self) -> ssl.SSLContext:
+        """
+        SSL context used by the connections of this configuration. It is
+        created on first use and shared by every connection (and reconnection)
+        while the settings of the configuration do not change, so the
+        certificates are loaded only once and the TLS sessions can be resumed.
+
+        :return: ssl.SSLContext or raises an exception
+        """
+        settings = (
+            self.key,
+            self.cert,
+            self.chain,
+            tuple(sorted(self.pkcs.items())) if self.pkcs is not None else None,
+            self.sec_level,
+            self.check_hostname,
+            self.verify_mode,
+        )
+        tls = self.__tls
+        with tls.lock:
+            if tls.context is None or settings != tls.settings:
+                if tls.settings is not None and settings[3] != tls.settings[3]:
+                    tls.pkcs_material = None
+                tls.context = self.create_ssl_context()
+                tls.settings = settings
+                tls.sessions = {}
+            return tls.context
+
+    def reset_ssl_context(self) -> None:
+        """
+        Discard the SSL context, the converted PKCS#12 material and the TLS
+        sessions, so the next connection loads the certificates again (after
+        renewing them on disk, for example)
+        """
+        tls = self.__tls
+        with tls.lock:
+            tls.context = None
+            tls.settings = None
+            tls.pkcs_material = None
+            tls.sessions = {}
+
+    def get_tls_session(self, address) -> Optional[ssl.SSLSession]:
+        """
+        TLS session of the last connection to an address, to resume it
+
+        :param address: (address, port) tuple
+        :return: ssl.SSLSession or None
+        """
+        return self.__tls.sessions.get(tuple(address))
+
+    def set_tls_session(self, address, session: Optional[ssl.SSLSession]) -> None:
+        """
+        Keep the TLS session of a connection to an address, to resume it in
+        the next connection
+
+        :param address: (address, port) tuple
+        :param session: ssl.SSLSession of the connection
+        """
+        if session is not None:
+            self.__tls.sessions[tuple(address)] = session
+
+    def connect(self, address, timeout: float, logger: Optional[logging.Logger] = None):
+        """
+        Connect to SSL socket. The session of the last connection to the
+        same address is resumed, which saves the full handshake
+
+        :param address: (address, port) to connect to
+        :param timeout: Seconds to wait for the connection
+        :param logger: Logger of the Sender
+        :return: Connected non-blocking socket
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            context = self.ssl_context()
+            session = self.get_tls_session(address)
+            if self.has_certificates():
+                sock = context.wrap_socket(sock, server_hostname=address[0], session=session)
+            else:
+                (logger or log).warning(
+                    "One or more of CA certificate, private or public certificate is not provided"
+                    " and TLS unsecure connection is established"
+                )
+                sock = context.wrap_socket(sock, session=session)
+
+            sock.connect(address)
+            self.set_tls_session(address, sock.session)
+            sock.setblocking(False)
+            return sock
+
+        except DevoSenderException:
+            sock.close()
+            raise
+        except socket.error as error:
+            sock.close()
+            raise DevoSenderException(
+                ERROR_MSGS.SSL_CONN_ESTABLISHMENT_SOCKET % str(error)
+            ) from error
+
+    def create_ssl_context(self) -> ssl.SSLContext:
+        """
+        Create a new SSL context with this configuration. When a PKCS#12 file
+        is configured it is converted in memory, only the first time. Use
+        `ssl_context` to reuse the same context in every connection.
+
+        :return: ssl.SSLContext or raises an exception
+        """
+        if self.pkcs is not None:
+            try:
+                if self.__tls.pkcs_material is None:
+                    from .pfx_to_pem import pfx_to_pem_bytes
+
+                    self.__tls.pkcs_material = pfx_to_pem_bytes(
+                        path=self.pkcs.get("path", None), password=self.pkcs.get("password", None)
+                    )
+                key, cert, chain = self.__tls.pkcs_material
+                context = self.__verified_context(cadata=chain.decode("ascii") or None)
+
+                from .pfx_to_pem import load_pem_cert_chain
+
+                load_pem_cert_chain(context, key, cert)
+            except Exception as error:
+                raise DevoSenderException(
+                    ERROR_MSGS.PFX_CERTIFICATE_READ_FAILED % str(error)
+                ) from error
+        elif self.has_certificates():
+            context = self.__verified_context(cafile=self.chain)
+            context.load_cert_chain(keyfile=self.key, certfile=self.cert)
+        else:
+            context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            context.options |= ssl.OP_NO_SSLv2
+            context.options |= ssl.OP_NO_SSLv3
+            context.minimum_version = ssl.TLSVersion.TLSv1_2
+            context.maximum_version = ssl.TLSVersion.TLSv1_3
+        return context
+
+    def __verified_context(self, cafile=None, cadata=None) -> ssl.SSLContext:
+        context = ssl.create_default_context(cafile=cafile, cadata=cadata)
+        context.options |= ssl.OP_NO_SSLv2
+        context.options |= ssl.OP_NO_SSLv3
+        context.minimum_version = ssl.TLSVersion.TLSv1_2
+        context.maximum_version = ssl.TLSVersion.TLSv1_3
+
+        if self.sec_level is not None:
+            context.set_ciphers("DEFAULT@SECLEVEL={!s}".format(self.sec_level))
+
+        context.check_hostname = self.check_hostname
+
+        if self.verify_mode is not None:
+            context.verify_mode = self.verify_mode
+        return context
+
     @staticmethod
     def get_common_names(cert_chain, components_type):
         result = set()
@@ -304,10 +549,11 @@ class SenderConfigSSL:
             return chain_certs
 
 
-class SenderConfigTCP:
+class SenderConfigTCP(SenderTransport):
     """
     Configuration TCP class.
-    :param address:(tuple) Server address and port
+    :param address:(tuple) Server address and port, or a list of them (or a
+    `RelaySet`) to fail over between several relays
 
     >>>sender_config = SenderConfigTCP(address=(ADDRESS, PORT))
 
@@ -315,9 +561,14 @@ class SenderConfigTCP:
         Sender
     """
 
+    name = "TCP"
+
     def __init__(self, address=None):
-        if not isinstance(address, tuple):
-            raise DevoSenderException(ERROR_MSGS.ADDRESS_MUST_BE_A_TUPLE)
+        self.relays: Optional[RelaySet] = relays_from_address(
+            address, ERROR_MSGS.ADDRESS_MUST_BE_A_TUPLE
+        )
+        if self.relays is not None:
+            address = self.relays.endpoints[0].address
         try:
             self.address = address
             self.hostname = socket.gethostname()
@@ -325,29 +576,58 @@ class SenderConfigTCP:
         except Exception as error:
             raise DevoSenderException(ERROR_MSGS.CANT_CREATE_TCP_CONFIG % str(error)) from error
 
+    def connect(self, address, timeout: float, logger: Optional[logging.Logger] = None):
+        """
+        Connect to TCP socket
 
-class SenderBufferFlusher(Thread):
-    """ Thread class for flushing buffer if the timeout is reached.
+        :param address: (address, port) to connect to
+        :param timeout: Seconds to wait for the connection
+        :param logger: Logger of the Sender
+        :return: Connected non-blocking socket
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address)
+        except socket.error as error:
+            sock.close()
+            raise DevoSenderException(
+                ERROR_MSGS.TCP_CONN_ESTABLISHMENT_SOCKET % str(error)
+            ) from error
 
-    When the "events" value from the SenderBuffer is set to 0, the wait will be set to "None" that means
-    that the "wait_object" will wait forever (until it will be "wake up").
+        sock.setblocking(False)
+        return sock
 
-    When the "events" value from the SenderBuffer is set to greater than 0, the wait it will be set
-    to "1.0" that means that the "wait_object" will wait only 1 second.
-    This will check every second to see if the timeout has been reached.
 
-    """
+class SenderBufferFlusher:
+    """ Flushes the buffer when the timeout is reached.
 
-    DEFAULT_INTERNAL_WAIT_VALUE = 1.0
+    When the "events" value from the SenderBuffer goes from 0 to greater than 0, a deadline
+    "buffer_timeout" seconds later is scheduled in a timer, that hands "flush_buffer_func" to a
+    thread pool exactly at that moment. When it is set back to 0, the deadline is cancelled.
 
-    def __init__(self):
-        super().__init__()
+    The timer is one thread with a heap of deadlines shared by the flushers of every Sender of the
+    process (see `DeadlineTimer`), so "buffer_timeout" can be a fraction of a second. The flushes
+    run in the threads of "executor" (by default the pool of `flush_executor`), never in the timer
+    thread.
+
+    """
+
+    def __init__(
+        self,
+        timer: Optional[DeadlineTimer] = None,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
         self.buffer_timeout: float = 10.0
         self.flush_buffer_func = None
+        self.timer: DeadlineTimer = timer if timer is not None else shared_timer()
+        self.executor: Optional[ThreadPoolExecutor] = executor
         self.__first_data_timestamp: Optional[float] = None
-        self.__running_flag = True
-        self.__wait_object: Event = Event()
-        self.__loop_wait = SenderBufferFlusher.DEFAULT_INTERNAL_WAIT_VALUE
+        self.__running_flag = False
+        self.__loop_wait: Optional[float] = None
+        self.__handle: Optional[TimerHandle] = None
+        self.__deadline: int = 0
+        self.__lock = Lock()
 
     def start(self) -> None:
 
@@ -356,65 +636,254 @@ class SenderBufferFlusher(Thread):
             raise DevoSenderException('"buffer_timeout" is required and must have a value grater than 0.0')
         if not self.flush_buffer_func:
             raise DevoSenderException('"flush_buffer_func" is required')
-        super().start()
-
-    def run(self):
-        while self.__running_flag:
-            if (self.__first_data_timestamp is not None
-                    and ((time.time() - self.__first_data_timestamp) >= self.buffer_timeout)):
-                self.flush_buffer_func()
-                self.__first_data_timestamp = None
+        with self.__lock:
+            self.__running_flag = True
+            if self.__first_data_timestamp is not None:
+                self.__schedule()
+
+    def __schedule(self):
+        self.timer.cancel(self.__handle)
+        self.__deadline += 1
+        self.__loop_wait = self.__first_data_timestamp + self.buffer_timeout - time.time()
+        self.__handle = self.timer.schedule(
+            self.__loop_wait, partial(self.__flush, self.__deadline)
+        )
 
-            # This "wait_object" can be interrupted is "set()" method is called
-            called = self.__wait_object.wait(timeout=self.__loop_wait)
-            if called:
-                self.__wait_object.clear()
+    def __flush(self, deadline: int):
+        with self.__lock:
+            # A deadline replaced while the timer was calling it is ignored
+            if not self.__running_flag or deadline != self.__deadline:
+                return
+            self.__handle = None
+            self.__loop_wait = None
+            self.__first_data_timestamp = None
+        # The shared pool is looked up every time, it is replaced after a fork
+        executor = self.executor if self.executor is not None else flush_executor()
+        executor.submit(self.__run_flush_buffer_func)
+
+    def __run_flush_buffer_func(self):
+        try:
+            self.flush_buffer_func()
+        except Exception as error:
+            log.error("Devo-SenderBufferFlusher|error flushing the buffer: %s", error)
 
     def initialize_timestamp(self) -> float:
         """ This method should be called every time the buffer transits from "0" to "greater than 0"
 
         :return: Time mark that will be used as reference for flushing the buffer (most of the time it will not be used)
         """
-        self.__loop_wait = SenderBufferFlusher.DEFAULT_INTERNAL_WAIT_VALUE
-        self.__first_data_timestamp = time.time()
-        if not self.__wait_object.is_set():
-            self.__wait_object.set()
+        with self.__lock:
+            self.__first_data_timestamp = time.time()
+            if self.__running_flag:
+                self.__schedule()
+            return self.__first_data_timestamp
 
-        return self.__first_data_timestamp
+    def arm(self) -> None:
+        """ Schedules the flush like "initialize_timestamp", only if it is not already scheduled
+
+        :return:
+        """
+        with self.__lock:
+            if self.__first_data_timestamp is not None:
+                return
+            self.__first_data_timestamp = time.time()
+            if self.__running_flag:
+                self.__schedule()
+
+    def after_fork(self) -> None:
+        """ Forgets the deadline of the parent process in a forked child.
+
+        :return:
+        """
+        self.__lock = Lock()
+        self.__handle = None
+        self.__loop_wait = None
+        self.__first_data_timestamp = None
 
     def stop(self):
-        """ Interrupts completely the Thread execution.
+        """ Cancels the flush of the buffer and stops the flusher.
 
         :return:
         """
-        self.__running_flag = False
-        if not self.__wait_object.is_set():
-            self.__wait_object.set()
+        with self.__lock:
+            self.__running_flag = False
+            self.timer.cancel(self.__handle)
+            self.__handle = None
 
     def wait(self) -> None:
-        """ Sets the thread in a "forever" wait status.
+        """ Cancels the deadline, nothing is flushed until the next "initialize_timestamp".
 
         :return:
         """
+        with self.__lock:
+            self.__loop_wait = None
+            self.__first_data_timestamp = None
+            self.timer.cancel(self.__handle)
+            self.__handle = None
 
-        self.__loop_wait = None
-        self.__first_data_timestamp = None
-        if not self.__wait_object.is_set():
-            self.__wait_object.set()
+
+class ZipBatch:
+    """Gzip stream fed event by event while the zipped delivery is being built.
+
+    Every event is passed to a long-lived compressor as soon as it arrives, so
+    there is no big compression pause when the batch is sent: only the final
+    `finish()` of the stream remains. The raw events are kept as a list of
+    references (no copies) so they can be recovered if the delivery fails.
+    """
+
+    def __init__(self, compression_level: int = -1):
+        self.compression_level: int = compression_level
+        self.length: int = 0
+        """Compressed bytes produced so far"""
+        self.raw_length: int = 0
+        """Raw bytes fed to the compressor so far"""
+        self.started: float = 0.0
+        """Time the first event was added"""
+        self.compress_time: float = 0.0
+        """Seconds spent compressing so far"""
+        self.__compressor = zlib.compressobj(compression_level, zlib.DEFLATED, 31)
+        self.__zipped: list = []
+        self.__chunks: list = []
+
+    def add(self, msg: bytes) -> None:
+        """Compress one event into the stream
+
+        :param msg: Already framed event, as bytes
+        """
+        if not self.raw_length:
+            self.started = time.time()
+        self.__chunks.append(msg)
+        self.raw_length += len(msg)
+        start = time.perf_counter()
+        zipped = self.__compressor.compress(msg)
+        self.compress_time += time.perf_counter() - start
+        if zipped:
+            self.__zipped.append(zipped)
+            self.length += len(zipped)
+
+    @property
+    def text(self) -> bytes:
+        """Raw (uncompressed) content of the batch"""
+        return b"".join(self.__chunks)
+
+    def finish(self) -> bytes:
+        """Close the gzip stream
+
+        :return: Complete gzip member with every event added to the batch
+        """
+        start = time.perf_counter()
+        self.__zipped.append(self.__compressor.flush())
+        self.compress_time += time.perf_counter() - start
+        return b"".join(self.__zipped)
 
 
 class SenderBuffer:
-    """Micro class for buffer values"""
+    """Micro class for buffer values
+
+    The buffer compresses the events while they are added. `length` is the
+    flush threshold and it is measured in compressed bytes. With
+    `compression_workers`, the events are compressed in pieces by several
+    threads (see `ParallelZipBatch`).
+    """
 
     def __init__(self):
         self.length: int = 19500
-        self.compression_level: int = -1
-        self.text_buffer: bytes = b""
+        self.__compression_level: int = -1
+        self.compression_workers: int = 0
+        """Threads compressing the buffer in parallel, 0 compresses it in the
+        thread that adds the events"""
+        self.chunk_size: int = DEFAULT_CHUNK_SIZE
+        """Raw bytes of each piece compressed in parallel"""
+        self.__batch = self.__new_batch()
         self.__events: int = 0
         self.__buffer_flusher = SenderBufferFlusher()
         self.__buffer_flusher_is_started: bool = False
         self.use_buffer_flusher: bool = False
 
+    @property
+    def compression_level(self) -> int:
+        return self.__compression_level
+
+    @compression_level.setter
+    def compression_level(self, level: int):
+        # Validate before storing it, zlib raises an error for invalid levels
+        ZipBatch(level)
+        self.__compression_level = level
+        if not self.__batch.raw_length:
+            self.__batch = self.__new_batch()
+
+    def __new_batch(self):
+        if self.compression_workers:
+            return ParallelZipBatch(
+                self.__compression_level, self.compression_workers, self.chunk_size
+            )
+        return ZipBatch(self.__compression_level)
+
+    def parallel(self, workers: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        """Set the parallel compression of the buffer. It applies from the
+        next batch if the current one has content
+
+        :param workers: Compression threads, 0 disables parallel compression
+        :param chunk_size: Raw bytes of each piece compressed in parallel
+        """
+        if workers < 0 or chunk_size <= 0:
+            raise ValueError("workers must be 0 or more and chunk_size greater than 0")
+        self.compression_workers = workers
+        self.chunk_size = chunk_size
+        if not self.__batch.raw_length:
+            self.__batch = self.__new_batch()
+
+    @property
+    def text_buffer(self) -> bytes:
+        """Raw content of the buffer, not yet compressed"""
+        return self.__batch.text
+
+    @text_buffer.setter
+    def text_buffer(self, text_buffer: bytes):
+        self.__batch = self.__new_batch()
+        if text_buffer:
+            self.__batch.add(text_buffer)
+
+    @property
+    def compressed_length(self) -> int:
+        """Compressed bytes accumulated in the buffer"""
+        return self.__batch.length
+
+    @property
+    def raw_length(self) -> int:
+        """Raw bytes accumulated in the buffer"""
+        return self.__batch.raw_length
+
+    def add(self, msg: bytes) -> None:
+        """Compress and append one event to the buffer. It does not count
+        the event, `events` must be updated by the caller.
+
+        :param msg: Already framed event, as bytes
+        """
+        self.__batch.add(msg)
+
+    def swap(self):
+        """Take the batch being filled, without finishing its compression,
+        and start a new one. It does not reset `events`
+
+        :return: ZipBatch or ParallelZipBatch with the content of the buffer
+        """
+        batch = self.__batch
+        self.__batch = self.__new_batch()
+        return batch
+
+    def take(self) -> bytes:
+        """Finish the compression of the buffer content and start a new one
+
+        :return: Gzip compressed content of the buffer
+        """
+        return self.swap().finish()
+
+    def clear(self) -> None:
+        """Discard the content of the buffer"""
+        self.__batch = self.__new_batch()
+        self.events = 0
+
     @property
     def events(self) -> int:
         return self.__events
@@ -430,18 +899,29 @@ class SenderBuffer:
         :return:
         """
         if self.use_buffer_flusher:
-            if not self.__buffer_flusher_is_started:
-                self.__buffer_flusher_is_started = True
-                self.__buffer_flusher.start()
+            self.__start_flusher()
 
             if self.__events == 0 and number_of_events > 0:
-                self.__buffer_flusher.initialize_timestamp()
+                # It can be already scheduled for events staged by a thread
+                self.__buffer_flusher.arm()
 
             elif number_of_events == 0:
                 self.__buffer_flusher.wait()
 
         self.__events = number_of_events
 
+    def __start_flusher(self):
+        if not self.__buffer_flusher_is_started:
+            self.__buffer_flusher_is_started = True
+            self.__buffer_flusher.start()
+
+    def schedule_flush(self) -> None:
+        """Schedule the flush of the buffer after the timeout, if it is not
+        already scheduled, for events that are not yet in the buffer"""
+        if self.use_buffer_flusher:
+            self.__start_flusher()
+            self.__buffer_flusher.arm()
+
     @property
     def buffer_flusher_func(self) -> Callable:
         return self.__buffer_flusher.flush_buffer_func
@@ -458,6 +938,12 @@ class SenderBuffer:
     def buffer_timeout(self, timeout: float):
         self.__buffer_flusher.buffer_timeout = timeout
 
+    def after_fork(self) -> None:
+        """Discard the content of the buffer in a forked child, it is sent by
+        the parent process"""
+        self.__buffer_flusher.after_fork()
+        self.clear()
+
     def close(self) -> None:
         self.__buffer_flusher.stop()
 
@@ -474,6 +960,14 @@ class Sender(logging.Handler):
      restarted before reaching
     :param debug: For more info in console/logger output
     :param logger: logger. Default sys.console
+    :param spool: `Spool` or directory of the spool. With a spool, the
+     events are written to disk first and delivered by a background thread,
+     so they survive relay outages and restarts
+    :param inflight_buffers: Full zip buffers that can be waiting to be
+     compressed and sent by a background worker. 0 compresses and sends them
+     in the thread that fills the buffer
+    :param max_write_size: Maximum bytes written to the socket by each call.
+     None or 0 writes as much as the socket accepts
     """
 
     def __init__(
@@ -485,24 +979,48 @@ class Sender(logging.Handler):
         debug=False,
         logger=None,
         buffer_timeout: float = 10.0,
-        use_buffer_flusher: bool = False
+        use_buffer_flusher: bool = False,
+        spool=None,
+        inflight_buffers: int = 0,
+        max_write_size: Optional[int] = 1024 * 1024,
     ):
         if config is None:
             raise DevoSenderException(ERROR_MSGS.PROBLEMS_WITH_SENDER_ARGS)
 
         self.socket = None
+        self.__watch = None
+        self.__tls_address = None
+        self.rotation_lead: Optional[float] = None
+        self.__spare: Optional[PreparedConnection] = None
+        self.__spare_lock = Lock()
+        self.__preparing = False
+        self.__rotation_handle: Optional[TimerHandle] = None
+        self.__generation = 0
+        self.spool: Optional[Spool] = None
+        self.__shipper: Optional[SpoolShipper] = None
+        self.__pipeline: Optional[ZipPipeline] = None
+        self.__write_lock = Lock()
         self.reconnection = 0
         self.debug = debug
         self.socket_timeout = timeout
         self.inactivity_timeout = inactivity_timeout
         self.socket_max_connection = 3600 * 1000
+        self.max_write_size = max_write_size
         self.last_message = int(time.time())
         self.buffer = SenderBuffer()
         self.buffer.buffer_timeout = buffer_timeout
         self.buffer.buffer_flusher_func = self.flush_buffer
         self.buffer.use_buffer_flusher = use_buffer_flusher
         self.logging = {}
-        self.buffer_lock = Lock()
+        # Reentrant: the autotuner updates the buffer from flush_buffer
+        self.buffer_lock = RLock()
+        self.autotuner: Optional[ZipAutotuner] = None
+        self.staging: Optional[ThreadStaging] = None
+        self.zipped_raw_bytes: int = 0
+        """Raw bytes of the events of the zip buffers sent"""
+        self.zipped_bytes: int = 0
+        """Compressed bytes of the zip buffers sent"""
+        _senders.add(self)
 
         self.timestart = time.time()
         if isinstance(config, (dict, Configuration)):
@@ -530,118 +1048,240 @@ class Sender(logging.Handler):
                 "{}.".format(self._sender_config.sec_level)
             )
 
-        if isinstance(config, SenderConfigSSL):
-            self.__connect_ssl()
+        if spool is None:
+            self.__connect()
+        else:
+            self.spool = spool if isinstance(spool, Spool) else Spool(spool)
+            try:
+                self.__connect()
+            except DevoSenderException as error:
+                # The events are kept in the spool until the relay is available
+                self.logger.warning("Spooling events, relay not available: %s" % error)
+            self.__shipper = SpoolShipper(self.spool, self.__write_raw)
 
-        if isinstance(config, SenderConfigTCP):
-            self.__connect_tcp_socket()
+        if inflight_buffers > 0:
+            self.__pipeline = ZipPipeline(self.__send_batch, inflight_buffers)
 
     def __del__(self):
         self.close()
 
     def __connect(self):
-        if isinstance(self._sender_config, SenderConfigSSL):
-            self.__connect_ssl()
-        if isinstance(self._sender_config, SenderConfigTCP):
-            self.__connect_tcp_socket()
-
-    def __connect_tcp_socket(self):
-        """
-        Connect to TCP socket
-        :return:
-        """
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.settimeout(self.socket_timeout)
+        # A connection prepared in the background is used if it is still fresh
+        if self.rotation_lead and self.__take_spare():
+            return
+        self.__install(*self.__open())
+        self.__schedule_rotation()
+
+    def __open(self) -> tuple:
+        """
+        Open a new connection, to the address of the configuration or to the
+        preferred relay that accepts it. It is not installed as the socket of
+        the Sender, so it can be opened in the background
+
+        :return: (socket, address)
+        """
+        relays = getattr(self._sender_config, "relays", None)
+        if relays is None:
+            address = self._sender_config.address
+            return self.__open_to(address), address
+
+        # Try the relays in order of preference until one of them accepts
+        # the connection, recording the latency or the failure of each one
+        error = None
+        for endpoint in relays.candidates():
+            start = time.perf_counter()
+            try:
+                sock = self.__open_to(endpoint.address)
+            except DevoSenderException as exc:
+                error = exc
+                relays.record_failure(endpoint, exc)
+                if self.debug:
+                    self.logger.debug("Relay %s:%s failed: %s" % (*endpoint.address, exc))
+                continue
+            relays.record_success(endpoint, time.perf_counter() - start)
+            return sock, endpoint.address
+        raise error
+
+    def __open_to(self, address):
+        """
+        Open a connection through the transport of the configuration
+
+        :param address: Where to connect
+        :return: Connected socket, or Sink
+        """
+        config = self._sender_config
+        if not isinstance(config, SenderTransport):
+            raise DevoSenderException(ERROR_MSGS.SOCKET_CANT_CONNECT_UNKNOWN_ERROR)
         try:
-            self.socket.connect(self._sender_config.address)
-            self.last_message = int(time.time())
-        except socket.error as error:
-            self.close()
+            sock = config.connect(address, self.socket_timeout, self.logger)
+        except DevoSenderException:
+            raise
+        except OSError as error:
             raise DevoSenderException(
-                ERROR_MSGS.TCP_CONN_ESTABLISHMENT_SOCKET % str(error)
+                ERROR_MSGS.TRANSPORT_CONN_ESTABLISHMENT % (config.name, str(error))
             ) from error
+        if self.debug and isinstance(sock, ssl.SSLSocket):
+            self.logger.debug(
+                "Conected to %s|%s|session reused: %s"
+                % (repr(sock.getpeername()), str(self.reconnection + 1), sock.session_reused)
+            )
+        return sock
 
-        self.timestart = int(round(time.time() * 1000))
-        self.socket.setblocking(False)
-
-    def __connect_ssl(self):
+    def __install(self, sock, address, watch=None, opened=None):
         """
-        Connect to SSL socket.
+        Make a connection the socket of the Sender
 
+        :param sock: Connected socket
+        :param address: (address, port) of the connection
+        :param watch: ConnectionWatch of the socket, if it is already watched
+        :param opened: time.time() when it was connected. Default: now
         """
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.settimeout(self.socket_timeout)
-        try:
-            if self._sender_config.pkcs is not None:
-                from .pfx_to_pem import pfx_to_pem
+        opened = time.time() if opened is None else opened
+        self.__generation += 1
+        self.socket = sock
+        self.__tls_address = address
+        if getattr(self._sender_config, "relays", None) is not None:
+            self._sender_config.address = address
+        if isinstance(sock, ssl.SSLSocket):
+            self.reconnection += 1
+        self.last_message = int(opened)
+        self.timestart = int(round(opened * 1000))
+        self.__watch = watch if watch is not None else self.__watch_connection(sock)
 
-                pkcs = self._sender_config.pkcs
-                key, cert, chain = pfx_to_pem(
-                    path=pkcs.get("path", None), password=pkcs.get("password", None)
-                )
+    @staticmethod
+    def __watch_connection(sock):
+        # Sinks are not sockets, nothing can close them from the other side
+        if isinstance(sock, Sink):
+            return None
+        return ConnectionMonitor.get().watch(sock)
+
+    def __rotation_delay(self) -> float:
+        """Seconds until the replacement of the connection has to be opened:
+        `rotation_lead` seconds before its maximum age or its inactivity
+        timeout. Half the inactivity timeout at most, so an idle connection
+        is not replaced right after it is opened"""
+        age_deadline = (self.timestart + self.socket_max_connection) / 1000 - self.rotation_lead
+        idle_deadline = self.last_message + self.inactivity_timeout - min(
+            self.rotation_lead, self.inactivity_timeout / 2
+        )
+        return min(age_deadline, idle_deadline) - time.time()
+
+    def __schedule_rotation(self, delay: Optional[float] = None):
+        if not self.rotation_lead:
+            return
+        with self.__spare_lock:
+            if self.socket is None:
+                return
+            shared_timer().cancel(self.__rotation_handle)
+            self.__rotation_handle = shared_timer().schedule(
+                self.__rotation_delay() if delay is None else delay,
+                partial(_call_if_alive, weakref.WeakMethod(self.__rotation_due), self.__generation),
+            )
 
-                self._sender_config.key = key.name
-                self._sender_config.cert = cert.name
-                self._sender_config.chain = chain.name
-        except Exception as error:
-            self.close()
-            raise DevoSenderException(
-                ERROR_MSGS.PFX_CERTIFICATE_READ_FAILED % str(error)
-            ) from error
-        try:
+    def __rotation_due(self, generation: int):
+        """Timer callback: opens the replacement of the connection in the
+        background when its deadline is near"""
+        with self.__spare_lock:
+            self.__rotation_handle = None
             if (
-                self._sender_config.key is not None
-                and self._sender_config.chain is not None
-                and self._sender_config.cert is not None
+                not self.rotation_lead
+                or generation != self.__generation
+                or self.socket is None
+                or self.__preparing
+                or self.__spare is not None
             ):
-                context = ssl.create_default_context(cafile=self._sender_config.chain)
-                context.options |= ssl.OP_NO_SSLv2
-                context.options |= ssl.OP_NO_SSLv3
-                context.minimum_version = ssl.TLSVersion.TLSv1_2
-                context.maximum_version = ssl.TLSVersion.TLSv1_3
-
-                if self._sender_config.sec_level is not None:
-                    context.set_ciphers(
-                        "DEFAULT@SECLEVEL={!s}".format(self._sender_config.sec_level)
-                    )
-
-                context.check_hostname = self._sender_config.check_hostname
-
-                if self._sender_config.verify_mode is not None:
-                    context.verify_mode = self._sender_config.verify_mode
-                context.load_cert_chain(
-                    keyfile=self._sender_config.key, certfile=self._sender_config.cert
-                )
-                self.socket = context.wrap_socket(
-                    self.socket, server_hostname=self._sender_config.address[0]
-                )
-            else:
-                context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
-                context.check_hostname = False
-                context.verify_mode = ssl.CERT_NONE
-                context.options |= ssl.OP_NO_SSLv2
-                context.options |= ssl.OP_NO_SSLv3
-                context.minimum_version = ssl.TLSVersion.TLSv1_2
-                context.maximum_version = ssl.TLSVersion.TLSv1_3
-                self.logger.warning("One or more of CA certificate, private or public certificate is not provided"
-                                    " and TLS unsecure connection is established")
-                self.socket = context.wrap_socket(self.socket)
-
-            self.socket.connect(self._sender_config.address)
-            self.last_message = int(time.time())
-            self.reconnection += 1
-            if self.debug:
-                self.logger.debug(
-                    "Conected to %s|%s" % (repr(self.socket.getpeername()), str(self.reconnection))
-                )
-            self.timestart = int(round(time.time() * 1000))
-            self.socket.setblocking(False)
+                return
+            delay = self.__rotation_delay()
+            if delay <= 0:
+                self.__preparing = True
+                rotation_executor().submit(self.__prepare_spare, generation)
+                return
+        # There was activity since it was scheduled, the deadline moved
+        self.__schedule_rotation(delay)
+
+    def __prepare_spare(self, generation: int):
+        """Open the replacement of the connection, in a rotation thread"""
+        try:
+            sock, address = self.__open()
+        except Exception as error:
+            # The next write connects as usual
+            with self.__spare_lock:
+                self.__preparing = False
+            log.warning("Devo-Sender|the replacement connection could not be opened: %s", error)
+            return
+        spare = PreparedConnection(sock, address, self.__watch_connection(sock))
+        with self.__spare_lock:
+            self.__preparing = False
+            if generation == self.__generation and self.rotation_lead:
+                spare, self.__spare = None, spare
+        if spare is not None:
+            # The Sender was closed or reconnected in the meantime
+            self.__close_socket(spare.socket, spare.watch, spare.address)
+        elif self.debug:
+            self.logger.debug("Replacement connection ready|%s" % repr(address))
+
+    def __take_spare(self) -> bool:
+        """
+        Install the connection prepared in the background, if it is still
+        usable. It must be called with the write lock held
+
+        :return: True if it was installed
+        """
+        with self.__spare_lock:
+            spare, self.__spare = self.__spare, None
+        if spare is None:
+            return False
+        usable = spare.is_fresh(self.inactivity_timeout)
+        if usable and spare.watch is not None and spare.watch.triggered:
+            # With TLS 1.3 the session tickets arrive after the handshake, so
+            # something to read does not mean that it was closed
+            usable = not self.__check_EOF(spare.socket)
+            if usable:
+                ConnectionMonitor.get().rearm(spare.watch)
+        if not usable:
+            closing_executor().submit(self.__close_socket, spare.socket, spare.watch, spare.address)
+            return False
+        self.__install(spare.socket, spare.address, spare.watch, spare.opened)
+        # It is taken to write, so it is not idle any more
+        self.last_message = int(time.time())
+        self.__schedule_rotation()
+        if self.debug:
+            self.logger.debug("Switched to the replacement connection|%s" % repr(spare.address))
+        return True
 
-        except socket.error as error:
-            self.close()
-            raise DevoSenderException(
-                ERROR_MSGS.SSL_CONN_ESTABLISHMENT_SOCKET % str(error)
-            ) from error
+    def __stop_rotation(self):
+        """Cancel the rotation in progress and close the prepared connection"""
+        with self.__spare_lock:
+            self.__generation += 1
+            shared_timer().cancel(self.__rotation_handle)
+            self.__rotation_handle = None
+            spare, self.__spare = self.__spare, None
+        if spare is not None:
+            self.__close_socket(spare.socket, spare.watch, spare.address)
+
+    def connection_rotation(self, lead: Optional[float] = DEFAULT_ROTATION_LEAD):
+        """
+        Replace the connection before it expires (`socket_max_connection` or
+        `inactivity_timeout`) without stopping the sending: the replacement
+        is opened in the background `lead` seconds before, the next write
+        switches to it and the old connection is drained and closed in the
+        background. Connections closed on expiry without a replacement ready
+        are also closed in the background.
+
+        :param lead: Seconds before the deadline. 0 or None disables it
+        :return True or False
+        """
+        try:
+            with self.__write_lock:
+                if not lead:
+                    self.rotation_lead = None
+                    self.__stop_rotation()
+                else:
+                    self.rotation_lead = lead
+                    self.__schedule_rotation()
+            return True
+        except Exception:
+            return False
 
     def info(self, msg):
         """
@@ -692,6 +1332,50 @@ class Sender(logging.Handler):
                       DeprecationWarning, stacklevel=2)
         self._sender_config.check_hostname = check_hostname
 
+    def autotune_zip(self, latency_target=1.0, **kwargs):
+        """
+        Adjust the buffer size and the compression level at runtime from the
+        measurements of the zip buffers sent, to send as many events as
+        possible within a latency target. See `ZipAutotuner`.
+
+        :param latency_target: Maximum seconds an event should wait in the
+         buffer. None disables the autotuning
+        :param kwargs: Limits of the autotuning: min_length, max_length,
+         min_level, max_level and window
+        :return True or False
+        """
+        try:
+            with self.buffer_lock:
+                if latency_target is None:
+                    self.autotuner = None
+                else:
+                    self.autotuner = ZipAutotuner(
+                        latency_target,
+                        inflight=self.__pipeline.inflight if self.__pipeline else 0,
+                        **kwargs
+                    )
+            return True
+        except Exception:
+            return False
+
+    def thread_staging(self, size=DEFAULT_STAGING_SIZE):
+        """
+        Stage the zipped events of each thread in its own buffer, merged
+        into the zip buffer every `size` raw bytes and when the buffer is
+        flushed, so the threads sharing the Sender do not wait for each
+        other on every event. See `ThreadStaging`.
+
+        :param size: Raw bytes staged by each thread. 0 or None disables it
+        :return True or False
+        """
+        try:
+            with self.buffer_lock:
+                self.__merge_staged()
+                self.staging = ThreadStaging(size) if size else None
+            return True
+        except Exception:
+            return False
+
     def buffer_size(self, size=19500):
         """
         Set buffer size for Sender:
@@ -729,6 +1413,28 @@ class Sender(logging.Handler):
         except Exception:
             return False
 
+    def parallel_compression(self, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Compress the zipped data with several threads, in the style of pigz.
+
+        The buffer is split at event boundaries in pieces of chunk_size raw
+        bytes, compressed at the same time as independent gzip members and
+        sent concatenated, which is a valid gzip stream.
+
+        :param workers: Compression threads. Default: number of CPUs. 0
+         disables the parallel compression
+        :param chunk_size: Raw bytes of each piece. Default 128 KiB
+        :return True or False
+        """
+        try:
+            with self.buffer_lock:
+                if workers is None:
+                    workers = os.cpu_count() or 1
+                self.buffer.parallel(workers, chunk_size)
+            return True
+        except Exception:
+            return False
+
     def __status(self):
         """
         View Socket status, check if it's open
@@ -737,203 +1443,417 @@ class Sender(logging.Handler):
         if self.socket is None:
             return False
 
+        # Make before break: the replacement is already connected, switch
+        # to it and close the old connection in the background
+        if self.rotation_lead and self.__spare is not None and self.__rotation_delay() <= 0:
+            self.__disconnect(background=True)
+            return self.__take_spare()
+
         if self.socket_max_connection < timeit:
-            self.close()
+            self.__disconnect(background=bool(self.rotation_lead))
             return False
 
         # If there is no activity (connection or message sent) for an amount of time bigger
         # then the inactivity timeout, the balancer may have already close the connection.
         # Close it and reconnect.
         if int(time.time()) - self.last_message > self.inactivity_timeout:
-            self.close()
+            self.__disconnect(background=bool(self.rotation_lead))
             return False
 
-        # If no data, EOF and channel is closed
-        if self.__check_EOF():
-            # Restart connection
-            self.close()
-            return False
+        # The connection monitor flags the connection when there is something
+        # to read on it, only then it has to be checked
+        if self.__watch is not None and self.__watch.triggered:
+            # If no data, EOF and channel is closed
+            if self.__check_EOF(self.socket):
+                # Restart connection
+                self.__disconnect()
+                return False
+            if isinstance(self.socket, ssl.SSLSocket):
+                # With TLS 1.3 the session tickets arrive after the handshake,
+                # the session to resume is the one after reading them
+                self._sender_config.set_tls_session(self.__tls_address, self.socket.session)
+            ConnectionMonitor.get().rearm(self.__watch)
 
         return True
 
     def close(self):
         """
-        Forces socket closure
+        Forces socket closure. With a spool, its delivery thread is stopped
+        and the events not yet delivered stay in it
         """
+        if self.__pipeline is not None:
+            pipeline, self.__pipeline = self.__pipeline, None
+            pipeline.stop()
+        if self.__shipper is not None:
+            shipper, self.__shipper = self.__shipper, None
+            shipper.stop()
         self.buffer.close()
-        if self.socket is not None:
-            try:
-                self.socket.shutdown(SHUT_WR)
-                self.__wait_for_EOF()
-            except Exception:  # Try else continue
-                log.warning(ERROR_MSGS.CLOSING_ERROR)
-            finally:
-                self.socket.close()
-                self.socket = None
+        self.__stop_rotation()
+        self.__disconnect()
+
+    def _after_fork(self):
+        """
+        Called in the child process after a fork. The child does not use the
+        connection, the buffers or the threads of the parent: the socket is
+        closed without shutting it down, which would also end the connection
+        of the parent, and it is opened again by the next send. The events
+        buffered by the parent are sent by the parent only. A spool cannot be
+        written by two processes, so the child sends its events directly
+        """
+        self.__write_lock = Lock()
+        self.buffer_lock = RLock()
+        self.__watch = None
+        self.__spare_lock = Lock()
+        self.__preparing = False
+        self.__rotation_handle = None
+        self.__generation += 1
+        spare, self.__spare = self.__spare, None
+        for sock in (self.socket, spare.socket if spare is not None else None):
+            if sock is not None:
+                try:
+                    sock.close()
+                except Exception:
+                    pass
+        self.socket = None
+        self.buffer.after_fork()
+        if self.staging is not None:
+            self.staging = ThreadStaging(self.staging.size)
+        if self.__pipeline is not None:
+            self.__pipeline = ZipPipeline(self.__send_batch, self.__pipeline.inflight)
+        if self.spool is not None:
+            log.warning("Devo-Sender|the spool of the parent process is not used after a fork")
+            self.spool = None
+            self.__shipper = None
+
+    def __disconnect(self, background: bool = False):
+        """
+        Close the socket, it is opened again by the next send
+
+        :param background: Drain and close it in a rotation thread, without
+         waiting for the endpoint
+        """
+        sock, watch, address = self.socket, self.__watch, self.__tls_address
+        self.socket = None
+        self.__watch = None
+        if sock is None:
+            ConnectionMonitor.get().unwatch(watch)
+        elif background:
+            closing_executor().submit(self.__close_socket, sock, watch, address)
+        else:
+            self.__close_socket(sock, watch, address)
+
+    def __close_socket(self, sock, watch, address):
+        """
+        Close a connection after the endpoint closes its side
+        :param sock: Socket to close
+        :param watch: ConnectionWatch of the socket or None
+        :param address: (address, port) of the connection
+        """
+        ConnectionMonitor.get().unwatch(watch)
+        if isinstance(sock, ssl.SSLSocket):
+            self.__keep_tls_session(sock, address)
+        try:
+            sock.shutdown(SHUT_WR)
+            self.__wait_for_EOF(sock)
+        except Exception:  # Try else continue
+            log.warning(ERROR_MSGS.CLOSING_ERROR)
+        finally:
+            sock.close()
+
+    def __keep_tls_session(self, sock, address):
+        """
+        Keep the TLS session of the socket before closing it. With TLS 1.3 the
+        session tickets arrive after the handshake, so the data pending in the
+        socket is read (and discarded) first
+        """
+        try:
+            sock.setblocking(False)
+            while sock.recv(65536):
+                pass
+        except (ssl.SSLWantReadError, BlockingIOError):
+            pass
+        except (ssl.SSLError, OSError, ValueError):
+            return
+        try:
+            if address is not None:
+                self._sender_config.set_tls_session(address, sock.session)
+        except (ssl.SSLError, OSError, ValueError):
+            pass
 
     @staticmethod
     def __encode_multiline(record):
-        try:
-            record = Sender.__encode_record(record)
-            return b"%d %s" % (len(record), record)
-        except Exception as error:
-            raise DevoSenderException(ERROR_MSGS.MULTILINE_SENDING_ERROR % str(error)) from error
+        return encode_multiline(record)
 
     @staticmethod
     def __encode_record(record):
-        """
-        Class for encode the record for correct send
-        :param record: the record to encode
-        :return: record encoded for PY3
-        """
-        if not isinstance(record, bytes):
-            return record.encode("utf-8", "replace")
-        return record
+        return encode_record(record)
 
     def __send_oc(self, record):
-        msg_size = len(record)
-        sent = 0
-        total = int(msg_size / 4096)
-        if msg_size % 4096 > 0:
-            total += 1
-        for iteration in range(0, total):
-            part = record[int(iteration * 4096) : int((iteration + 1) * 4096)]
-            self.__sendall(part)
-            self.last_message = int(time.time())
-            sent += len(part)
-        if sent == 0:
+        if not record:
             raise DevoSenderException(ERROR_MSGS.SEND_ERROR)
-        return sent
+        self.__sendall(record)
+        return len(record)
 
     def __sendall(self, content):
         """
-        Send content to endpoint dealing with blocking socket and SSL wrapper
+        Send content to endpoint dealing with blocking socket and SSL wrapper.
+        The content is written through memoryview slices of up to
+        max_write_size bytes, without copying it
         :param content: The content to be sent as event
-        :raises DevoSenderException: if data cannot be sent or timeout is reached before sending it
+        :raises DevoSenderException: if data cannot be sent or timeout is reached
+         without being able to write anything
         :return: No expected return
         """
+        view = memoryview(content).cast("B")
+        offset, size = 0, len(view)
         then = time.time()
-        # Is the channel ready for writing?
-        if select.select([], [self.socket], [], self.socket_timeout)[1]:
-            while True:
-                try:
-                    # Write it
-                    if self.socket.sendall(content) is not None:
-                        raise DevoSenderException(str(ERROR_MSGS.SEND_ERROR))
-                    else:
-                        return
-                except BlockingIOError as exc:
-                    # This is not blocking socket
-                    if exc.errno == errno.ECONNRESET:
-                        # A TCP RST implies error in channel
-                        raise IOError("Connection reset by endpoint") from exc
-                    elif exc.errno not in [errno.EAGAIN, errno.EWOULDBLOCK]:
-                        # Any other error but EAGAIN and EWOULDBLOCK here
-                        raise IOError("Error while accessing socket") from exc
-                    else:
-                        # errno.EAGAIN means nothing to get, but socket working
-                        pass
-                except SSLWantWriteError:
-                    # If the data is ready at socket OS level but not at
-                    # SSL wrapper level, this exception may raise
+        while offset < size:
+            try:
+                # Write it. With SSL, a write that has to be retried is
+                # retried with the same slice
+                end = size if not self.max_write_size else offset + self.max_write_size
+                offset += self.socket.send(view[offset:end])
+                self.last_message = int(time.time())
+                then = time.time()
+                continue
+            except BlockingIOError as exc:
+                # This is not blocking socket
+                if exc.errno == errno.ECONNRESET:
+                    # A TCP RST implies error in channel
+                    raise IOError("Connection reset by endpoint") from exc
+                elif exc.errno not in [errno.EAGAIN, errno.EWOULDBLOCK]:
+                    # Any other error but EAGAIN and EWOULDBLOCK here
+                    raise IOError("Error while accessing socket") from exc
+                else:
+                    # errno.EAGAIN means the socket is full, but working
                     pass
-                # Try while timeout not reached
-                if time.time() - self.socket_timeout >= then:
-                    raise DevoSenderException(ERROR_MSGS.ERROR_AFTER_TIMEOUT)
-        else:
-            raise DevoSenderException(ERROR_MSGS.ERROR_AFTER_TIMEOUT)
+            except SSLWantWriteError:
+                # If the data is ready at socket OS level but not at
+                # SSL wrapper level, this exception may raise
+                pass
+            # Wait for the channel to be ready for writing while timeout not reached
+            remaining = self.socket_timeout - (time.time() - then)
+            if remaining <= 0 or not wait_for_socket(self.socket, selectors.EVENT_WRITE, remaining):
+                raise DevoSenderException(ERROR_MSGS.ERROR_AFTER_TIMEOUT)
 
-    def __check_EOF(self):
+    def __check_EOF(self, sock):
         """
         Checks for EOF of the downstream channell to check whether endpoint closed connection
         If the channel was closed by the other endpoint (ingestion balancer)
         the reading of the download channel will return EOF. This is
-        checked by reading a ready buffer but getting no data, empty bytes
+        checked by reading a ready buffer but getting no data, empty bytes.
+        Any data sent by the endpoint is discarded.
+        :param sock: Socket to check
         :return: Whether the EOF is detected in downstream (True) or not (False)
         """
-        # Is the channel ready for reading?
-        if select.select([self.socket], [], [], 0)[0]:
-            while True:
-                try:
-                    # Read it
-                    buf = self.socket.recv(1)
-                    # If no data, EOF and channel is closed
-                    return buf == b""
-                except BlockingIOError as exc:
-                    # This is not blocking socket
-                    if exc.errno == errno.ECONNRESET:
-                        # A TCP RST implies error in channel
-                        raise IOError("Connection reset by endpoint") from exc
-                    elif exc.errno not in [errno.EAGAIN, errno.EWOULDBLOCK]:
-                        # Any other error but EAGAIN and EWOULDBLOCK here
-                        raise IOError("Error while accessing socket") from exc
-                    else:
-                        # errno.EAGAIN means nothing to get, but socket working
-                        # Nothing to read, everything is ok
-                        return False
-                except SSLWantReadError:
-                    # If the data is ready at socket OS level but not at
-                    # SSL wrapper level, this exception may raise
+        while True:
+            try:
+                # Read it
+                buf = sock.recv(65536)
+                # If no data, EOF and channel is closed
+                if buf == b"":
+                    return True
+            except BlockingIOError as exc:
+                # This is not blocking socket
+                if exc.errno == errno.ECONNRESET:
+                    # A TCP RST implies the channel is closed
+                    return True
+                elif exc.errno not in [errno.EAGAIN, errno.EWOULDBLOCK]:
+                    # Any other error but EAGAIN and EWOULDBLOCK here
+                    raise IOError("Error while accessing socket") from exc
+                else:
+                    # errno.EAGAIN means nothing to get, but socket working
                     # Nothing to read, everything is ok
                     return False
-        else:
-            return False
+            except SSLWantReadError:
+                # If the data is ready at socket OS level but not at
+                # SSL wrapper level, this exception may raise
+                # Nothing to read, everything is ok
+                return False
+            except ConnectionError:
+                # A TCP RST implies the channel is closed
+                return True
 
-    def __wait_for_EOF(self):
+    def __wait_for_EOF(self, sock):
         """
         Wait for the endpoint to close the downstream channel after client closed the upstream one
         The downstream channel is closed by the other endpoint, ingestion balancer,
         by sending EOF. This is checked by reading a ready buffer but getting no data, empty bytes
+        :param sock: Socket to read
         :raises DevoSenderException: if timeout is reached before sending it
         :return: Array of bytes with all the data send by endpoint until closing
         """
         then = time.time()
-        # Wait for the channel to be ready for reading (with timeout)
-        if select.select([self.socket], [], [], self.socket_timeout)[0]:
-            bytes = bytearray()
-            while True:
-                try:
-                    # Read it
-                    buf = self.socket.recv(1)
-                    # If no data, EOF and channel is closed
-                    if buf == b"":
-                        return bytes
-                    else:
-                        bytes.extend(buf)
-                except BlockingIOError as exc:
-                    # This is not blocking socket
-                    if exc.errno == errno.ECONNRESET:
-                        # A TCP RST implies error in channel
-                        raise IOError("Connection reset by endpoint") from exc
-                    elif exc.errno not in [errno.EAGAIN, errno.EWOULDBLOCK]:
-                        # Any other error but EAGAIN and EWOULDBLOCK here
-                        raise IOError("Error while accessing socket") from exc
-                    else:
-                        # errno.EAGAIN means nothing to get, but socket working
-                        pass
-                except SSLWantReadError:
-                    # If the data is ready at socket OS level but not at
-                    # SSL wrapper level, this exception may raise
+        bytes = bytearray()
+        while True:
+            try:
+                # Read it
+                buf = sock.recv(65536)
+                # If no data, EOF and channel is closed
+                if buf == b"":
+                    return bytes
+                else:
+                    bytes.extend(buf)
+            except BlockingIOError as exc:
+                # This is not blocking socket
+                if exc.errno == errno.ECONNRESET:
+                    # A TCP RST implies error in channel
+                    raise IOError("Connection reset by endpoint") from exc
+                elif exc.errno not in [errno.EAGAIN, errno.EWOULDBLOCK]:
+                    # Any other error but EAGAIN and EWOULDBLOCK here
+                    raise IOError("Error while accessing socket") from exc
+                else:
+                    # errno.EAGAIN means nothing to get, but socket working
                     pass
-                # Try while timeout not reached
-                if time.time() - self.socket_timeout >= then:
-                    raise DevoSenderException(ERROR_MSGS.ERROR_AFTER_TIMEOUT)
-        else:
-            raise DevoSenderException(ERROR_MSGS.ERROR_AFTER_TIMEOUT)
+            except SSLWantReadError:
+                # If the data is ready at socket OS level but not at
+                # SSL wrapper level, this exception may raise
+                pass
+            # Wait for the channel to be ready for reading while timeout not reached
+            remaining = self.socket_timeout - (time.time() - then)
+            if remaining <= 0 or not wait_for_socket(sock, selectors.EVENT_READ, remaining):
+                raise DevoSenderException(ERROR_MSGS.ERROR_AFTER_TIMEOUT)
 
     def send_raw(self, record, multiline=False, zip=False):
         """
-        Send raw messages to the collector
+        Send raw messages to the collector. With a spool, the message is
+        written to it and delivered later
 
         >>>con.send_raw('<14>Jan  1 00:00:00 MacBook-Pro-de-X.local'
         ...             'my.app.devo_sender.test: txt test')
 
         """
+        if self.spool is not None:
+            try:
+                self.spool.append(record, multiline=multiline, zip=zip)
+            except (OSError, ValueError) as error:
+                raise DevoSenderException(ERROR_MSGS.SPOOL_ERROR % str(error)) from error
+            return 1
+        return self.__write_raw(record, multiline, zip)
+
+    def send_zip_stream(self, chunks) -> int:
+        """
+        Send a zip frame that is already compressed, such as a member of a
+        gzip file of syslog events, given as consecutive chunks. The chunks
+        are written one after the other without any other write between
+        them and without reconnecting, so the frame is not split across
+        connections. With a spool, they are joined and written as one record
+
+        :param chunks: Iterable of bytes, the frame is their concatenation
+        :return: 1 if the frame was sent
+
+        >>>with open('events.log.gz', 'rb') as file:
+        ...     con.send_zip_stream(iter(lambda: file.read(1 << 20), b''))
+
+        See Also:
+            send_raw
+        """
+        if self.spool is not None:
+            return self.send_raw(b"".join(chunks), zip=True)
+        with self.__write_lock:
+            sent = self.__write_frame(chunks)
+        if self.debug:
+            self.logger.debug("sent|%d|zip stream" % sent)
+        return 1
+
+    def send_multiline_stream(self, length: int, chunks) -> int:
+        """
+        Send a multiline event of `length` bytes given as consecutive chunks,
+        such as the fixed-size reads of a file, framed with octet counting.
+        The chunks are written as they come, so the event is never held in
+        memory, without any other write between them and without
+        reconnecting. With a spool, they are joined and written as one record
+
+        :param length: Bytes of the event, the sum of the chunks
+        :param chunks: Iterable of bytes
+        :return: 1 if the event was sent
+
+        >>>size = os.path.getsize('stacktrace.log')
+        >>>with open('stacktrace.log', 'rb') as file:
+        ...     con.send_multiline_stream(size, iter(lambda: file.read(1 << 20), b''))
+
+        See Also:
+            send_raw, send_multiline_file
+        """
+        if self.spool is not None:
+            return self.send_raw(b"".join(_exactly(chunks, length)), multiline=True)
+        with self.__write_lock:
+            sent = self.__write_frame(_exactly(chunks, length), b"%d " % length)
+        if self.debug:
+            self.logger.debug("sent|%d|multiline stream" % sent)
+        return 1
+
+    def __write_frame(self, chunks, header: bytes = b"", connect: bool = True) -> int:
+        """
+        Write a frame given as consecutive chunks, connecting first if needed.
+        It must be called with the write lock held. The header is joined to
+        the first chunk when it is small, and written on its own otherwise
+        :param chunks: Iterable of bytes
+        :param header: Bytes written before the chunks
+        :param connect: Check the connection first, connecting if needed
+        :return: Bytes written
+        """
+        if connect:
+            if not self.__status():
+                self.__connect()
+            if not self.socket:
+                raise DevoSenderException(ERROR_MSGS.SOCKET_CANT_CONNECT_UNKNOWN_ERROR)
+        sent = 0
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if header:
+                    if len(chunk) <= SMALL_WRITE_SIZE:
+                        chunk = header + chunk
+                    else:
+                        self.__sendall(header)
+                        sent += len(header)
+                    header = b""
+                self.__sendall(chunk)
+                sent += len(chunk)
+            if header:
+                # An empty frame
+                self.__sendall(header)
+                sent += len(header)
+        except Exception as error:
+            # A partial frame cannot be completed in another connection
+            self.__disconnect()
+            if isinstance(error, DevoSenderException):
+                raise
+            if isinstance(error, socket.error):
+                raise DevoSenderException(ERROR_MSGS.SOCKET_ERROR % str(error)) from error
+            raise DevoSenderException(ERROR_MSGS.RAW_SENDING_ERROR % str(error)) from error
+        if not sent:
+            raise DevoSenderException(ERROR_MSGS.SEND_ERROR)
+        return sent
+
+    def flush_spool(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every event written to the spool has been delivered
+
+        :param timeout: Maximum seconds to wait. None waits forever
+        :return: True if the spool is empty, or there is no spool
+        """
+        if self.spool is None:
+            return True
+        return self.spool.wait_empty(timeout)
+
+    def __write_raw(self, record, multiline=False, zip=False):
+        """
+        Write a raw message to the socket, connecting first if needed. The
+        zip worker and the spool delivery thread write from other threads
+        """
+        with self.__write_lock:
+            return self.__write_raw_locked(record, multiline, zip)
+
+    def __write_raw_locked(self, record, multiline, zip):
         try:
             if not self.__status():
                 self.__connect()
 
             if self.socket:
+                sent = 0
                 try:
                     if not multiline and not zip:
                         msg = self.__encode_record(record)
@@ -942,15 +1862,24 @@ class Sender(logging.Handler):
                         self.last_message = int(time.time())
                         return 1
                     if multiline:
-                        record = self.__encode_multiline(record)
+                        # The octet count is written before the event, so
+                        # big events are not copied to prepend it
+                        record = self.__encode_record(record)
+                        sent = self.__write_frame((record,), b"%d " % len(record), connect=False)
+                        return 1
 
                     sent = self.__send_oc(record)
                     if sent:
                         return 1
                     return 0
                 except socket.error as error:
-                    self.close()
+                    self.__disconnect()
                     raise DevoSenderException(ERROR_MSGS.SOCKET_ERROR % str(error)) from error
+                except BaseException:
+                    # A write that timed out (or was interrupted) can leave part
+                    # of a frame on the stream, the next one would corrupt it
+                    self.__disconnect()
+                    raise
                 finally:
                     if self.debug:
                         self.logger.debug("sent|%d|size|%d|msg|%s" % (sent, len(record), record))
@@ -983,17 +1912,39 @@ class Sender(logging.Handler):
         """
         facility = kwargs.get("facility", FACILITY_USER)
         severity = kwargs.get("severity", SEVERITY_INFO)
+        hostname = kwargs.get("hostname")
         if kwargs.get("bytes", False):
             date = kwargs.get("date", b"Jan  1 00:00:00")
-            hostname = kwargs.get("hostname", socket.gethostname().encode("utf-8"))
+            if hostname is None:
+                hostname = local_hostname(bytes=True)
             log_format = kwargs.get("log_format", FORMAT_MY_BYTES)
         else:
             date = kwargs.get("date", "Jan  1 00:00:00")
-            hostname = kwargs.get("hostname", socket.gethostname())
+            if hostname is None:
+                hostname = local_hostname()
             log_format = kwargs.get("log_format", FORMAT_MY)
 
         return log_format % ((facility * 8) + severity, date, hostname, tag)
 
+    def channel(self, tag, **kwargs):
+        """
+        Creates a `SenderChannel` with the header of the tag already built,
+        to send many events of the same tag with the least work per event.
+
+        :param tag: table name
+        :param kwargs: Same optional fields of the header as `send`
+         (facility, severity, hostname, log_format, date), and timestamp:
+         True to use the current time as date, refreshed every second
+        :return: SenderChannel
+
+        >>>channel = con.channel(tag='my.app.devo_sender.test')
+        >>>channel.send(b'test of msg')
+
+        See Also:
+            send
+        """
+        return SenderChannel(self, tag, **kwargs)
+
     def send(self, tag, msg, **kwargs):
         """
         Creates the raw message and send.
@@ -1019,12 +1970,15 @@ class Sender(logging.Handler):
 
     def send_str(self, tag, msg, **kwargs):
         """
-        Send function when str, sure py 27. Cant be zip
+        Send function when str. When zipped (and not multiline), the event is
+        encoded once and added to the zip buffer
         """
         if msg[-1:] != "\n":
             msg += "\n"
 
         msg = COMPOSE % (self.compose_mem(tag, **kwargs), msg)
+        if kwargs.get("zip", False) and not kwargs.get("multiline", False):
+            return self.fill_buffer(msg.encode("utf-8", "replace"))
         return self.send_raw(msg, multiline=kwargs.get("multiline", False))
 
     def send_bytes(self, tag, msg, **kwargs):
@@ -1040,42 +1994,236 @@ class Sender(logging.Handler):
 
         return self.send_raw(msg, multiline=kwargs.get("multiline", False))
 
+    def send_many(self, tag, msgs, **kwargs):
+        """
+        Creates the raw messages and send all of them at once: the header is
+        composed only once, the connection is checked once and all the
+        events are written with a single call.
+
+        :param tag: table name
+        :param msgs: Iterable of messages to send (str or bytes)
+        :param kwargs: Same optional fields as `send`
+        :return: Number of events sent (or flushed from the zip buffer)
+
+        >>>con.send_many(tag='my.app.devo_sender.test', msgs=['one', 'two'])
+        See Also:
+            send, send_raw_many
+        """
+        records = self.__compose_many(tag, msgs, kwargs)
+        if kwargs.get("zip", False):
+            return self.fill_buffer_many(encode_record(record) for record in records)
+        return self.send_raw_many(list(records), multiline=kwargs.get("multiline", False))
+
+    def __compose_many(self, tag, msgs, kwargs):
+        """Compose the raw messages of send_many, with the header built once
+        for each type of message"""
+        header = header_bytes = None
+        for msg in msgs:
+            if isinstance(msg, bytes):
+                if header_bytes is None:
+                    header_bytes = self.compose_mem(tag, bytes=True, **kwargs)
+                msg = COMPOSE_BYTES % (header_bytes, msg)
+                if msg[-1:] != b"\n":
+                    msg += b"\n"
+            else:
+                if header is None:
+                    header = self.compose_mem(tag, **kwargs)
+                if msg[-1:] != "\n":
+                    msg += "\n"
+                msg = COMPOSE % (header, msg)
+            yield msg
+
+    def send_raw_many(self, records, multiline=False, zip=False):
+        """
+        Send several raw messages to the collector with a single write
+
+        :param records: Iterable of raw messages (str or bytes)
+        :param multiline: Frame every record with octet counting
+        :param zip: Records are already zipped frames
+        :return: Number of records sent
+
+        >>>con.send_raw_many(['<14>Jan  1 00:00:00 MacBook-Pro-de-X.local'
+        ...                   'my.app.devo_sender.test: txt test\n'] * 10)
+        """
+        encode = self.__encode_multiline if multiline else self.__encode_record
+        frames = [encode(record) for record in records]
+        if not frames:
+            return 0
+        if self.send_raw(b"".join(frames), zip=zip):
+            return len(frames)
+        return 0
+
     def fill_buffer(self, msg):
         """
         Internal method for fill buffer for be zipped and sent
         :param msg: bytes
-        :return: None
+        :return: Number of events sent, if the buffer was flushed
         """
         if msg[-1:] != b"\n":
             msg += b"\n"
 
+        staging = self.staging
+        if staging is not None:
+            full, first = staging.add(msg)
+            if not full:
+                if first:
+                    self.buffer.schedule_flush()
+                return 0
+            return self.__add_to_buffer([])
+        return self.__add_to_buffer([msg])
+
+    def fill_buffer_many(self, msgs):
+        """
+        Add several events to the zip buffer, taking its lock once per block
+        of up to the buffer length in raw bytes instead of once per event.
+        The buffer is flushed as it fills, as with `fill_buffer`
+
+        :param msgs: Iterable of framed events, as bytes
+        :return: Number of events sent by the flushes
+
+        >>>con.fill_buffer_many([b'<14>Jan  1 00:00:00 host my.app.test: one',
+        ...                      b'<14>Jan  1 00:00:00 host my.app.test: two'])
+        """
+        sent = 0
+        block, size = [], 0
+        for msg in msgs:
+            if msg[-1:] != b"\n":
+                msg += b"\n"
+            block.append(msg)
+            size += len(msg)
+            # Compressed, a block is always smaller than the buffer length
+            if size >= self.buffer.length:
+                sent += self.__add_to_buffer(block)
+                block, size = [], 0
+        if block:
+            sent += self.__add_to_buffer(block)
+        return sent
+
+    def __add_to_buffer(self, records: list) -> int:
+        """
+        Add events to the zip buffer, after the ones staged by the thread,
+        and send it if it is full
+        :param records: Framed events
+        :return: Number of events sent
+        """
         with self.buffer_lock:
-            self.buffer.text_buffer += msg
-            self.buffer.events += 1
-        if len(self.buffer.text_buffer) > self.buffer.length:
+            if self.staging is not None:
+                records = self.staging.take() + records
+            if not records:
+                # Already merged by a flush
+                return 0
+            self.buffer.add(records[0] if len(records) == 1 else b"".join(records))
+            self.buffer.events += len(records)
+            full = self.buffer.compressed_length > self.buffer.length
+            pipeline = self.__pipeline
+            if full and pipeline is not None:
+                # Swap the full buffer for an empty one, the worker compresses
+                # and sends it while other events are added. It is handed
+                # before releasing the lock, so the buffers keep their order
+                pipeline.submit(self.buffer.swap(), self.buffer.events, wait=False)
+                self.buffer.events = 0
+        if not full:
+            return 0
+        if pipeline is None:
             return self.flush_buffer()
+        pipeline.wait()
         return 0
 
     def flush_buffer(self):
         """
-        Method for flush-send buffer, its zipped and sent now
-        :return: None
+        Method for flush-send buffer, its zipped and sent now. With
+        inflight_buffers, it also waits for the buffers handed to the worker.
+        If the send fails, the events are kept in the buffer for the next
+        flush
+        :return: Number of events sent
         """
+        if self.__pipeline is not None:
+            return self.__flush_pipeline()
         with self.buffer_lock:
-            if self.buffer.text_buffer:
+            self.__merge_staged()
+            if self.buffer.raw_length:
+                events = self.buffer.events
+                batch = self.buffer.swap()
                 try:
-                    compressor = zlib.compressobj(self.buffer.compression_level, zlib.DEFLATED, 31)
-                    record = compressor.compress(self.buffer.text_buffer) + compressor.flush()
-                    if self.send_raw(record, zip=True):
-                        return self.buffer.events
-                    return 0
+                    sent = self.__send_batch(batch, events)
                 except Exception as error:
+                    # The lock is held, nothing was added since the swap
+                    self.buffer.text_buffer = batch.text
+                    self.buffer.schedule_flush()
                     raise DevoSenderException(ERROR_MSGS.FLUSHING_BUFFER_ERROR) from error
-                finally:
-                    self.buffer.text_buffer = b""
-                    self.buffer.events = 0
+                self.buffer.clear()
+                self.__staged_after_flush()
+                return events if sent else 0
             return 0
 
+    def __merge_staged(self):
+        """Merge the events staged by every thread into the buffer. Called
+        with the buffer lock held"""
+        if self.staging is not None:
+            records = self.staging.drain()
+            if records:
+                self.buffer.add(b"".join(records))
+                self.buffer.events += len(records)
+
+    def __staged_after_flush(self):
+        # Events staged while the buffer was sent have no flush scheduled
+        if self.staging is not None and self.staging.pending:
+            self.buffer.schedule_flush()
+
+    def __send_batch(self, batch, events):
+        """
+        Finish the compression of a zip batch and send it
+        :param batch: ZipBatch or ParallelZipBatch
+        :param events: Number of events of the batch
+        :return: 1 if it was sent
+        """
+        record = batch.finish()
+        start = time.perf_counter()
+        sent = self.send_raw(record, zip=True)
+        with self.buffer_lock:
+            self.zipped_raw_bytes += batch.raw_length
+            self.zipped_bytes += len(record)
+        if self.autotuner is not None:
+            self.__autotune(
+                ZipSample(
+                    events,
+                    batch.raw_length,
+                    len(record),
+                    time.time() - batch.started,
+                    batch.compress_time,
+                    time.perf_counter() - start,
+                    self.__pipeline.pending - 1 if self.__pipeline is not None else 0,
+                )
+            )
+        return sent
+
+    def __autotune(self, sample):
+        with self.buffer_lock:
+            autotuner = self.autotuner
+            if autotuner is None:
+                return
+            length, level = autotuner.observe(
+                sample, self.buffer.length, self.buffer.compression_level
+            )
+            self.buffer.length = length
+            if level != self.buffer.compression_level:
+                self.buffer.compression_level = level
+
+    def __flush_pipeline(self):
+        with self.buffer_lock:
+            self.__merge_staged()
+            pipeline, events = self.__pipeline, self.buffer.events
+            errors = pipeline.errors
+            handed = bool(self.buffer.raw_length)
+            if handed:
+                pipeline.submit(self.buffer.swap(), events, wait=False)
+                self.buffer.events = 0
+            self.__staged_after_flush()
+        pipeline.join()
+        if pipeline.errors != errors:
+            raise DevoSenderException(ERROR_MSGS.FLUSHING_BUFFER_ERROR) from pipeline.last_error
+        return events if handed else 0
+
     def get_buffer_info(self) -> dict:
         """
         Getter method for the buffer.
@@ -1083,6 +2231,7 @@ class Sender(logging.Handler):
         :return: dict with "events" and "text_buffer" values
         """
         with self.buffer_lock:
+            self.__merge_staged()
             return {
                 "events": self.buffer.events,
                 "text_buffer": self.buffer.text_buffer,
@@ -1101,30 +2250,33 @@ class Sender(logging.Handler):
             self.buffer.events = num_events
 
     @staticmethod
-    def for_logging(config=None, con_type=None, tag=None, level=None):
+    def for_logging(config=None, con_type=None, tag=None, level=None, queued=False, **kwargs):
         """Function for create Sender object from config file to use in
         logging handler
         :param config: config Devo file
         :param con_type: type of connection
         :param tag: tag for the table
         :param level: level of logger
-        :return: Sender object
+        :param queued: Return a `QueuedHandler` instead, that formats and
+         sends the records from a background thread
+        :param kwargs: Arguments of `QueuedHandler`, with `queued`
+        :return: Sender object, or QueuedHandler object with `queued`
         """
-        con = Sender(config=config, con_type=con_type)
-        if tag:
-            con.logging["tag"] = tag
-        elif isinstance(config, dict):
-            con.logging["tag"] = config.get("tag", "my.app.log")
-        else:
-            con.logging["tag"] = "my.app.log"
+        if not tag:
+            tag = config.get("tag", "my.app.log") if isinstance(config, dict) else "my.app.log"
+        if not level:
+            level = config.get("verbose_level", 10) if isinstance(config, dict) else logging.INFO
 
-        if level:
-            con.logging["level"] = level
-        elif isinstance(config, dict):
-            con.logging["level"] = config.get("verbose_level", 10)
-        else:
-            con.logging["level"] = logging.INFO
+        if queued:
+            from .queued import QueuedHandler
+
+            # The level is the facility of the events, as in `emit`
+            return QueuedHandler(config=config, con_type=con_type, tag=tag, facility=level,
+                                 **kwargs)
 
+        con = Sender(config=config, con_type=con_type)
+        con.logging["tag"] = tag
+        con.logging["level"] = level
         con.logger.setLevel(con.logging.get("level"))
 
         return con
@@ -1144,13 +2296,29 @@ class Sender(logging.Handler):
         else:
             connection_type = "SSL"
 
+        if connection_type == "NULL":
+            return SenderConfigNull()
+
         address = config.get("address", None)
 
         if not address:
             raise DevoSenderException(ERROR_MSGS.NO_ADDRESS)
 
-        if not isinstance(address, tuple):
-            address = (address, int(config.get("port", 443)))
+        # The address of the local transports is a path, without port
+        if connection_type == "UNIX":
+            return SenderConfigUnix(path=address)
+        if connection_type == "FILE":
+            return SenderConfigFile(path=address)
+
+        port = int(config.get("port", 443))
+        if isinstance(address, list):
+            if len(address) == 2 and isinstance(address[1], int):
+                # A single (address, port) written as a list, as in JSON files
+                address = tuple(address)
+            else:
+                address = [Sender._relay_address(item, port) for item in address]
+        elif not isinstance(address, (tuple, RelaySet)):
+            address = (address, port)
 
         if connection_type == "SSL":
             return SenderConfigSSL(
@@ -1167,6 +2335,17 @@ class Sender(logging.Handler):
 
         return SenderConfigTCP(address=address)
 
+    @staticmethod
+    def _relay_address(address, port: int) -> tuple:
+        """(address, port) of one relay of a configuration: a tuple or list,
+        an "address:port" string or just the address, with the default port"""
+        if isinstance(address, (tuple, list)):
+            return address[0], int(address[1])
+        host, separator, relay_port = str(address).rpartition(":")
+        if separator and relay_port.isdigit():
+            return host, int(relay_port)
+        return address, port
+
     def emit(self, record):
         """
         If used as an handler it will redirect the logs to the send function.
@@ -1197,6 +2376,152 @@ class Sender(logging.Handler):
             self.handleError(record)
 
 
+MONTHS = (b"Jan", b"Feb", b"Mar", b"Apr", b"May", b"Jun",
+          b"Jul", b"Aug", b"Sep", b"Oct", b"Nov", b"Dec")
+
+
+class SenderChannel:
+    """
+    Prepared header for sending events of one tag through a `Sender`.
+
+    The syslog header (priority, date, hostname and tag) is built once, so
+    sending an event is just a concatenation. With `timestamp=True` the date
+    is the current RFC 3164 timestamp, rebuilt only once per second.
+
+    :param sender: Sender used to send the events
+    :param tag: table name
+    :param facility: facility user
+    :param severity: severity info
+    :param hostname: hostname machine. Default local hostname
+    :param log_format: Log format of the header, as bytes
+    :param date: Date of the header. Ignored if timestamp is True
+    :param timestamp: Use the current time as date
+
+    >>>channel = SenderChannel(con, 'my.app.devo_sender.test', timestamp=True)
+    >>>channel.send_many([b'first msg', b'second msg'])
+
+    See Also:
+        Sender.channel
+    """
+
+    def __init__(
+        self,
+        sender,
+        tag,
+        facility=FACILITY_USER,
+        severity=SEVERITY_INFO,
+        hostname=None,
+        log_format=FORMAT_MY_BYTES,
+        date=b"Jan  1 00:00:00",
+        timestamp=False,
+    ):
+        self.sender = sender
+        self.tag = encode_record(tag)
+        self.priority = (facility * 8) + severity
+        self.hostname = encode_record(hostname) if hostname is not None else local_hostname(bytes=True)
+        self.log_format = encode_record(log_format)
+        self.timestamp = timestamp
+        self.__second: Optional[int] = None
+        self.__header: bytes = self.log_format % (
+            self.priority, encode_record(date), self.hostname, self.tag
+        )
+
+    @staticmethod
+    def rfc3164_date(seconds: float) -> bytes:
+        """
+        Format a timestamp as RFC 3164 date: 'Mmm dd hh:mm:ss', local time
+
+        :param seconds: Seconds since the epoch
+        :return: Formatted date as bytes
+        """
+        now = time.localtime(seconds)
+        return b"%s %2d %02d:%02d:%02d" % (
+            MONTHS[now.tm_mon - 1], now.tm_mday, now.tm_hour, now.tm_min, now.tm_sec
+        )
+
+    @property
+    def header(self) -> bytes:
+        """Header of the events sent now"""
+        if self.timestamp:
+            second = int(time.time())
+            if second != self.__second:
+                self.__second = second
+                self.__header = self.log_format % (
+                    self.priority, self.rfc3164_date(second), self.hostname, self.tag
+                )
+        return self.__header
+
+    def __frame(self, header: bytes, msg) -> bytes:
+        record = header + encode_record(msg)
+        if record[-1:] != b"\n":
+            record += b"\n"
+        return record
+
+    def send(self, msg, multiline=False, zip=False):
+        """
+        Send one event with the prepared header
+
+        :param msg: Message to send (bytes, or str that will be encoded)
+        :param multiline: send multiline msg
+        :param zip: send it zipped
+        :return: Same as `Sender.send`
+        """
+        record = self.__frame(self.header, msg)
+        if zip:
+            return self.sender.fill_buffer(record)
+        return self.sender.send_raw(record, multiline=multiline)
+
+    def send_many(self, msgs, multiline=False, zip=False):
+        """
+        Send several events with the prepared header, with a single write
+
+        :param msgs: Iterable of messages to send
+        :param multiline: send multiline msgs
+        :param zip: send them zipped
+        :return: Same as `Sender.send_many`
+        """
+        header = self.header
+        if zip:
+            return self.sender.fill_buffer_many(self.__frame(header, msg) for msg in msgs)
+        return self.sender.send_raw_many(
+            [self.__frame(header, msg) for msg in msgs], multiline=multiline
+        )
+
+
+@lru_cache(maxsize=None)
+def local_hostname(bytes=False):
+    """
+    Hostname of this machine, resolved only once
+    :param bytes: Return it as bytes instead of str
+    :return: hostname
+    """
+    hostname = socket.gethostname()
+    return hostname.encode("utf-8") if bytes else hostname
+
+
+def relays_from_address(address, error_message) -> Optional[RelaySet]:
+    """
+    Validate the address of a configuration
+
+    :param address: (address, port) tuple, list of them or RelaySet
+    :param error_message: Message of the exception raised when it is not valid
+    :return: RelaySet when there are several addresses, None for a tuple
+    """
+    if isinstance(address, RelaySet):
+        relays = address
+    elif isinstance(address, list) and address:
+        relays = RelaySet([tuple(item) if isinstance(item, list) else item for item in address])
+    else:
+        relays = None
+    if relays is None:
+        if not isinstance(address, tuple):
+            raise DevoSenderException(error_message)
+        return None
+    if not len(relays) or not all(isinstance(endpoint.address, tuple) for endpoint in relays.endpoints):
+        raise DevoSenderException(error_message)
+    return relays
+
+
 def open_file(file, mode="r", encoding="utf-8"):
     """
     Helper class to open file whenever is provided as `Path` or `str` type
@@ -1210,3 +2535,58 @@ def open_file(file, mode="r", encoding="utf-8"):
         return open(file, mode=mode, encoding=encoding if not mode.endswith("b") else None)
     else:
         raise DevoSenderException(ERROR_MSGS.WRONG_FILE_TYPE % str(type(file)))
+
+
+def encode_record(record):
+    """
+    Encode the record for correct send
+    :param record: the record to encode
+    :return: record encoded as bytes
+    """
+    if not isinstance(record, bytes):
+        return record.encode("utf-8", "replace")
+    return record
+
+
+def _exactly(chunks, length: int):
+    """Chunks of a multiline event, checked against the length of its frame:
+    the bytes after it are not sent and a shorter event is an error"""
+    left = length
+    if not left:
+        return
+    for chunk in chunks:
+        if len(chunk) > left:
+            log.warning("Devo-Sender|the multiline event grew while it was sent, it is cut")
+            chunk = chunk[:left]
+        left -= len(chunk)
+        yield chunk
+        if not left:
+            return
+    if left:
+        raise DevoSenderException(ERROR_MSGS.MULTILINE_LENGTH_ERROR % (length - left, length))
+
+
+def encode_multiline(record):
+    """
+    Encode the record and frame it with octet counting, so it can contain
+    line breaks
+    :param record: the record to encode
+    :return: "<length> <record>" as bytes
+    """
+    try:
+        record = encode_record(record)
+        return b"%d %s" % (len(record), record)
+    except Exception as error:
+        raise DevoSenderException(ERROR_MSGS.MULTILINE_SENDING_ERROR % str(error)) from error
+
+
+def _after_fork():
+    for sender in list(_senders):
+        try:
+            sender._after_fork()
+        except Exception as error:
+            log.warning("Devo-Sender|error resetting a Sender after a fork: %s", error)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""Ingestion of files through a Sender"""
+
+import gzip
+import itertools
+import os
+import re
+import zlib
+from typing import Iterator
+
+from .data import ERROR_MSGS, DevoSenderException, Sender, open_file
+
+DEFAULT_READ_SIZE = 1024 * 1024
+"""Bytes read from the files at once"""
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+SYSLOG_HEADER = re.compile(rb"<\d{1,3}>")
+"""Start of a syslog framed event: its priority"""
+
+
+def read_lines(file, chunk_size: int = DEFAULT_READ_SIZE) -> Iterator[list]:
+    """
+    Split a binary file in lines, reading `chunk_size` bytes at once. The
+    lines are returned in batches, one per read, without their line breaks
+    (neither `\\n` nor `\\r\\n`)
+
+    :param file: Binary file object
+    :param chunk_size: Bytes read at once
+    :return: Iterator of lists of lines, as bytes
+
+    >>>with open('events.log', 'rb') as file:
+    ...     for lines in read_lines(file):
+    ...         con.send_many('my.app.devo_sender.test', lines, zip=True)
+    """
+    rest = b""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            if rest:
+                yield [rest[:-1] if rest[-1:] == b"\r" else rest]
+            return
+        carriage = b"\r" in chunk or rest[-1:] == b"\r"
+        lines = (rest + chunk if rest else chunk).split(b"\n")
+        rest = lines.pop()
+        if carriage:
+            lines = [line[:-1] if line[-1:] == b"\r" else line for line in lines]
+        if lines:
+            yield lines
+
+
+def send_lines(con: Sender, batches, tag=None, raw: bool = False, zip: bool = False) -> int:
+    """
+    Send batches of lines, as events of `tag` or as raw events. Each batch
+    is sent with a single write, or added to the zip buffer taking its lock
+    once per block. Empty lines are skipped
+
+    :param con: Sender
+    :param batches: Iterable of lists of lines, as bytes, like `read_lines`
+    :param tag: Tag of the events
+    :param raw: The lines are events to send as they are
+    :param zip: Send the lines through the zip buffer, flushed at the end
+    :return: Number of events sent
+    """
+    if not raw and tag is None:
+        raise DevoSenderException(ERROR_MSGS.NO_TAG_FOR_LINES)
+    channel = None if raw else con.channel(tag)
+    sent = 0
+    for lines in batches:
+        batch = [line for line in lines if line]
+        if not batch:
+            continue
+        if channel is not None:
+            sent += channel.send_many(batch, zip=zip)
+        elif zip:
+            sent += con.fill_buffer_many(batch)
+        else:
+            sent += con.send_raw_many([line + b"\n" for line in batch])
+    if zip:
+        sent += con.flush_buffer()
+    return sent
+
+
+def send_file(
+    con: Sender,
+    file,
+    tag=None,
+    raw: bool = False,
+    zip: bool = False,
+    header: bool = False,
+    chunk_size: int = DEFAULT_READ_SIZE,
+) -> int:
+    """
+    Send the lines of a file, read as bytes in chunks of `chunk_size`. Gzip
+    files are sent with `send_gzip_file`
+
+    :param con: Sender
+    :param file: Path of the file, as `str` or `Path`
+    :param tag: Tag of the events
+    :param raw: The lines are events to send as they are
+    :param zip: Send the lines through the zip buffer
+    :param header: Skip the first line of the file
+    :param chunk_size: Bytes read at once
+    :return: Number of events sent
+
+    >>>send_file(con, 'events.log', tag='my.app.devo_sender.test', zip=True)
+    """
+    if is_gzip_file(file):
+        return send_gzip_file(con, file, tag=tag, raw=raw, zip=zip, header=header,
+                              chunk_size=chunk_size)
+    with open_file(file, mode="rb") as handle:
+        return send_lines(con, _skip_header(read_lines(handle, chunk_size), header), tag, raw, zip)
+
+
+def send_multiline_file(
+    con: Sender, file, tag=None, raw: bool = False, chunk_size: int = DEFAULT_READ_SIZE, **kwargs
+) -> int:
+    """
+    Send the whole content of a file as one multiline event, framed with
+    octet counting. The size of the event is taken from the size of the file
+    and the file is streamed to the socket in reads of `chunk_size` bytes, so
+    memory use does not depend on the size of the file. The bytes are sent
+    as they are, without decoding them
+
+    :param con: Sender
+    :param file: Path of the file, as `str` or `Path`
+    :param tag: Tag of the event, the syslog header is written before it
+    :param raw: The file is the event to send as it is, without header
+    :param chunk_size: Bytes read at once
+    :param kwargs: Options of the syslog header, as in `Sender.compose_mem`
+    :return: 1 if the event was sent
+
+    >>>send_multiline_file(con, 'stacktrace.log', tag='my.app.devo_sender.test')
+    """
+    if not raw and tag is None:
+        raise DevoSenderException(ERROR_MSGS.NO_TAG_FOR_LINES)
+    with open_file(file, mode="rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        header = trailer = b""
+        if not raw:
+            if isinstance(tag, str):
+                tag = tag.encode("utf-8")
+            header = con.compose_mem(tag, bytes=True, **kwargs)
+            # Events of a tag end with a line break, as in `Sender.send`
+            if size:
+                handle.seek(size - 1)
+                trailer = b"" if handle.read(1) == b"\n" else b"\n"
+                handle.seek(0)
+            else:
+                trailer = b"\n"
+        chunks = itertools.chain((header,), _read_up_to(handle, size, chunk_size), (trailer,))
+        return con.send_multiline_stream(len(header) + size + len(trailer), chunks)
+
+
+def _read_up_to(handle, size: int, chunk_size: int):
+    # What is appended to the file while it is sent is not part of the event
+    while size > 0:
+        chunk = handle.read(min(chunk_size, size))
+        if not chunk:
+            return
+        size -= len(chunk)
+        yield chunk
+
+
+def _skip_header(batches, header: bool):
+    for lines in batches:
+        if header and lines:
+            lines, header = lines[1:], False
+        yield lines
+
+
+def is_gzip_file(file) -> bool:
+    """
+    Check if a file is gzip compressed, by its first bytes
+
+    :param file: Path of the file, as `str` or `Path`
+    :return: True if it is a gzip file
+    """
+    with open_file(file, mode="rb") as handle:
+        return handle.read(2) == GZIP_MAGIC
+
+
+def is_syslog_framed(data: bytes) -> bool:
+    """
+    Check if the content of a file is made of syslog framed events, ready to
+    be sent, by its first bytes
+
+    :param data: First bytes of the content
+    :return: True if it starts with a syslog priority
+    """
+    return SYSLOG_HEADER.match(data) is not None
+
+
+class GzipMemberReader:
+    """
+    Reads a gzip stream member by member, without recompressing anything.
+
+    Each member is an independent gzip stream, which is also what a zip frame
+    of the Sender is, so the members of a gzip file of syslog events can be
+    sent as they are. The members are inflated only to find where each one
+    ends and to count its events (lines); the output is discarded as it is
+    produced, so memory use does not depend on the size of the members.
+
+    Iterating the reader yields one iterator of compressed chunks per member.
+    Each one must be consumed before the next one.
+
+    :param file: Binary file object
+    :param chunk_size: Bytes read at once
+
+    >>>with open('events.log.gz', 'rb') as file:
+    ...     reader = GzipMemberReader(file)
+    ...     for member in reader:
+    ...         con.send_zip_stream(member)
+    >>>reader.events
+
+    See Also:
+        Sender.send_zip_stream
+    """
+
+    def __init__(self, file, chunk_size: int = DEFAULT_READ_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.members: int = 0
+        """Members read completely"""
+        self.events: int = 0
+        """Lines of the members read completely"""
+        self.__pending = b""
+
+    def __iter__(self) -> Iterator[Iterator[bytes]]:
+        while True:
+            if not self.__pending:
+                self.__pending = self.file.read(self.chunk_size)
+                if not self.__pending:
+                    return
+            if not self.__pending.strip(b"\x00"):
+                # Some tools pad the end of gzip files with zeros
+                self.__pending = b""
+                continue
+            yield self.__member()
+
+    def __member(self) -> Iterator[bytes]:
+        inflater = zlib.decompressobj(31)
+        data, self.__pending = self.__pending, b""
+        lines = 0
+        while True:
+            if not data:
+                data = self.file.read(self.chunk_size)
+                if not data:
+                    raise DevoSenderException(ERROR_MSGS.GZIP_ERROR % "truncated member")
+            try:
+                pending = data
+                while not inflater.eof:
+                    output = inflater.decompress(pending, self.chunk_size)
+                    lines += output.count(b"\n")
+                    pending = inflater.unconsumed_tail
+                    if not pending and len(output) < self.chunk_size:
+                        break
+            except zlib.error as error:
+                raise DevoSenderException(ERROR_MSGS.GZIP_ERROR % str(error)) from error
+            if inflater.eof:
+                used = len(data) - len(inflater.unused_data)
+                self.__pending = inflater.unused_data
+                self.members += 1
+                self.events += lines
+                yield data[:used]
+                return
+            yield data
+            data = b""
+
+
+def send_gzip_file(
+    con: Sender,
+    file,
+    tag=None,
+    raw: bool = False,
+    zip: bool = False,
+    header: bool = False,
+    chunk_size: int = DEFAULT_READ_SIZE,
+) -> int:
+    """
+    Send a gzip compressed file. When its content is syslog framed events,
+    its members are sent as they are, as zip frames, without decompressing
+    and compressing them again. Otherwise its lines are sent as events of
+    `tag` (or as they are with `raw`)
+
+    :param con: Sender
+    :param file: Path of the file, as `str` or `Path`
+    :param tag: Tag of the events, when the lines are not syslog framed
+    :param raw: The lines are events to send as they are
+    :param zip: Send the lines through the zip buffer
+    :param header: Skip the first line, when the lines are not syslog framed
+    :param chunk_size: Bytes read at once
+    :return: Number of events sent
+
+    >>>send_gzip_file(con, 'events.log.gz', tag='my.app.devo_sender.test')
+    """
+    with gzip.open(file, mode="rb") as content:
+        framed = is_syslog_framed(content.read(16))
+
+    if framed:
+        with open_file(file, mode="rb") as handle:
+            reader = GzipMemberReader(handle, chunk_size)
+            for member in reader:
+                con.send_zip_stream(member)
+        return reader.events
+
+    with gzip.open(file, mode="rb") as content:
+        return send_lines(con, _skip_header(read_lines(content, chunk_size), header), tag, raw, zip)
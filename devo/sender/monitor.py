@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Event driven health check of the connections opened by the Senders"""
+
+import logging
+import os
+import selectors
+import socket
+from threading import Lock, Thread
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+# poll() has no FD_SETSIZE limit and, unlike epoll, it does not need a
+# descriptor of its own, so it is the best choice for one-shot waits
+WaitSelector = getattr(selectors, "PollSelector", selectors.SelectSelector)
+
+
+def wait_for_socket(sock, events: int, timeout: Optional[float]) -> bool:
+    """
+    Wait until the socket is ready for reading or writing
+
+    :param sock: Socket to wait for
+    :param events: selectors.EVENT_READ and/or selectors.EVENT_WRITE
+    :param timeout: Maximum seconds to wait. None waits forever
+    :return: True if the socket is ready, False if the timeout is reached
+    """
+    with WaitSelector() as selector:
+        selector.register(sock, events)
+        return bool(selector.select(timeout))
+
+
+class ConnectionWatch:
+    """Health flag of one watched connection"""
+
+    def __init__(self, fileno: int):
+        self.fileno: int = fileno
+        self.triggered: bool = False
+        """The connection has something to read: data, EOF or a reset. Its
+        owner must check it, the monitor stops watching it until re-armed"""
+
+
+class ConnectionMonitor:
+    """
+    Watches the connections of every Sender of the process from a single
+    background thread, with the best selector of the platform (epoll, kqueue...).
+
+    When the endpoint closes a connection (or sends anything) the watch of that
+    connection is flagged, so the Sender only has to check a boolean before
+    writing instead of probing the socket each time.
+
+    >>>watch = ConnectionMonitor.get().watch(sock)
+    >>>if watch.triggered:
+    ...     # check the connection
+    """
+
+    __instance: Optional["ConnectionMonitor"] = None
+    __instance_lock = Lock()
+
+    def __init__(self):
+        self.__selector = selectors.DefaultSelector()
+        self.__lock = Lock()
+        self.__wakeup_receiver, self.__wakeup_sender = socket.socketpair()
+        self.__wakeup_receiver.setblocking(False)
+        self.__wakeup_sender.setblocking(False)
+        self.__selector.register(self.__wakeup_receiver, selectors.EVENT_READ)
+        self.__thread = Thread(target=self.__run, name="devo-sender-monitor", daemon=True)
+        self.__thread.start()
+
+    @classmethod
+    def get(cls) -> "ConnectionMonitor":
+        """
+        Shared monitor of the process, started on first use
+
+        :return: ConnectionMonitor
+        """
+        if cls.__instance is None:
+            with cls.__instance_lock:
+                if cls.__instance is None:
+                    cls.__instance = cls()
+        return cls.__instance
+
+    @classmethod
+    def _after_fork(cls) -> None:
+        """
+        Forget the monitor of the parent in a forked child: its thread does
+        not exist in the child and its epoll set is shared with the parent,
+        so it must not be modified. A new one is started on first use
+        """
+        cls.__instance_lock = Lock()
+        monitor, cls.__instance = cls.__instance, None
+        if monitor is not None:
+            # Only the descriptors of the child are closed
+            monitor.__selector.close()
+            monitor.__wakeup_receiver.close()
+            monitor.__wakeup_sender.close()
+
+    def watch(self, sock) -> ConnectionWatch:
+        """
+        Start watching a connected socket
+
+        :param sock: Socket to watch
+        :return: ConnectionWatch flagged when the socket has to be checked
+        """
+        watch = ConnectionWatch(sock.fileno())
+        with self.__lock:
+            stale = self.__selector.get_map().get(watch.fileno)
+            if stale is not None:
+                # Its socket was closed without unwatching it first
+                self.__selector.unregister(watch.fileno)
+                stale.data.triggered = True
+            self.__selector.register(watch.fileno, selectors.EVENT_READ, watch)
+        self.__wakeup()
+        return watch
+
+    def unwatch(self, watch: Optional[ConnectionWatch]) -> None:
+        """
+        Stop watching a socket. It must be called before closing it
+
+        :param watch: ConnectionWatch returned by `watch`
+        """
+        if watch is None:
+            return
+        with self.__lock:
+            self.__unregister(watch)
+        self.__wakeup()
+
+    def rearm(self, watch: ConnectionWatch) -> None:
+        """
+        Watch again a socket after its owner has checked it
+
+        :param watch: ConnectionWatch returned by `watch`
+        """
+        with self.__lock:
+            if watch.triggered:
+                watch.triggered = False
+                self.__selector.register(watch.fileno, selectors.EVENT_READ, watch)
+        self.__wakeup()
+
+    def __unregister(self, watch: ConnectionWatch):
+        key = self.__selector.get_map().get(watch.fileno)
+        if key is not None and key.data is watch:
+            self.__selector.unregister(watch.fileno)
+
+    def __wakeup(self):
+        try:
+            self.__wakeup_sender.send(b"\0")
+        except (BlockingIOError, InterruptedError):
+            # There is already a pending wake up
+            pass
+
+    def __run(self):
+        while True:
+            try:
+                events = self.__selector.select()
+            except OSError as error:
+                # A descriptor was closed while it was registered
+                log.warning("Devo-ConnectionMonitor|%s", error)
+                self.__discard_closed()
+                continue
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        while self.__wakeup_receiver.recv(4096):
+                            pass
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                    continue
+                with self.__lock:
+                    # The socket can be read by its owner only, stop watching it
+                    # until it is re-armed so it does not wake up the loop again
+                    self.__unregister(key.data)
+                    key.data.triggered = True
+
+    def __discard_closed(self):
+        with self.__lock:
+            for key in list(self.__selector.get_map().values()):
+                if key.data is None:
+                    continue
+                try:
+                    wait_for_socket(key.fd, selectors.EVENT_READ, 0)
+                except (OSError, ValueError):
+                    self.__selector.unregister(key.fd)
+                    key.data.triggered = True
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=ConnectionMonitor._after_fork)
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""Sending of data to Devo from a pool of worker processes, each with its
+own connection and zip buffer"""
+
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from itertools import groupby
+from threading import Lock
+from typing import Optional
+
+from .data import ERROR_MSGS, DevoSenderException, Sender, SenderConfigSSL
+
+log = logging.getLogger(__name__)
+
+
+def _group_key(item):
+    # Consecutive events with the same options are written together
+    if item[0] == "send":
+        return item[0], item[1], item[3]
+    return item[0], item[2], item[3]
+
+
+def _write(con: Sender, group: list) -> None:
+    first = group[0]
+    if first[0] == "send":
+        con.send_many(first[1], [item[2] for item in group], **first[3])
+    else:
+        con.send_raw_many([item[1] for item in group], multiline=first[2], zip=first[3])
+
+
+def _worker(index, config, con_type, options, kwargs, inbox, results):
+    """Main function of a worker process"""
+    try:
+        con = Sender(config=config, con_type=con_type, **kwargs)
+        if options.get("buffer_size"):
+            con.buffer_size(size=options["buffer_size"])
+        if options.get("compression_level") is not None:
+            con.compression_level(cl=options["compression_level"])
+    except Exception as error:
+        results.put(("ready", index, None, 0, 0, str(error)))
+        return
+    results.put(("ready", index, None, 0, 0, None))
+
+    sent = errors = 0
+    while True:
+        item = inbox.get()
+        if item[0] == "batch":
+            for _, group in groupby(item[1], key=_group_key):
+                group = list(group)
+                try:
+                    _write(con, group)
+                    sent += len(group)
+                except Exception as error:
+                    errors += len(group)
+                    log.error("Devo-ParallelSender|worker %d: %s", index, error)
+            continue
+        try:
+            con.flush_buffer()
+        except DevoSenderException as error:
+            errors += 1
+            log.error("Devo-ParallelSender|worker %d: %s", index, error)
+        if item[0] == "close":
+            con.close()
+        results.put((item[0], index, item[1], sent, errors, None))
+        if item[0] == "close":
+            return
+
+
+class ParallelSender:
+    """
+    Sender that fans the events out to a pool of worker processes.
+
+    Each worker process has its own `Sender`, with its own connection and
+    zip buffer, so composing, compressing and writing the events uses several
+    cores. The events are grouped in batches of `batch_size` and the batches
+    are handed to the workers in turns. At most `queue_size` batches wait for
+    each worker: when that number is reached, sending waits.
+
+    The events are sent in order by each worker, but there is no order
+    between the events of different workers.
+
+    :param config: SenderConfigSSL, SenderConfigTCP or dict object, as in
+     `Sender`. With start methods other than fork, it must be picklable
+    :param con_type: TCP or SSL, as in `Sender`
+    :param processes: Number of worker processes. Default: number of CPUs
+    :param batch_size: Events handed to a worker at once
+    :param queue_size: Batches that can wait for each worker
+    :param buffer_size: Zip buffer size of the workers, as in `Sender.buffer_size`
+    :param compression_level: Compression level of the workers, as in
+     `Sender.compression_level`
+    :param mp_context: multiprocessing context or start method name. Default:
+     the default context of the platform
+    :param kwargs: Any other `Sender` argument (timeout, inactivity_timeout,
+     debug...)
+
+    >>>con = ParallelSender(config=engine_config, processes=4)
+    >>>con.send(tag=b'my.app.devo_sender.test', msg=b'test of msg', zip=True)
+    >>>con.close()
+
+    See Also:
+        Sender
+    """
+
+    def __init__(
+        self,
+        config=None,
+        con_type=None,
+        processes: Optional[int] = None,
+        batch_size: int = 1000,
+        queue_size: int = 4,
+        buffer_size: Optional[int] = None,
+        compression_level: Optional[int] = None,
+        mp_context=None,
+        **kwargs
+    ):
+        if config is None:
+            raise DevoSenderException(ERROR_MSGS.PROBLEMS_WITH_SENDER_ARGS)
+        if queue_size <= 0:
+            raise DevoSenderException(ERROR_MSGS.WRONG_QUEUE_SIZE)
+        if mp_context is None or isinstance(mp_context, str):
+            mp_context = multiprocessing.get_context(mp_context)
+        self.processes: int = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.sent: int = 0
+        """Events sent by the workers, updated on every flush"""
+        self.errors: int = 0
+        """Errors found by the workers, updated on every flush"""
+
+        self.__lock = Lock()
+        self.__batch: list = []
+        self.__turn = itertools.cycle(range(self.processes))
+        self.__tokens = itertools.count()
+        self.__closed = False
+        self.__counters: dict = {}
+        self.__results = mp_context.Queue()
+        self.__inboxes = [mp_context.Queue(queue_size) for _ in range(self.processes)]
+        options = {"buffer_size": buffer_size, "compression_level": compression_level}
+        if isinstance(config, SenderConfigSSL) and mp_context.get_start_method() == "fork":
+            # Forked workers inherit the SSL context instead of loading the
+            # certificates again. Otherwise the configuration is pickled
+            # without it and each worker creates its own
+            config.ssl_context()
+        self.__workers = [
+            mp_context.Process(
+                target=_worker,
+                args=(index, config, con_type, options, kwargs, inbox, self.__results),
+                name="devo-sender-worker-%d" % index,
+                daemon=True,
+            )
+            for index, inbox in enumerate(self.__inboxes)
+        ]
+        for worker in self.__workers:
+            worker.start()
+
+        replies = self.__wait_for("ready", None, None)
+        errors = [reply[5] for reply in replies if reply[5] is not None]
+        if errors or len(replies) < self.processes:
+            self.__terminate(0)
+            raise DevoSenderException(
+                ERROR_MSGS.PARALLEL_WORKER_ERROR % (errors[0] if errors else "it ended")
+            )
+
+    @property
+    def stats(self) -> dict:
+        """Counters of the workers, as of the last flush: sent and errors"""
+        return {"processes": self.processes, "sent": self.sent, "errors": self.errors}
+
+    def send(self, tag, msg, **kwargs) -> int:
+        """
+        Hand an event to the workers, to be composed and sent. Same arguments
+        as `Sender.send`
+
+        :return: 1, the event is sent by a worker
+        """
+        return self.__put(("send", tag, msg, kwargs))
+
+    def send_many(self, tag, msgs, **kwargs) -> int:
+        """
+        Hand several events to the workers. Same arguments as `Sender.send_many`
+
+        :return: Number of events handed
+        """
+        return sum(self.__put(("send", tag, msg, kwargs)) for msg in msgs)
+
+    def send_raw(self, record, multiline=False, zip=False) -> int:
+        """
+        Hand a raw event to the workers. Same arguments as `Sender.send_raw`
+
+        :return: 1, the event is sent by a worker
+        """
+        return self.__put(("raw", record, multiline, zip))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Hand the pending events to the workers and wait until every worker
+        has sent them and flushed its zip buffer
+
+        :param timeout: Maximum seconds to wait. None waits forever
+        :return: True if every worker flushed before the timeout
+        """
+        with self.__lock:
+            if self.__closed:
+                raise DevoSenderException(ERROR_MSGS.SENDER_CLOSED)
+            self.__dispatch()
+            return self.__broadcast("flush", timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Send the pending events, flush the workers and stop them
+
+        :param timeout: Maximum seconds to wait for the workers. The workers
+         still running after it are terminated. None waits forever
+        """
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+            self.__dispatch()
+            closed = self.__broadcast("close", timeout)
+        self.__terminate(None if closed else 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __put(self, item) -> int:
+        with self.__lock:
+            if self.__closed:
+                raise DevoSenderException(ERROR_MSGS.SENDER_CLOSED)
+            self.__batch.append(item)
+            if len(self.__batch) >= self.batch_size:
+                self.__dispatch()
+        return 1
+
+    def __dispatch(self):
+        if self.__batch:
+            batch, self.__batch = self.__batch, []
+            self.__inboxes[next(self.__turn)].put(("batch", batch))
+
+    def __broadcast(self, command: str, timeout: Optional[float]) -> bool:
+        token = next(self.__tokens)
+        for inbox in self.__inboxes:
+            inbox.put((command, token))
+        replies = self.__wait_for(command, token, timeout)
+        for reply in replies:
+            self.__update(reply)
+        return len(replies) == self.processes
+
+    def __wait_for(self, command: str, token, timeout: Optional[float]) -> list:
+        deadline = None if timeout is None else time.time() + timeout
+        replies = {}
+        while len(replies) < self.processes:
+            wait = None if deadline is None else deadline - time.time()
+            if wait is not None and wait <= 0:
+                break
+            try:
+                reply = self.__results.get(timeout=min(wait, 1.0) if wait is not None else 1.0)
+            except queue.Empty:
+                # A worker that ended will never reply
+                if any(
+                    not worker.is_alive()
+                    for index, worker in enumerate(self.__workers)
+                    if index not in replies
+                ):
+                    break
+                continue
+            if reply[0] == command and reply[2] == token:
+                replies[reply[1]] = reply
+            else:
+                # Late reply to a previous command that timed out
+                self.__update(reply)
+        return list(replies.values())
+
+    def __update(self, reply):
+        if reply[0] == "ready":
+            return
+        # The counters of each worker are totals, keep the last ones
+        self.__counters[reply[1]] = (reply[3], reply[4])
+        self.sent = sum(counter[0] for counter in self.__counters.values())
+        self.errors = sum(counter[1] for counter in self.__counters.values())
+
+    def __terminate(self, timeout: Optional[float]):
+        for worker in self.__workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
@@ -2,9 +2,31 @@
 """Util function to convert .pfx and .pkcs12 certs to key+cert+chain for
 use in Python sockets"""
 
+import os
 import tempfile
 
-import OpenSSL.crypto
+from cryptography.hazmat.primitives.serialization import (Encoding, NoEncryption,
+                                                          PrivateFormat, pkcs12)
+
+
+def pfx_to_pem_bytes(path=None, password=None):
+    """
+    Decrypts the .pfx file in memory.
+    :param path: path to .pfx/.pkcs12 file
+    :param password: password of certificate
+    :return: key, cert and CA chain as PEM bytes. The chain is empty if the
+     file has no CA certificates
+    """
+    with open(path, "rb") as pfx_file:
+        pfx = pfx_file.read()
+    if isinstance(password, str):
+        password = password.encode("utf-8")
+    private_key, certificate, ca = pkcs12.load_key_and_certificates(pfx, password)
+
+    key = private_key.private_bytes(Encoding.PEM, PrivateFormat.TraditionalOpenSSL, NoEncryption())
+    cert = certificate.public_bytes(Encoding.PEM)
+    chain = b"".join(authority.public_bytes(Encoding.PEM) for authority in ca or ())
+    return key, cert, chain
 
 
 def pfx_to_pem(path=None, password=None):
@@ -18,22 +40,26 @@ def pfx_to_pem(path=None, password=None):
     temp_cert = tempfile.NamedTemporaryFile(suffix=".crt")
     temp_ca = tempfile.NamedTemporaryFile(suffix=".crt")
 
-    f_key = open(temp_key.name, "wb")
-    f_cert = open(temp_cert.name, "wb")
-    f_ca = open(temp_ca.name, "wb")
-
-    pfx = open(path, "rb").read()
-    p12 = OpenSSL.crypto.load_pkcs12(pfx, password)
-
-    f_key.write(OpenSSL.crypto.dump_privatekey(OpenSSL.crypto.FILETYPE_PEM, p12.get_privatekey()))
-    f_cert.write(
-        OpenSSL.crypto.dump_certificate(OpenSSL.crypto.FILETYPE_PEM, p12.get_certificate())
-    )
-    ca = p12.get_ca_certificates()
-    if ca is not None:
-        for cert in ca:
-            f_ca.write(OpenSSL.crypto.dump_certificate(OpenSSL.crypto.FILETYPE_PEM, cert))
-    f_key.close()
-    f_cert.close()
-    f_ca.close()
+    key, cert, chain = pfx_to_pem_bytes(path, password)
+    for temp_file, content in ((temp_key, key), (temp_cert, cert), (temp_ca, chain)):
+        with open(temp_file.name, "wb") as file:
+            file.write(content)
     return temp_key, temp_cert, temp_ca
+
+
+def load_pem_cert_chain(context, key: bytes, cert: bytes) -> None:
+    """
+    Load a key and a certificate held in memory in an SSL context. The
+    context only loads them from a file, so they are written to a private
+    temporary file that is removed right after
+    :param context: ssl.SSLContext
+    :param key: Private key as PEM bytes
+    :param cert: Certificate as PEM bytes
+    """
+    descriptor, path = tempfile.mkstemp(suffix=".pem")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(key + cert)
+        context.load_cert_chain(certfile=path)
+    finally:
+        os.unlink(path)
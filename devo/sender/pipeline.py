@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Worker thread that finishes the compression of full zip buffers and sends
+them, so the threads filling the buffer do not wait for it"""
+
+import logging
+import weakref
+from collections import deque
+from threading import Condition, Thread
+from typing import Callable, Optional
+
+log = logging.getLogger(__name__)
+
+
+class ZipPipeline:
+    """
+    Compression and delivery of zip buffers in a background thread.
+
+    A full buffer is swapped for an empty one while the buffer lock is held,
+    and then handed to the pipeline, so the producers keep filling the new
+    buffer while the worker finishes the gzip stream and writes it. When more
+    than `inflight` buffers are handed and not yet sent, `submit` waits,
+    applying backpressure to the producers.
+
+    :param send: Function that finishes the compression of a buffer and
+     sends it: send(batch, events). A bound method is only weakly referenced
+    :param inflight: Maximum number of buffers handed and not yet sent
+
+    See Also:
+        Sender
+    """
+
+    def __init__(self, send: Callable, inflight: int = 2):
+        if inflight <= 0:
+            raise ValueError("inflight must be greater than 0")
+        self.inflight = inflight
+        self.sent: int = 0
+        """Events of the buffers sent"""
+        self.errors: int = 0
+        """Buffers that could not be sent"""
+        self.last_error: Optional[Exception] = None
+        # The thread must not keep the Sender alive
+        self.__send = weakref.WeakMethod(send) if hasattr(send, "__self__") else lambda: send
+        self.__queue: deque = deque()
+        self.__condition = Condition()
+        self.__pending: int = 0
+        self.__thread = Thread(target=self.__run, name="devo-sender-zip", daemon=True)
+        self.__thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Buffers handed to the worker and not yet sent"""
+        return self.__pending
+
+    def submit(self, batch, events: int, wait: bool = True) -> None:
+        """
+        Hand a full buffer to the worker, waiting while more than `inflight`
+        buffers are not yet sent. The buffers are sent in the order they are
+        handed, so a Sender hands them without waiting while it holds the
+        buffer lock, and waits with `wait` after releasing it
+
+        :param batch: ZipBatch swapped out of the buffer
+        :param events: Number of events of the batch
+        :param wait: Wait for the worker before returning
+        """
+        with self.__condition:
+            self.__queue.append((batch, events))
+            self.__pending += 1
+            self.__condition.notify_all()
+        if wait:
+            self.wait()
+
+    def wait(self) -> None:
+        """Wait while more than `inflight` buffers are not yet sent"""
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__pending <= self.inflight)
+
+    def join(self) -> None:
+        """Wait until every buffer handed to the worker is sent (or failed)"""
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__pending == 0)
+
+    def stop(self) -> None:
+        """Send the buffers already handed and stop the worker"""
+        with self.__condition:
+            self.__queue.append(None)
+            self.__condition.notify_all()
+        if self.__thread.is_alive():
+            self.__thread.join()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__queue)
+                item = self.__queue.popleft()
+            if item is None:
+                return
+            batch, events = item
+            try:
+                send = self.__send()
+                if send is None:
+                    return
+                send(batch, events)
+                del send
+                self.sent += events
+            except Exception as error:
+                self.errors += 1
+                self.last_error = error
+                log.error("Devo-ZipPipeline|error sending a zip buffer of %d events: %s", events, error)
+            finally:
+                with self.__condition:
+                    self.__pending -= 1
+                    self.__condition.notify_all()
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""Pool of Sender connections to spread the data sent to Devo across several
+connections and relays"""
+
+import copy
+import logging
+import time
+from enum import Enum
+from itertools import count
+from threading import Lock
+from typing import Optional
+
+from devo.common import Configuration
+
+from .data import ERROR_MSGS, DevoSenderException, Sender, SenderBuffer
+from .transformsyslog import COMPOSE, COMPOSE_BYTES
+
+log = logging.getLogger(__name__)
+
+
+class PoolSelection(str, Enum):
+    """How the connection used for each write is chosen"""
+
+    def __str__(self):
+        return str(self.value)
+
+    ROUND_ROBIN = "round_robin"
+    """Each write goes to the next connection"""
+    LEAST_LOADED = "least_loaded"
+    """Each write goes to the connection with less writes in progress"""
+
+
+class PoolMember:
+    """One connection of a SenderPool, with its own reconnection state"""
+
+    def __init__(self, index: int, config, retry_wait: float, max_retry_wait: float, **kwargs):
+        self.index: int = index
+        self.config = config
+        self.sender: Optional[Sender] = None
+        self.lock = Lock()
+        self.in_flight: int = 0
+        """Writes in progress or waiting for this connection"""
+        self.sent: int = 0
+        """Writes done through this connection"""
+        self.failures: int = 0
+        """Consecutive failures of this connection"""
+        self.next_retry: float = 0.0
+        """Time after which the connection can be tried again"""
+        self.retry_wait = retry_wait
+        self.max_retry_wait = max_retry_wait
+        self.__kwargs = kwargs
+
+    @property
+    def address(self) -> tuple:
+        return self.config.address
+
+    def available(self, now: float) -> bool:
+        return self.next_retry <= now
+
+    def connect(self) -> Sender:
+        """Create the Sender of this member if it does not have one yet"""
+        if self.sender is None:
+            self.sender = Sender(config=self.config, **self.__kwargs)
+        return self.sender
+
+    def succeeded(self) -> None:
+        self.sent += 1
+        self.failures = 0
+        self.next_retry = 0.0
+
+    def failed(self, error: Exception) -> None:
+        """Close the connection and wait before trying it again"""
+        wait = min(self.retry_wait * (2 ** self.failures), self.max_retry_wait)
+        self.failures += 1
+        self.next_retry = time.time() + wait
+        log.warning(
+            "Devo-SenderPool|connection %d to %s failed (%s), retrying in %.1fs",
+            self.index, self.address, error, wait,
+        )
+        self.close()
+
+    def close(self) -> None:
+        if self.sender is not None:
+            sender, self.sender = self.sender, None
+            sender.close()
+
+
+class SenderPool:
+    """
+    Pool of parallel connections to one or more relays.
+
+    Every write (an event, a batch or a zip flush) is done by one of the
+    connections, chosen with round robin or least loaded selection, so several
+    threads can write at the same time. A connection that fails is closed and
+    not used again until its backoff time has passed, while the write is retried
+    with another connection. The zip buffer is shared by the whole pool, and
+    its flushes are spread across the connections too.
+
+    :param config: SenderConfigSSL, SenderConfigTCP or dict object, as in
+     `Sender`
+    :param con_type: TCP or SSL, as in `Sender`
+    :param connections: Number of connections of the pool
+    :param addresses: List of (address, port) tuples. The connections are
+     distributed across them. Default: the address of config, or the relays
+     of config (each connection fails over between them on its own)
+    :param selection: `PoolSelection` used to choose the connection
+    :param retry_wait: Initial seconds to wait before reusing a failed connection
+    :param max_retry_wait: Maximum seconds to wait before reusing a failed connection
+    :param buffer_timeout: Seconds after which the zip buffer is flushed, if
+     use_buffer_flusher is True
+    :param use_buffer_flusher: Flush the zip buffer after buffer_timeout
+    :param kwargs: Any other `Sender` argument (timeout, inactivity_timeout,
+     debug, logger...)
+
+    >>>pool = SenderPool(config=engine_config, connections=4,
+    ...                  addresses=[("relay-1", 443), ("relay-2", 443)])
+    >>>pool.send(tag='my.app.devo_sender.test', msg='test of msg')
+
+    See Also:
+        Sender
+    """
+
+    def __init__(
+        self,
+        config=None,
+        con_type=None,
+        connections: int = 2,
+        addresses: Optional[list] = None,
+        selection: PoolSelection = PoolSelection.ROUND_ROBIN,
+        retry_wait: float = 1.0,
+        max_retry_wait: float = 30.0,
+        buffer_timeout: float = 10.0,
+        use_buffer_flusher: bool = False,
+        **kwargs
+    ):
+        if config is None or connections <= 0:
+            raise DevoSenderException(ERROR_MSGS.PROBLEMS_WITH_SENDER_ARGS)
+        if isinstance(config, (dict, Configuration)):
+            kwargs.setdefault("timeout", config.get("timeout", 30))
+            kwargs.setdefault("debug", config.get("debug", False))
+            config = Sender._from_dict(config=config, con_type=con_type)
+
+        relays = addresses is None and getattr(config, "relays", None) is not None
+        addresses = addresses or [config.address]
+        for address in addresses:
+            if not isinstance(address, tuple):
+                raise DevoSenderException(ERROR_MSGS.ADDRESS_MUST_BE_A_TUPLE)
+
+        self.selection = PoolSelection(selection)
+        self.members: list = []
+        for index in range(connections):
+            # Copies of a SenderConfigSSL share its SSL context and TLS sessions
+            member_config = copy.copy(config)
+            # With the relays of the configuration the members share its
+            # RelaySet and fail over on their own, else each one is pinned
+            if not relays:
+                member_config.address = addresses[index % len(addresses)]
+                member_config.relays = None
+            self.members.append(
+                PoolMember(index, member_config, retry_wait, max_retry_wait, **kwargs)
+            )
+
+        self.buffer = SenderBuffer()
+        self.buffer.buffer_timeout = buffer_timeout
+        self.buffer.buffer_flusher_func = self.flush_buffer
+        self.buffer.use_buffer_flusher = use_buffer_flusher
+        self.buffer_lock = Lock()
+        self.__lock = Lock()
+        self.__next = count()
+
+        for member in self.members:
+            try:
+                member.connect()
+            except DevoSenderException as error:
+                member.failed(error)
+        if all(member.sender is None for member in self.members):
+            self.close()
+            raise DevoSenderException(ERROR_MSGS.NO_CONNECTION_AVAILABLE)
+
+    @property
+    def stats(self) -> list:
+        """State of every connection: address, connected, in_flight, sent and failures"""
+        return [
+            {
+                "address": member.address,
+                "connected": member.sender is not None,
+                "in_flight": member.in_flight,
+                "sent": member.sent,
+                "failures": member.failures,
+            }
+            for member in self.members
+        ]
+
+    def buffer_size(self, size=19500):
+        """
+        Set buffer size of the shared zip buffer, in compressed bytes
+
+        :param size: New size of buffer. Default 19500
+        :return True or False
+        """
+        try:
+            self.buffer.length = size
+            return True
+        except Exception:
+            return False
+
+    def compression_level(self, cl=-1):
+        """
+        Set compression level for zipped data, see `Sender.compression_level`
+
+        :param cl: (Compression_level). Default -1
+        :return True or False
+        """
+        try:
+            self.buffer.compression_level = cl
+            return True
+        except Exception:
+            return False
+
+    def __acquire(self, tried: set) -> Optional[PoolMember]:
+        now = time.time()
+        with self.__lock:
+            candidates = [
+                member
+                for member in self.members
+                if member.index not in tried and member.available(now)
+            ]
+            if not candidates:
+                # Every connection is in backoff, try the one closest to retry
+                candidates = [
+                    min(
+                        (member for member in self.members if member.index not in tried),
+                        key=lambda member: member.next_retry,
+                        default=None,
+                    )
+                ]
+                if candidates[0] is None:
+                    return None
+            if self.selection == PoolSelection.LEAST_LOADED:
+                member = min(candidates, key=lambda member: (member.in_flight, member.sent))
+            else:
+                member = candidates[next(self.__next) % len(candidates)]
+            member.in_flight += 1
+            return member
+
+    def __release(self, member: PoolMember):
+        with self.__lock:
+            member.in_flight -= 1
+
+    def __call(self, method: str, *args, **kwargs):
+        """Call a method of the Sender of one of the connections, retrying with
+        the other connections if it fails"""
+        tried = set()
+        error = None
+        while True:
+            member = self.__acquire(tried)
+            if member is None:
+                raise DevoSenderException(ERROR_MSGS.NO_CONNECTION_AVAILABLE) from error
+            tried.add(member.index)
+            try:
+                with member.lock:
+                    result = getattr(member.connect(), method)(*args, **kwargs)
+                    member.succeeded()
+                return result
+            except DevoSenderException as exc:
+                error = exc
+                with member.lock:
+                    member.failed(exc)
+            finally:
+                self.__release(member)
+
+    def send(self, tag, msg, **kwargs):
+        """
+        Creates the raw message and send it through one of the connections.
+        Same arguments as `Sender.send`. Zipped messages are added to the
+        shared zip buffer.
+        """
+        if kwargs.get("zip", False):
+            if isinstance(msg, bytes):
+                return self.fill_buffer(
+                    COMPOSE_BYTES % (Sender.compose_mem(tag, bytes=True, **kwargs), msg)
+                )
+            if not kwargs.get("multiline", False):
+                # Encoded once, as in `Sender.send_str`. The buffers of the
+                # members are never flushed by the pool
+                msg = COMPOSE % (Sender.compose_mem(tag, **kwargs), msg)
+                return self.fill_buffer(msg.encode("utf-8", "replace"))
+        return self.__call("send", tag, msg, **kwargs)
+
+    def send_raw(self, record, multiline=False, zip=False):
+        """
+        Send a raw message through one of the connections. Same arguments as
+        `Sender.send_raw`
+        """
+        return self.__call("send_raw", record, multiline=multiline, zip=zip)
+
+    def send_many(self, tag, msgs, **kwargs):
+        """
+        Send a batch of messages through one of the connections. Same
+        arguments as `Sender.send_many`
+        """
+        if kwargs.get("zip", False):
+            sent = 0
+            for msg in msgs:
+                sent += self.send(tag, msg, **kwargs)
+            return sent
+        return self.__call("send_many", tag, list(msgs), **kwargs)
+
+    def send_raw_many(self, records, multiline=False, zip=False):
+        """
+        Send a batch of raw messages through one of the connections. Same
+        arguments as `Sender.send_raw_many`
+        """
+        return self.__call("send_raw_many", list(records), multiline=multiline, zip=zip)
+
+    def fill_buffer(self, msg: bytes):
+        """
+        Add the message to the shared zip buffer, flushing it when it is full
+        :param msg: bytes
+        :return: Number of events sent
+        """
+        if msg[-1:] != b"\n":
+            msg += b"\n"
+        with self.buffer_lock:
+            self.buffer.add(msg)
+            self.buffer.events += 1
+            full = self.buffer.compressed_length > self.buffer.length
+        if full:
+            return self.flush_buffer()
+        return 0
+
+    def flush_buffer(self):
+        """
+        Compress the shared zip buffer and send it through one of the
+        connections. The buffer is released before writing, so other threads
+        can keep adding events meanwhile. If no connection can send it, the
+        events are put back in the buffer for the next flush.
+        :return: Number of events sent
+        """
+        with self.buffer_lock:
+            if not self.buffer.raw_length:
+                return 0
+            events = self.buffer.events
+            batch = self.buffer.swap()
+            self.buffer.events = 0
+        try:
+            if self.__call("send_raw", batch.finish(), zip=True):
+                return events
+            return 0
+        except Exception as error:
+            with self.buffer_lock:
+                # Before the events added while it was being sent
+                self.buffer.text_buffer = batch.text + self.buffer.text_buffer
+                self.buffer.events += events
+                self.buffer.schedule_flush()
+            raise DevoSenderException(ERROR_MSGS.FLUSHING_BUFFER_ERROR) from error
+
+    def close(self):
+        """
+        Close every connection of the pool. The zip buffer is not flushed
+        """
+        self.buffer.close()
+        for member in self.members:
+            with member.lock:
+                member.close()
@@ -0,0 +1,551 @@
+# -*- coding: utf-8 -*-
+"""Non-blocking sending of data to Devo through a bounded in-memory queue
+served by a background writer thread"""
+
+import logging
+import time
+from collections import deque
+from functools import partial
+from enum import Enum
+from itertools import groupby
+from threading import Condition, Event, Thread
+from typing import Optional
+
+from .data import ERROR_MSGS, DevoSenderException, Sender
+from .transformsyslog import FACILITY_USER, priority_map
+
+log = logging.getLogger(__name__)
+
+
+class OverflowPolicy(str, Enum):
+    """What to do with a new event when the queue is full"""
+
+    def __str__(self):
+        return str(self.value)
+
+    BLOCK = "block"
+    """Wait until there is room in the queue (up to `block_timeout`)"""
+    DROP_OLDEST = "drop_oldest"
+    """Discard the oldest queued event to make room for the new one"""
+    DROP_NEWEST = "drop_newest"
+    """Discard the new event"""
+
+
+class QueuedSender:
+    """
+    Sender that never writes to the socket from the caller thread.
+
+    `send()` and `send_raw()` only append the event to a bounded queue and
+    return. A dedicated writer thread owns the `Sender`, takes the events in
+    batches, writes them and reconnects (with backoff) when the relay is not
+    available.
+
+    :param config: SenderConfigSSL, SenderConfigTCP or dict object, as in
+     `Sender`
+    :param con_type: TCP or SSL, as in `Sender`
+    :param con: Already created `Sender` to use instead of `config`. It must
+     not be used by any other thread afterwards
+    :param queue_size: Maximum number of queued events
+    :param overflow_policy: `OverflowPolicy` applied when the queue is full
+    :param block_timeout: Seconds to wait for room in the queue with
+     `OverflowPolicy.BLOCK`. None waits forever
+    :param batch_size: Maximum number of events taken from the queue at once
+    :param flush_interval: Seconds between flushes of the zip buffer done by
+     the writer thread. None disables them
+    :param retry_wait: Initial seconds to wait before retrying after an error
+    :param max_retry_wait: Maximum seconds to wait between retries
+    :param kwargs: Any other `Sender` argument (timeout, inactivity_timeout,
+     debug, logger...)
+
+    >>>con = QueuedSender(config=engine_config, queue_size=100000,
+    ...                   overflow_policy=OverflowPolicy.DROP_OLDEST)
+    >>>con.send(tag='my.app.devo_sender.test', msg='test of msg')
+    >>>con.close()
+
+    See Also:
+        Sender
+    """
+
+    def __init__(
+        self,
+        config=None,
+        con_type=None,
+        con: Optional[Sender] = None,
+        queue_size: int = 10000,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        block_timeout: Optional[float] = None,
+        batch_size: int = 500,
+        flush_interval: Optional[float] = None,
+        retry_wait: float = 1.0,
+        max_retry_wait: float = 30.0,
+        **kwargs
+    ):
+        if queue_size <= 0:
+            raise DevoSenderException(ERROR_MSGS.WRONG_QUEUE_SIZE)
+        self.con = con if con is not None else Sender(config=config, con_type=con_type, **kwargs)
+        self.queue_size = queue_size
+        self.overflow_policy = OverflowPolicy(overflow_policy)
+        self.block_timeout = block_timeout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_wait = retry_wait
+        self.max_retry_wait = max_retry_wait
+
+        self.sent: int = 0
+        """Events written by the writer thread. Zipped events are counted
+        when the zip buffer is flushed"""
+        self.dropped: int = 0
+        """Events discarded because of the overflow policy or on close"""
+        self.errors: int = 0
+        """Delivery errors found by the writer thread"""
+
+        self.__queue: deque = deque()
+        self.__pending: int = 0
+        self.__buffered: int = 0
+        self.__unfilled: deque = deque()
+        self.__condition = Condition()
+        self.__closing = False
+        self.__abort = Event()
+        self.__last_flush = time.time()
+        self.__writer = Thread(target=self.__run, name="devo-sender-writer", daemon=True)
+        self.__writer.start()
+
+    def __len__(self):
+        return len(self.__queue)
+
+    @property
+    def stats(self) -> dict:
+        """Counters of the queue: queued, sent, dropped and errors"""
+        return {
+            "queued": len(self.__queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def send(self, tag, msg, **kwargs) -> int:
+        """
+        Queue an event to be composed and sent by the writer thread. Same
+        arguments as `Sender.send`
+
+        :return: 1 if the event was queued, 0 if it was dropped
+        """
+        return self.__put(("send", tag, msg, kwargs))
+
+    def send_raw(self, record, multiline=False, zip=False) -> int:
+        """
+        Queue a raw event to be sent by the writer thread. Same arguments as
+        `Sender.send_raw`
+
+        :return: 1 if the event was queued, 0 if it was dropped
+        """
+        return self.__put(("raw", record, multiline, zip))
+
+    def send_record(self, record: logging.LogRecord, handler: "QueuedHandler") -> int:
+        """
+        Queue a logging record to be formatted and sent by the writer thread
+        through `handler`. Nothing is formatted on the caller thread
+
+        :param record: LogRecord
+        :param handler: QueuedHandler that formats the record
+        :return: 1 if the record was queued, 0 if it was dropped
+        """
+        return self.__put(("record", record, handler))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every event queued before this call has been written and
+        the zip buffer has been flushed
+
+        :param timeout: Maximum seconds to wait. None waits forever
+        :return: True if everything was written before the timeout
+        """
+        done, flushed = Event(), []
+        with self.__condition:
+            if self.__closing:
+                return not self.__queue and not self.__pending
+            self.__queue.append(("flush", done, flushed))
+            self.__condition.notify_all()
+        return done.wait(timeout) and bool(flushed)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop accepting events, write the queued ones and close the connection
+
+        :param timeout: Maximum seconds to wait for the queue to be written.
+         Events still queued after it are dropped. None waits forever
+        """
+        with self.__condition:
+            if self.__closing:
+                return
+            self.__closing = True
+            self.__condition.notify_all()
+        self.__writer.join(timeout)
+        if self.__writer.is_alive():
+            self.__abort.set()
+            self.__writer.join()
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __put(self, item) -> int:
+        with self.__condition:
+            if self.__closing:
+                raise DevoSenderException(ERROR_MSGS.SENDER_CLOSED)
+            if len(self.__queue) >= self.queue_size:
+                if self.overflow_policy == OverflowPolicy.DROP_NEWEST:
+                    self.dropped += 1
+                    return 0
+                if self.overflow_policy == OverflowPolicy.DROP_OLDEST:
+                    self.__drop_oldest()
+                elif not self.__condition.wait_for(
+                    lambda: len(self.__queue) < self.queue_size or self.__closing,
+                    self.block_timeout,
+                ):
+                    self.dropped += 1
+                    return 0
+                if self.__closing:
+                    raise DevoSenderException(ERROR_MSGS.SENDER_CLOSED)
+            self.__queue.append(item)
+            self.__condition.notify_all()
+        return 1
+
+    def __drop_oldest(self):
+        # Flush markers are not events and they are never discarded
+        for index, item in enumerate(self.__queue):
+            if item[0] != "flush":
+                del self.__queue[index]
+                self.dropped += 1
+                return
+
+    def __next_batch(self) -> list:
+        with self.__condition:
+            while not self.__queue and not self.__closing:
+                self.__condition.wait(self.__wait_time())
+                if not self.__queue and self.__flush_due():
+                    return []
+            batch = []
+            while self.__queue and len(batch) < self.batch_size:
+                batch.append(self.__queue.popleft())
+            self.__pending = len(batch)
+            self.__condition.notify_all()
+            return batch
+
+    def __wait_time(self) -> Optional[float]:
+        if self.flush_interval is None or not self.con.buffer.events:
+            return None
+        return max(self.flush_interval - (time.time() - self.__last_flush), 0.0)
+
+    def __flush_due(self) -> bool:
+        return (
+            self.flush_interval is not None
+            and self.con.buffer.events > 0
+            and time.time() - self.__last_flush >= self.flush_interval
+        )
+
+    def __run(self):
+        while not self.__abort.is_set():
+            batch = self.__next_batch()
+            if not batch and self.__closing and not self.__queue:
+                break
+            self.__deliver(batch)
+            if self.__flush_due():
+                self.__retry(self.__flush)
+            with self.__condition:
+                self.__pending = 0
+        if self.__abort.is_set():
+            self.__discard()
+        else:
+            self.__retry(self.__flush)
+
+    def __discard(self):
+        with self.__condition:
+            for item in self.__queue:
+                if item[0] == "flush":
+                    item[1].set()
+                else:
+                    self.dropped += 1
+            self.__queue.clear()
+            self.__pending = 0
+            # Nor are the events left in the zip buffer
+            self.dropped += self.con.buffer.events
+
+    @staticmethod
+    def __group_key(item):
+        # Consecutive events with the same options are written together
+        if item[0] == "send":
+            return item[0], item[1], item[3]
+        if item[0] == "raw":
+            return item[0], item[2], item[3]
+        if item[0] == "record":
+            return item[0], id(item[2])
+        return item[0], id(item)
+
+    def __deliver(self, batch):
+        for key, group in groupby(batch, key=self.__group_key):
+            group = list(group)
+            if key[0] == "flush":
+                if self.__retry(self.__flush):
+                    group[0][2].append(True)
+                group[0][1].set()
+            elif key[0] == "record":
+                self.__deliver_records(group[0][2], [item[1] for item in group])
+            elif not self.__sendable(group):
+                continue
+            elif key[0] == "send" and key[2].get("zip", False):
+                first = group[0]
+                if self.__abort.is_set() or not self.__fill(
+                    partial(self.con.send_many, first[1], **first[3]),
+                    [item[2] for item in group],
+                ):
+                    self.__drop_unfilled()
+            elif not self.__abort.is_set() and self.__retry(self.__write, group):
+                self.sent += len(group)
+            elif not self.__abort.is_set() and len(group) > 1:
+                # An event that cannot be sent (not str nor bytes...), the
+                # others are written one by one
+                for item in group:
+                    self.__deliver([item])
+            else:
+                with self.__condition:
+                    self.dropped += len(group)
+
+    def __sendable(self, group) -> list:
+        """Drop from the group the events that are not str nor bytes, their
+        error would discard the whole group
+
+        :return: The group, without them
+        """
+        index = 2 if group[0][0] == "send" else 1
+        for item in [item for item in group if not isinstance(item[index], (str, bytes))]:
+            group.remove(item)
+            self.errors += 1
+            log.error("Devo-QueuedSender|%s event dropped", type(item[index]).__name__)
+            with self.__condition:
+                self.dropped += 1
+        return group
+
+    def __deliver_records(self, handler, records):
+        # Formatted once, before the retries of their writes
+        events = []
+        for record in records:
+            try:
+                events.append(handler.prepare(record))
+            except Exception:
+                handler.handleError(record)
+                with self.__condition:
+                    self.dropped += 1
+        for severity, group in groupby(events, key=lambda event: event[0]):
+            msgs = [event[1] for event in group]
+            send_many = partial(
+                self.con.send_many, handler.tag, facility=handler.facility,
+                severity=severity, zip=handler.zip
+            )
+            if self.__abort.is_set():
+                delivered = False
+            elif handler.zip:
+                delivered = self.__fill(send_many, msgs)
+            else:
+                delivered = self.__retry(send_many, msgs)
+            if delivered:
+                if not handler.zip:
+                    self.sent += len(msgs)
+            elif handler.zip:
+                self.__drop_unfilled()
+            else:
+                with self.__condition:
+                    self.dropped += len(msgs)
+
+    def __write(self, group):
+        first = group[0]
+        if first[0] == "send":
+            self.con.send_many(first[1], [item[2] for item in group], **first[3])
+        else:
+            self.con.send_raw_many(
+                [item[1] for item in group], multiline=first[2], zip=first[3]
+            )
+
+    def __fill(self, send_many, msgs) -> bool:
+        """Add events to the zip buffer with `send_many`. The events added
+        before a failed flush stay in the buffer, so the retries only add
+        the rest"""
+        unfilled = self.__unfilled = deque(msgs)
+
+        def drain():
+            while unfilled:
+                yield unfilled.popleft()
+
+        def fill():
+            before = len(unfilled)
+            try:
+                send_many(drain())
+            finally:
+                self.__count_flushed(before - len(unfilled))
+
+        return self.__retry(fill)
+
+    def __drop_unfilled(self):
+        with self.__condition:
+            self.dropped += len(self.__unfilled)
+        self.__unfilled.clear()
+
+    def __flush(self):
+        self.__last_flush = time.time()
+        try:
+            self.con.flush_buffer()
+        finally:
+            self.__count_flushed()
+
+    def __count_flushed(self, added: int = 0):
+        """Count as sent the events that left the zip buffer since the last
+        call, once they are written"""
+        events = self.con.buffer.events
+        self.sent += self.__buffered + added - events
+        self.__buffered = events
+
+    def __retry(self, func, *args, **kwargs) -> bool:
+        """Call func until it works, waiting more and more between attempts.
+        Only the errors of the Sender are retried, any other one (an event
+        that cannot be composed...) gives up at once, as close() running out
+        of time"""
+        wait = self.retry_wait
+        while True:
+            try:
+                func(*args, **kwargs)
+                return True
+            except DevoSenderException as error:
+                self.errors += 1
+                log.warning("Devo-QueuedSender|%s, retrying in %.1fs", error, wait)
+            except Exception as error:
+                self.errors += 1
+                log.error("Devo-QueuedSender|%s: %s, not retried", type(error).__name__, error)
+                return False
+            if self.__abort.wait(wait):
+                return False
+            wait = min(wait * 2, self.max_retry_wait)
+
+
+class QueuedHandler(logging.Handler):
+    """
+    Logging handler that never writes to the socket from the logging thread.
+
+    `emit()` only appends the record to the bounded queue of a
+    `QueuedSender`, without formatting it. The writer thread formats the
+    records, frames them as syslog events of `tag` and sends them in
+    batches, through the zip buffer by default, so the latency of the
+    logging calls does not depend on the relay. When the queue is full the
+    overflow policy applies, dropping the new records by default.
+
+    The records are formatted after `emit()` returns, so their arguments
+    must not be modified after logging them, as with
+    `logging.handlers.QueueListener`.
+
+    :param config: SenderConfigSSL, SenderConfigTCP or dict object, as in
+     `Sender`
+    :param con_type: TCP or SSL, as in `Sender`
+    :param con: Already created `Sender` to use instead of `config`. It must
+     not be used by any other thread afterwards
+    :param tag: Tag of the events
+    :param level: Level of the handler
+    :param facility: Syslog facility of the events
+    :param zip: Send the events through the zip buffer, flushed every
+     `flush_interval` seconds
+    :param queue_size: Maximum number of queued records
+    :param overflow_policy: `OverflowPolicy` applied when the queue is full
+    :param block_timeout: Seconds to wait for room in the queue with
+     `OverflowPolicy.BLOCK`. None waits forever
+    :param batch_size: Maximum number of records taken from the queue at once
+    :param flush_interval: Seconds between flushes of the zip buffer
+    :param close_timeout: Maximum seconds that `flush()` and `close()` wait
+     for the queue to be written, so the exit of the process does not wait
+     for an unavailable relay. None waits forever
+    :param kwargs: Any other `QueuedSender` or `Sender` argument
+
+    >>>handler = QueuedHandler(config=engine_config, tag='my.app.devo_sender.test')
+    >>>logger = get_log(name='devo_logger', handler=handler)
+    >>>logger.info('Hello devo!')
+    >>>handler.close()
+
+    See Also:
+        QueuedSender, Sender.for_logging
+    """
+
+    def __init__(
+        self,
+        config=None,
+        con_type=None,
+        con: Optional[Sender] = None,
+        tag: str = "my.app.log",
+        level=logging.NOTSET,
+        facility: int = FACILITY_USER,
+        zip: bool = True,
+        queue_size: int = 10000,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP_NEWEST,
+        block_timeout: Optional[float] = None,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        close_timeout: Optional[float] = 5.0,
+        **kwargs
+    ):
+        super().__init__(level=level)
+        self.tag = tag
+        self.facility = facility
+        self.zip = zip
+        self.close_timeout = close_timeout
+        self.queue = QueuedSender(
+            config=config,
+            con_type=con_type,
+            con=con,
+            queue_size=queue_size,
+            overflow_policy=overflow_policy,
+            block_timeout=block_timeout,
+            batch_size=batch_size,
+            flush_interval=flush_interval if zip else None,
+            **kwargs
+        )
+
+    @property
+    def stats(self) -> dict:
+        """Counters of the queue: queued, sent, dropped and errors"""
+        return self.queue.stats
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Queue the record, to be formatted and sent by the writer thread
+
+        :param record: LogRecord
+        """
+        try:
+            self.queue.send_record(record, self)
+        except Exception:
+            self.handleError(record)
+
+    def prepare(self, record: logging.LogRecord) -> tuple:
+        """
+        Format a record as `Sender.emit` does. Called by the writer thread
+
+        :param record: LogRecord
+        :return: (severity, message)
+        """
+        msg = self.format(record) + "\000"
+        try:
+            severity = priority_map.get(record.levelname, record.levelno)
+        except AttributeError:
+            severity = priority_map.get("INFO")
+        return severity, msg
+
+    def flush(self) -> None:
+        """Wait up to `close_timeout` for the queued records to be sent"""
+        self.queue.flush(self.close_timeout)
+
+    def close(self) -> None:
+        """Send the queued records, waiting up to `close_timeout`, and close
+        the connection"""
+        try:
+            self.queue.close(self.close_timeout)
+        finally:
+            super().close()
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""Failover between several relay endpoints, with health checks, a circuit
+breaker per endpoint and latency-aware preference"""
+
+import logging
+import socket
+import time
+import weakref
+from enum import Enum
+from threading import Event, Lock, Thread
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    """Circuit breaker state of a relay endpoint"""
+
+    def __str__(self):
+        return str(self.value)
+
+    CLOSED = "closed"
+    """The endpoint is healthy and used"""
+    OPEN = "open"
+    """The endpoint failed too many times, it is not used until a probe succeeds"""
+    HALF_OPEN = "half_open"
+    """The reset timeout has passed, the next connection is a trial"""
+
+
+class RelayEndpoint:
+    """Health and latency of one relay address"""
+
+    def __init__(self, address: tuple):
+        self.address: tuple = address
+        self.state: CircuitState = CircuitState.CLOSED
+        self.failures: int = 0
+        """Consecutive failures of the endpoint"""
+        self.latency: Optional[float] = None
+        """Smoothed connection (and TLS handshake) latency, in seconds. None
+        until measured"""
+        self.probe_latency: Optional[float] = None
+        """Smoothed TCP connect time of the probes, in seconds. None until
+        probed"""
+        self.opened_at: float = 0.0
+        """Time the circuit was opened"""
+
+    def measured(self, latency: float, smoothing: float) -> None:
+        self.latency = _smoothed(self.latency, latency, smoothing)
+
+    def probed(self, latency: float, smoothing: float) -> None:
+        self.probe_latency = _smoothed(self.probe_latency, latency, smoothing)
+
+    def __repr__(self):
+        return "RelayEndpoint(%s:%s, %s)" % (self.address[0], self.address[1], self.state)
+
+
+def _smoothed(previous: Optional[float], latency: float, smoothing: float) -> float:
+    return latency if previous is None else previous + smoothing * (latency - previous)
+
+
+def _preference(endpoint: RelayEndpoint) -> tuple:
+    if endpoint.latency is not None:
+        return 0, endpoint.latency
+    if endpoint.probe_latency is not None:
+        return 1, endpoint.probe_latency
+    return 2, 0.0
+
+
+class RelaySet:
+    """
+    List of relay endpoints of a configuration.
+
+    Connections are tried in order of preference: endpoints with a closed
+    circuit first, the ones with lower measured connection latency before
+    (or lower probe latency, among the ones never connected), then the ones
+    whose circuit reset timeout has passed. An endpoint is opened (skipped)
+    after `failure_threshold` consecutive failures. A background thread
+    probes the open endpoints, so the callers never pay their connect
+    timeout, and refreshes the latency of the healthy ones.
+
+    :param addresses: List of (address, port) tuples, in order of preference
+     while latency is not known
+    :param failure_threshold: Consecutive failures that open the circuit of
+     an endpoint
+    :param reset_timeout: Seconds after which an open endpoint can be tried
+     again by a connection, if no probe closed it before
+    :param probe_interval: Seconds between background probes. None disables them
+    :param probe_timeout: Connect timeout of the probes
+    :param smoothing: Weight of each new latency measurement (0 to 1)
+
+    >>>relays = RelaySet([("relay-1", 443), ("relay-2", 443)], failure_threshold=2)
+    >>>engine_config = SenderConfigSSL(address=relays, key=KEY, cert=CERT, chain=CHAIN)
+
+    See Also:
+        SenderConfigSSL, SenderConfigTCP
+    """
+
+    def __init__(
+        self,
+        addresses: list,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        probe_interval: Optional[float] = 10.0,
+        probe_timeout: float = 5.0,
+        smoothing: float = 0.3,
+    ):
+        self.endpoints: list = [RelayEndpoint(address) for address in addresses]
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.smoothing = smoothing
+        self.__lock = Lock()
+        self.__stop = Event()
+        self.__prober: Optional[Thread] = None
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def __getstate__(self):
+        # The lock and the prober are not copied, so the configurations can
+        # be sent to other processes
+        state = self.__dict__.copy()
+        for name in ("_RelaySet__lock", "_RelaySet__stop", "_RelaySet__prober"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = Lock()
+        self.__stop = Event()
+        self.__prober = None
+
+    @property
+    def stats(self) -> list:
+        """State of every endpoint: address, state, failures, latency and
+        probe latency"""
+        with self.__lock:
+            return [
+                {
+                    "address": endpoint.address,
+                    "state": str(endpoint.state),
+                    "failures": endpoint.failures,
+                    "latency": endpoint.latency,
+                    "probe_latency": endpoint.probe_latency,
+                }
+                for endpoint in self.endpoints
+            ]
+
+    def candidates(self) -> list:
+        """
+        Endpoints to try for a new connection, in order of preference. Open
+        endpoints are only included when every endpoint is open, so there is
+        always something to try.
+
+        :return: List of RelayEndpoint
+        """
+        now = time.time()
+        with self.__lock:
+            healthy, trial, broken = [], [], []
+            for endpoint in self.endpoints:
+                if (
+                    endpoint.state == CircuitState.OPEN
+                    and now - endpoint.opened_at >= self.reset_timeout
+                ):
+                    endpoint.state = CircuitState.HALF_OPEN
+                if endpoint.state == CircuitState.CLOSED:
+                    healthy.append(endpoint)
+                elif endpoint.state == CircuitState.HALF_OPEN:
+                    trial.append(endpoint)
+                else:
+                    broken.append(endpoint)
+        # The probes do not include the TLS handshake, so their latency is only
+        # compared between the endpoints not connected yet. sorted() is
+        # stable: without latency the configured order is kept
+        healthy = sorted(healthy, key=_preference)
+        broken = sorted(broken, key=lambda endpoint: endpoint.opened_at)
+        return healthy + trial + (broken if not healthy and not trial else [])
+
+    def record_success(self, endpoint: RelayEndpoint, latency: float) -> None:
+        """
+        Register a successful connection to an endpoint
+
+        :param endpoint: RelayEndpoint connected
+        :param latency: Seconds the connection (and handshake) took
+        """
+        with self.__lock:
+            self.__close(endpoint)
+            endpoint.measured(latency, self.smoothing)
+
+    @staticmethod
+    def __close(endpoint: RelayEndpoint):
+        if endpoint.state != CircuitState.CLOSED:
+            log.info("Devo-RelaySet|%s:%s is available again", *endpoint.address)
+        endpoint.state = CircuitState.CLOSED
+        endpoint.failures = 0
+
+    def record_failure(self, endpoint: RelayEndpoint, error: Exception) -> None:
+        """
+        Register a failed connection to an endpoint, opening its circuit when
+        it reaches the failure threshold
+
+        :param endpoint: RelayEndpoint that failed
+        :param error: Error of the connection
+        """
+        with self.__lock:
+            endpoint.failures += 1
+            if (
+                endpoint.state == CircuitState.HALF_OPEN
+                or endpoint.failures >= self.failure_threshold
+            ):
+                if endpoint.state != CircuitState.OPEN:
+                    log.warning(
+                        "Devo-RelaySet|%s:%s is not available (%s)",
+                        endpoint.address[0], endpoint.address[1], error,
+                    )
+                endpoint.state = CircuitState.OPEN
+                endpoint.opened_at = time.time()
+        self.start()
+
+    def probe(self, endpoint: RelayEndpoint) -> bool:
+        """
+        Check an endpoint opening (and closing) a TCP connection to it, and
+        register the result. The connect time is kept in `probe_latency`,
+        apart from the latency of the connections
+
+        :param endpoint: RelayEndpoint to check
+        :return: True if the endpoint accepts connections
+        """
+        start = time.perf_counter()
+        try:
+            with socket.create_connection(endpoint.address, timeout=self.probe_timeout):
+                pass
+        except OSError as error:
+            with self.__lock:
+                endpoint.failures += 1
+                if (
+                    endpoint.state != CircuitState.CLOSED
+                    or endpoint.failures >= self.failure_threshold
+                ):
+                    endpoint.state = CircuitState.OPEN
+                    endpoint.opened_at = time.time()
+            log.debug("Devo-RelaySet|probe of %s:%s failed (%s)", *endpoint.address, error)
+            return False
+        latency = time.perf_counter() - start
+        with self.__lock:
+            self.__close(endpoint)
+            endpoint.probed(latency, self.smoothing)
+        return True
+
+    def start(self) -> None:
+        """Start the background prober, if it is enabled and not running"""
+        if self.probe_interval is None or len(self.endpoints) < 2:
+            return
+        with self.__lock:
+            if self.__prober is not None and self.__prober.is_alive():
+                return
+            self.__stop.clear()
+            # The thread only keeps a weak reference, so it ends when the
+            # configuration that owns the set is discarded
+            self.__prober = Thread(
+                target=RelaySet.__run,
+                args=(weakref.ref(self), self.__stop, self.probe_interval),
+                name="devo-sender-relay-prober",
+                daemon=True,
+            )
+            self.__prober.start()
+
+    def stop(self) -> None:
+        """Stop the background prober"""
+        self.__stop.set()
+        prober = self.__prober
+        if prober is not None and prober.is_alive():
+            prober.join()
+
+    @staticmethod
+    def __run(reference, stop: Event, interval: float):
+        while not stop.wait(interval):
+            relays = reference()
+            if relays is None:
+                return
+            for endpoint in list(relays.endpoints):
+                if stop.is_set():
+                    return
+                relays.probe(endpoint)
+            del relays
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Make-before-break rotation of Sender connections: the replacement of a
+connection is opened in the background before it has to be closed, and the
+old one is drained and closed in the background too"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Optional
+
+DEFAULT_ROTATION_LEAD = 5.0
+"""Seconds before the deadline of a connection at which its replacement is
+opened"""
+
+ROTATION_WORKERS = 4
+"""Threads that open connections in the background, and threads that close
+them, shared by every Sender of the process"""
+
+_executor: Optional[ThreadPoolExecutor] = None
+_closing_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = Lock()
+
+
+def rotation_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool that opens the replacement connections, shared by every Sender
+
+    :return: ThreadPoolExecutor
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=ROTATION_WORKERS, thread_name_prefix="devo-sender-rotation"
+            )
+        return _executor
+
+
+def closing_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool that drains and closes the old connections, shared by every
+    Sender. Draining can wait for the socket timeout, so it has its own
+    threads and never delays the opening of the replacements
+
+    :return: ThreadPoolExecutor
+    """
+    global _closing_executor
+    with _executor_lock:
+        if _closing_executor is None:
+            _closing_executor = ThreadPoolExecutor(
+                max_workers=ROTATION_WORKERS, thread_name_prefix="devo-sender-closing"
+            )
+        return _closing_executor
+
+
+class PreparedConnection:
+    """Connection opened in the background, waiting to replace the one of a
+    Sender"""
+
+    __slots__ = ("socket", "address", "watch", "opened")
+
+    def __init__(self, sock, address, watch, opened: Optional[float] = None):
+        self.socket = sock
+        self.address = address
+        self.watch = watch
+        """ConnectionWatch of the socket, triggered if the endpoint closes it
+        or sends something before it is used"""
+        self.opened: float = time.time() if opened is None else opened
+        """time.time() when it was connected"""
+
+    def is_fresh(self, inactivity_timeout: float) -> bool:
+        """
+        Check if the connection has not been idle for longer than the
+        inactivity timeout of the balancer, so it can still be used
+
+        :param inactivity_timeout: Seconds, as in `Sender`
+        :return: True if it can be used
+        """
+        return time.time() - self.opened < inactivity_timeout
+
+
+def _after_fork():
+    # The threads of the pool do not exist in a forked child
+    global _executor, _closing_executor, _executor_lock
+    _executor = _closing_executor = None
+    _executor_lock = Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
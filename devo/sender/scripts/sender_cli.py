@@ -15,11 +15,15 @@ except ImportError as import_error:
     sys.exit(1)
 
 import os
+import signal
 
 from devo.__version__ import __version__
 from devo.common import Configuration
-from devo.sender.data import DevoSenderException, Sender, open_file
+from devo.sender.bulk import DEFAULT_SHARD_SIZE, PROGRESS_INTERVAL, bulk_send
+from devo.sender.data import ERROR_MSGS, DevoSenderException, Sender
+from devo.sender.files import is_gzip_file, send_file, send_multiline_file
 from devo.sender.lookup import Lookup
+from devo.sender.tail import DEFAULT_POLL_INTERVAL, FileFollower
 
 # Groups
 # ------------------------------------------------------------------------------
@@ -76,7 +80,11 @@ def cli(version):
     help="Flag for multiline (With break-line in msg). Default False",
     default=False,
 )
-@click.option("--type", help="Connection type: SSL or TCP", default="SSL")
+@click.option(
+    "--type",
+    help="Connection type: SSL, TCP, UNIX, FILE or NULL. The address of UNIX and FILE is a path",
+    default="SSL",
+)
 @click.option(
     "--tag",
     "-t",
@@ -92,7 +100,8 @@ def cli(version):
 @click.option(
     "--file",
     "-f",
-    help="The file that you want to send to Devo, which will be sent line by line.",
+    help="The file that you want to send to Devo, which will be sent line by line. Gzip files "
+    "of syslog events are sent as they are, as zip frames.",
     type=click.Path(exists=True, readable=True),
 )
 @click.option(
@@ -141,37 +150,28 @@ def data(**kwargs):
                 print_error(str("File '%s' does not found" % Path(config["file"]).absolute()))
                 return
             if config["multiline"]:
-                with open_file(config["file"], mode="r") as file:
-                    content = file.read()
-                    if not config["raw"]:
-                        sended += con.send(
-                            tag=config["tag"],
-                            msg=content,
-                            multiline=config["multiline"],
-                            zip=config.get("zip", False),
-                        )
-                    else:
-                        sended += con.send_raw(
-                            content,
-                            multiline=config["multiline"],
-                            zip=config.get("zip", False),
-                        )
+                if is_gzip_file(config["file"]):
+                    print_error("Multiline is not supported with gzip files")
+                    return
+                # Streamed from the file, it is never read whole
+                sended += send_multiline_file(
+                    con, config["file"], tag=config["tag"], raw=config["raw"]
+                )
             else:
-                with open_file(config["file"], mode="r") as file:
-                    if config["header"]:
-                        next(file)
-                    for line in file:
-                        if config["raw"]:
-                            sended += con.send_raw(line)
-                        else:
-                            sended += con.send(
-                                tag=config["tag"],
-                                msg=line,
-                                zip=config.get("zip", False),
-                            )
+                # Gzip files of syslog events are sent as they are
+                sended += send_file(
+                    con,
+                    config["file"],
+                    tag=config["tag"],
+                    raw=config["raw"],
+                    zip=config.get("zip", False),
+                    header=config["header"],
+                )
         else:
             sended += con.send(tag=config["tag"], msg=config["line"], zip=config.get("zip", False))
 
+        if config.get("zip", False):
+            sended += con.flush_buffer()
         con.close()
         if config.get("debug", False):
             click.echo("Sended: %s" % str(sended))
@@ -184,6 +184,246 @@ def data(**kwargs):
         print_error(str(error))
 
 
+@cli.command()
+@click.argument("paths", nargs=-1, required=True)
+@click.option(
+    "--config",
+    "-c",
+    type=click.Path(exists=True, readable=True),
+    help="Optional JSON/Yaml File with configuration info.",
+)
+@click.option("--address", "-a", help="Devo relay address")
+@click.option("--port", "-p", help="Devo relay address port")
+@click.option(
+    "--key",
+    help="Devo user key cert file.",
+    type=click.Path(exists=True, readable=True),
+)
+@click.option("--cert", help="Devo user cert file.", type=click.Path(exists=True, readable=True))
+@click.option("--chain", help="Devo chain.crt file.", type=click.Path(exists=True, readable=True))
+@click.option("--sec_level", help="Sec level for opensslsocket. Default: None", type=int)
+@click.option(
+    "--verify_mode",
+    help="Verify mode for SSL Socket. "
+    "Default: SSL default."
+    'You need use int "0" (CERT_NONE), '
+    '"1" (CERT_OPTIONAL) or '
+    '"2" (CERT_REQUIRED)',
+    type=int,
+)
+@click.option("--check_hostname", help="Verify cert hostname. Default: True", type=bool)
+@click.option(
+    "--type",
+    help="Connection type: SSL, TCP, UNIX, FILE or NULL. The address of UNIX and FILE is a path",
+    default="SSL",
+)
+@click.option(
+    "--tag",
+    "-t",
+    help="Tag / Table to which the data will be sent in Devo.",
+    default="test.drop.ltsender",
+)
+@click.option(
+    "--header",
+    "-h",
+    help="This option is used to indicate if the files have headers or not, not to send them.",
+    default=False,
+    type=bool,
+)
+@click.option("--raw", is_flag=True, help="Send raw events from the files")
+@click.option("--zip/--no-zip", help="Send the events zipped. Default: True", default=True)
+@click.option("--buffer", help="Buffer size for zipped data.", type=int)
+@click.option(
+    "--compression_level",
+    help="Compression level for zipped data. Read readme for more info",
+    type=int,
+)
+@click.option(
+    "--processes",
+    "-P",
+    help="Number of worker processes, each one with its own connection. Default: number of CPUs",
+    type=int,
+)
+@click.option(
+    "--shard-size",
+    help="MB of the parts in which the big files are split between the workers.",
+    default=DEFAULT_SHARD_SIZE // (1024 * 1024),
+    type=int,
+)
+@click.option(
+    "--interval",
+    help="Seconds between progress reports.",
+    default=PROGRESS_INTERVAL,
+    type=float,
+)
+@click.option(
+    "--no-verify-certificates",
+    help="Do not Verify certificates credentials before connection",
+    type=bool,
+    is_flag=True,
+)
+@click.option("--env", "-e", help="Use env vars for configuration", default=False, type=bool)
+@click.option(
+    "--default",
+    "-d",
+    help="Use default file for configuration",
+    default=False,
+    type=bool,
+)
+@click.option("--debug/--no-debug", help="For testing purposes", default=False)
+def bulk(**kwargs):
+    """Send the lines of many files to devo from several processes"""
+    config = configure(kwargs)
+    try:
+        progress = bulk_send(
+            config["paths"],
+            config=config,
+            tag=config["tag"],
+            raw=config["raw"],
+            zip=config["zip"],
+            header=config["header"],
+            processes=config.get("processes"),
+            shard_size=config["shard_size"] * 1024 * 1024,
+            buffer_size=config.get("buffer"),
+            compression_level=config.get("compression_level"),
+            interval=config["interval"],
+            on_progress=lambda progress: click.echo(str(progress)),
+            on_file=lambda path, progress: click.echo(
+                "Completed: %s (%d events)" % (path, progress.files[path][3])
+            ),
+        )
+    except DevoSenderException as error:
+        print_error(str(error))
+        if config.get("debug", False):
+            raise DevoSenderException(str(error)) from error
+        exit(1)
+
+    for shard, error in progress.failed:
+        print_error("%r: %s" % (shard, error))
+    click.echo("Sended: %d" % progress.events)
+    if progress.failed:
+        print_error(ERROR_MSGS.BULK_SHARDS_FAILED % (len(progress.failed), progress.shards))
+        exit(1)
+
+
+@cli.command()
+@click.argument("paths", nargs=-1, required=True)
+@click.option(
+    "--config",
+    "-c",
+    type=click.Path(exists=True, readable=True),
+    help="Optional JSON/Yaml File with configuration info.",
+)
+@click.option("--address", "-a", help="Devo relay address")
+@click.option("--port", "-p", help="Devo relay address port")
+@click.option(
+    "--key",
+    help="Devo user key cert file.",
+    type=click.Path(exists=True, readable=True),
+)
+@click.option("--cert", help="Devo user cert file.", type=click.Path(exists=True, readable=True))
+@click.option("--chain", help="Devo chain.crt file.", type=click.Path(exists=True, readable=True))
+@click.option("--sec_level", help="Sec level for opensslsocket. Default: None", type=int)
+@click.option(
+    "--verify_mode",
+    help="Verify mode for SSL Socket. "
+    "Default: SSL default."
+    'You need use int "0" (CERT_NONE), '
+    '"1" (CERT_OPTIONAL) or '
+    '"2" (CERT_REQUIRED)',
+    type=int,
+)
+@click.option("--check_hostname", help="Verify cert hostname. Default: True", type=bool)
+@click.option(
+    "--type",
+    help="Connection type: SSL, TCP, UNIX, FILE or NULL. The address of UNIX and FILE is a path",
+    default="SSL",
+)
+@click.option(
+    "--tag",
+    "-t",
+    help="Tag / Table to which the data will be sent in Devo.",
+    default="test.drop.ltsender",
+)
+@click.option("--raw", is_flag=True, help="Send raw events from the files")
+@click.option("--zip/--no-zip", help="Send the events zipped. Default: True", default=True)
+@click.option("--buffer", help="Buffer size for zipped data.", type=int)
+@click.option(
+    "--compression_level",
+    help="Compression level for zipped data. Read readme for more info",
+    type=int,
+)
+@click.option(
+    "--checkpoint",
+    help="File where the offsets of the files are saved, to resume after a restart.",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--from-start",
+    is_flag=True,
+    help="Send the content of the files without checkpoint, not only the new lines.",
+)
+@click.option(
+    "--poll-interval",
+    help="Seconds between checks of the files.",
+    default=DEFAULT_POLL_INTERVAL,
+    type=float,
+)
+@click.option("--polling", is_flag=True, help="Poll the files instead of using inotify.")
+@click.option("--once", is_flag=True, help="Send the new lines and exit, without following.")
+@click.option(
+    "--no-verify-certificates",
+    help="Do not Verify certificates credentials before connection",
+    type=bool,
+    is_flag=True,
+)
+@click.option("--env", "-e", help="Use env vars for configuration", default=False, type=bool)
+@click.option(
+    "--default",
+    "-d",
+    help="Use default file for configuration",
+    default=False,
+    type=bool,
+)
+@click.option("--debug/--no-debug", help="For testing purposes", default=False)
+def tail(**kwargs):
+    """Follow files and send their new lines to devo"""
+    config = configure(kwargs)
+    try:
+        con = Sender(config=config)
+        if config.get("buffer", None) is not None:
+            con.buffer_size(size=config.get("buffer"))
+        if config.get("compression_level", None) is not None:
+            con.compression_level(cl=config.get("compression_level"))
+        follower = FileFollower(
+            con,
+            config["paths"],
+            tag=config["tag"],
+            raw=config["raw"],
+            zip=config["zip"],
+            checkpoint=config.get("checkpoint"),
+            from_start=config["from_start"],
+            poll_interval=config["poll_interval"],
+            use_inotify=not config["polling"],
+        )
+        previous = signal.signal(signal.SIGTERM, lambda signum, frame: follower.stop())
+        try:
+            follower.run(once=config["once"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+            follower.close()
+            con.close()
+        if config.get("debug", False):
+            click.echo("Sended: %s" % str(follower.sent))
+    except DevoSenderException as error:
+        print_error(str(error))
+        if config.get("debug", False):
+            raise DevoSenderException(str(error)) from error
+        exit(1)
+
+
 @cli.command()
 @click.option(
     "--config",
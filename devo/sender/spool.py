@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+"""Durable disk spool (write-ahead log) for the events of a Sender, so they
+survive relay outages and process restarts"""
+
+import logging
+import os
+import struct
+import time
+import weakref
+import zlib
+from enum import Enum
+from pathlib import Path
+from threading import Condition, Event, Thread
+from typing import Callable, Optional
+
+log = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct("<IIB")
+"""Header of each record of a segment: payload length, crc32 and flags"""
+FLAG_MULTILINE = 1
+FLAG_ZIP = 2
+SEGMENT_SUFFIX = ".seg"
+CHECKPOINT_FILE = "checkpoint"
+
+
+class FsyncPolicy(str, Enum):
+    """When the spool forces its writes to reach the disk"""
+
+    def __str__(self):
+        return str(self.value)
+
+    BATCH = "batch"
+    """After each append (a single event or a whole batch)"""
+    INTERVAL = "interval"
+    """At most once every `fsync_interval` seconds"""
+    NONE = "none"
+    """Never, it is left to the operating system"""
+
+
+class SpoolRecord:
+    """Record read from the spool"""
+
+    __slots__ = ("payload", "multiline", "zip", "position")
+
+    def __init__(self, payload: bytes, flags: int, position: tuple):
+        self.payload: bytes = payload
+        self.multiline: bool = bool(flags & FLAG_MULTILINE)
+        self.zip: bool = bool(flags & FLAG_ZIP)
+        self.position: tuple = position
+        """(segment, offset) right after the record, to commit it"""
+
+
+class Spool:
+    """
+    Append-only spool of records in segment files.
+
+    Each segment is a sequence of records with a fixed header (length, crc32
+    and flags) and the payload, and it is never modified once written, so
+    the segments can be read (or mapped in memory) while new records are
+    appended to the last one. The position of the first record not yet
+    delivered is saved in a checkpoint file, replaced atomically, so the
+    records are replayed after a restart: the delivery is at least once.
+
+    Disk usage is bounded by `max_bytes`: when it is exceeded the oldest
+    segments are discarded, even if they were not delivered.
+
+    :param path: Directory of the spool. It is created if it does not exist
+    :param segment_size: Bytes after which a new segment file is started
+    :param max_bytes: Maximum bytes of all the segments
+    :param fsync: `FsyncPolicy` of the appends
+    :param fsync_interval: Seconds between syncs with `FsyncPolicy.INTERVAL`
+
+    >>>spool = Spool("/var/spool/devo", max_bytes=1024 ** 3)
+    >>>con = Sender(config=engine_config, spool=spool)
+
+    See Also:
+        Sender
+    """
+
+    def __init__(
+        self,
+        path,
+        segment_size: int = 16 * 1024 * 1024,
+        max_bytes: int = 1024 * 1024 * 1024,
+        fsync: FsyncPolicy = FsyncPolicy.INTERVAL,
+        fsync_interval: float = 1.0,
+    ):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # Several segments must fit in max_bytes, only whole segments are discarded
+        self.segment_size = max(min(segment_size, max_bytes // 4), 1)
+        self.fsync = FsyncPolicy(fsync)
+        self.fsync_interval = fsync_interval
+        self.dropped_bytes: int = 0
+        """Bytes discarded, not delivered, to keep the spool under max_bytes"""
+
+        self.__condition = Condition()
+        self.__sizes: dict = {}
+        self.__writer = None
+        self.__last_sync = time.time()
+        self.__dirty = False
+        self.__closed = False
+        self.__recover()
+
+    def __segment_path(self, segment: int) -> Path:
+        return self.path / ("%020d%s" % (segment, SEGMENT_SUFFIX))
+
+    def __recover(self):
+        """Find the segments and the checkpoint left by a previous process"""
+        for file in self.path.glob("*" + SEGMENT_SUFFIX):
+            if file.stem.isdigit():
+                self.__sizes[int(file.stem)] = file.stat().st_size
+
+        self.__position = self.__read_checkpoint()
+        for segment in [segment for segment in self.__sizes if segment < self.__position[0]]:
+            self.__remove(segment)
+        if not self.__sizes:
+            self.__segment_path(self.__position[0]).touch()
+            self.__sizes[self.__position[0]] = 0
+        if self.__position[0] not in self.__sizes:
+            self.__position = (min(self.__sizes), 0)
+
+        last = max(self.__sizes)
+        valid = self.__scan(last)
+        if valid < self.__sizes[last]:
+            log.warning(
+                "Devo-Spool|discarding %d bytes of an incomplete record in %s",
+                self.__sizes[last] - valid, self.__segment_path(last),
+            )
+            with open(self.__segment_path(last), "r+b") as file:
+                file.truncate(valid)
+            self.__sizes[last] = valid
+        if self.__position[0] == last and self.__position[1] > valid:
+            self.__position = (last, valid)
+        self.__writer = open(self.__segment_path(last), "ab")
+
+    def __read_checkpoint(self) -> tuple:
+        try:
+            segment, offset = (self.path / CHECKPOINT_FILE).read_text().split()
+            return int(segment), int(offset)
+        except (OSError, ValueError):
+            return (min(self.__sizes) if self.__sizes else 0), 0
+
+    def __scan(self, segment: int) -> int:
+        """Offset of the end of the last complete and valid record of a segment"""
+        offset = 0
+        with open(self.__segment_path(segment), "rb") as file:
+            while True:
+                header = file.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return offset
+                length, crc, _ = RECORD_HEADER.unpack(header)
+                payload = file.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return offset
+                offset += RECORD_HEADER.size + length
+
+    def __remove(self, segment: int):
+        self.__sizes.pop(segment, None)
+        try:
+            os.remove(self.__segment_path(segment))
+        except FileNotFoundError:
+            pass
+
+    @property
+    def pending(self) -> int:
+        """Bytes appended and not yet committed"""
+        with self.__condition:
+            return self.__pending()
+
+    def __pending(self) -> int:
+        segment, offset = self.__position
+        return sum(size for number, size in self.__sizes.items() if number >= segment) - offset
+
+    @property
+    def size(self) -> int:
+        """Bytes of all the segments"""
+        with self.__condition:
+            return sum(self.__sizes.values())
+
+    def append(self, payload: bytes, multiline: bool = False, zip: bool = False) -> None:
+        """
+        Write a record at the end of the spool
+
+        :param payload: Record, as it would be passed to `Sender.send_raw`
+        :param multiline: The record is sent with multiline framing
+        :param zip: The record is a zipped frame
+        """
+        self.append_many([payload], multiline=multiline, zip=zip)
+
+    def append_many(self, payloads, multiline: bool = False, zip: bool = False) -> None:
+        """
+        Write several records at the end of the spool, with a single sync
+        with `FsyncPolicy.BATCH`
+
+        :param payloads: Iterable of records
+        :param multiline: The records are sent with multiline framing
+        :param zip: The records are zipped frames
+        """
+        flags = (FLAG_MULTILINE if multiline else 0) | (FLAG_ZIP if zip else 0)
+        with self.__condition:
+            if self.__closed:
+                raise ValueError("Spool is closed")
+            for payload in payloads:
+                if isinstance(payload, str):
+                    payload = payload.encode("utf-8")
+                record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload), flags) + payload
+                last = max(self.__sizes)
+                if self.__sizes[last] and self.__sizes[last] + len(record) > self.segment_size:
+                    last = self.__rotate(last)
+                self.__writer.write(record)
+                self.__sizes[last] += len(record)
+            self.__writer.flush()
+            self.__dirty = True
+            if self.fsync == FsyncPolicy.BATCH:
+                self.__sync()
+            elif self.fsync == FsyncPolicy.INTERVAL:
+                self.__sync_if_due()
+            self.__enforce_limit()
+            self.__condition.notify_all()
+
+    def __rotate(self, last: int) -> int:
+        self.__writer.flush()
+        if self.fsync != FsyncPolicy.NONE:
+            os.fsync(self.__writer.fileno())
+        self.__writer.close()
+        last += 1
+        self.__sizes[last] = 0
+        self.__writer = open(self.__segment_path(last), "ab")
+        return last
+
+    def __enforce_limit(self):
+        while sum(self.__sizes.values()) > self.max_bytes and len(self.__sizes) > 1:
+            oldest = min(self.__sizes)
+            segment, offset = self.__position
+            if oldest >= segment:
+                lost = self.__sizes[oldest] - (offset if oldest == segment else 0)
+                self.dropped_bytes += lost
+                self.__position = (min(number for number in self.__sizes if number > oldest), 0)
+                log.warning("Devo-Spool|spool is full, %d bytes not delivered were discarded", lost)
+            self.__remove(oldest)
+
+    def __sync(self):
+        if self.__dirty:
+            os.fsync(self.__writer.fileno())
+            self.__dirty = False
+        self.__last_sync = time.time()
+
+    def __sync_if_due(self):
+        if time.time() - self.__last_sync >= self.fsync_interval:
+            self.__sync()
+
+    def sync(self, if_due: bool = False) -> None:
+        """
+        Force the appended records to reach the disk
+
+        :param if_due: Only sync if `fsync_interval` has passed since the last one
+        """
+        with self.__condition:
+            if self.__closed:
+                return
+            if if_due:
+                self.__sync_if_due()
+            else:
+                self.__sync()
+
+    def read(self, max_bytes: int = 1024 * 1024, timeout: Optional[float] = None) -> list:
+        """
+        Read the records after the checkpoint, without committing them. The
+        same records are read again until they are committed
+
+        :param max_bytes: Stop reading once this number of bytes is reached
+        :param timeout: Seconds to wait for records when there are none. None
+         waits forever
+        :return: List of SpoolRecord, empty if the timeout is reached
+        """
+        with self.__condition:
+            if not self.__condition.wait_for(
+                lambda: self.__pending() > 0 or self.__closed, timeout
+            ) or self.__closed:
+                return []
+            segment, offset = self.__position
+            sizes = {number: size for number, size in self.__sizes.items() if number >= segment}
+
+        # The bytes below those sizes are never modified, so they are read
+        # without the lock and the appends are not blocked meanwhile
+        records = []
+        read = 0
+        reader = None
+        try:
+            while read < max_bytes:
+                if offset >= sizes.get(segment, 0):
+                    following = [number for number in sizes if number > segment]
+                    if not following:
+                        break
+                    segment, offset = min(following), 0
+                    if reader is not None:
+                        reader.close()
+                        reader = None
+                    continue
+                if reader is None:
+                    try:
+                        reader = open(self.__segment_path(segment), "rb")
+                    except FileNotFoundError:
+                        # Discarded to keep the spool under max_bytes
+                        break
+                reader.seek(offset)
+                length, crc, flags = RECORD_HEADER.unpack(reader.read(RECORD_HEADER.size))
+                payload = reader.read(length)
+                offset += RECORD_HEADER.size + length
+                read += length
+                records.append(SpoolRecord(payload, flags, (segment, offset)))
+        finally:
+            if reader is not None:
+                reader.close()
+        return records
+
+    def commit(self, position: tuple) -> None:
+        """
+        Save the checkpoint after a record has been delivered, discarding the
+        segments that were completely delivered
+
+        :param position: `position` of the last SpoolRecord delivered
+        """
+        with self.__condition:
+            if self.__closed or position <= self.__position:
+                return
+            self.__position = position
+            for segment in [number for number in self.__sizes if number < position[0]]:
+                self.__remove(segment)
+            checkpoint = self.path / CHECKPOINT_FILE
+            temporary = self.path / (CHECKPOINT_FILE + ".tmp")
+            with open(temporary, "w") as file:
+                file.write("%d %d\n" % position)
+                file.flush()
+                if self.fsync != FsyncPolicy.NONE:
+                    os.fsync(file.fileno())
+            os.replace(temporary, checkpoint)
+            self.__condition.notify_all()
+
+    def wait_empty(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every appended record has been committed
+
+        :param timeout: Maximum seconds to wait. None waits forever
+        :return: True if the spool is empty
+        """
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: self.__pending() == 0 or self.__closed, timeout
+            ) and self.__pending() == 0
+
+    def close(self) -> None:
+        """Sync and close the files of the spool. Its records stay on disk"""
+        with self.__condition:
+            if self.__closed:
+                return
+            if self.fsync != FsyncPolicy.NONE:
+                self.__sync()
+            self.__closed = True
+            self.__writer.close()
+            self.__condition.notify_all()
+
+
+class SpoolShipper:
+    """
+    Background thread that delivers the records of a spool and commits
+    them, retrying with backoff while the relay is not available.
+
+    :param spool: Spool to deliver
+    :param write: Function that delivers one record: write(payload,
+     multiline, zip). A bound method is only weakly referenced
+    :param retry_wait: Initial seconds to wait after a delivery error
+    :param max_retry_wait: Maximum seconds to wait between retries
+    :param batch_bytes: Bytes read from the spool at once
+    """
+
+    def __init__(
+        self,
+        spool: Spool,
+        write: Callable,
+        retry_wait: float = 1.0,
+        max_retry_wait: float = 30.0,
+        batch_bytes: int = 1024 * 1024,
+    ):
+        self.spool = spool
+        self.retry_wait = retry_wait
+        self.max_retry_wait = max_retry_wait
+        self.batch_bytes = batch_bytes
+        self.errors: int = 0
+        """Delivery errors found"""
+        # The thread must not keep the Sender alive
+        self.__write = weakref.WeakMethod(write) if hasattr(write, "__self__") else lambda: write
+        self.__stop = Event()
+        self.__thread = Thread(target=self.__run, name="devo-sender-spool", daemon=True)
+        self.__thread.start()
+
+    def __run(self):
+        wait = self.retry_wait
+        while not self.__stop.is_set():
+            self.spool.sync(if_due=True)
+            records = self.spool.read(self.batch_bytes, timeout=self.spool.fsync_interval)
+            delivered = None
+            try:
+                for record in records:
+                    write = self.__write()
+                    if write is None or self.__stop.is_set():
+                        return
+                    write(record.payload, record.multiline, record.zip)
+                    del write
+                    delivered = record
+                wait = self.retry_wait
+            except Exception as error:
+                self.errors += 1
+                log.warning("Devo-Spool|delivery failed (%s), retrying in %.1fs", error, wait)
+                self.__stop.wait(wait)
+                wait = min(wait * 2, self.max_retry_wait)
+            finally:
+                if delivered is not None:
+                    self.spool.commit(delivered.position)
+
+    def stop(self) -> None:
+        """Stop the thread after the record being delivered and close the
+        spool. The records not delivered stay on disk"""
+        self.__stop.set()
+        if self.__thread.is_alive():
+            self.__thread.join()
+        self.spool.close()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Per-thread staging of the zip buffer events, so the threads sharing a
+Sender only take the buffer lock once per batch of events"""
+
+import threading
+import weakref
+from collections import deque
+
+DEFAULT_STAGING_SIZE = 64 * 1024
+"""Raw bytes staged by a thread before they are merged into the buffer"""
+
+
+class _Stage:
+    """Events staged by one thread"""
+
+    __slots__ = ("records", "size", "thread")
+
+    def __init__(self, thread: threading.Thread):
+        # deque.append and deque.popleft are atomic: the owner thread adds
+        # events and any thread can drain them without a lock
+        self.records: deque = deque()
+        self.size: int = 0
+        self.thread = weakref.ref(thread)
+
+    def drain(self) -> list:
+        records = []
+        try:
+            while True:
+                records.append(self.records.popleft())
+        except IndexError:
+            pass
+        # Approximate when another thread drains it: only used as threshold
+        self.size = 0
+        return records
+
+
+class ThreadStaging:
+    """
+    Staging buffers of the threads that send zipped events through a Sender.
+
+    Each thread appends its events to its own staging buffer, without any
+    lock. When a staging buffer reaches `size` raw bytes, its events are
+    merged into the zip buffer of the Sender as one block, so the buffer lock
+    is taken once per block instead of once per event. `drain` takes the
+    events of every thread, it is called when the buffer is flushed. Events
+    are only taken with the buffer lock held, so they are merged in order.
+
+    The order of the events of each thread is kept. The events of different
+    threads can be interleaved by blocks.
+
+    :param size: Raw bytes staged by each thread before they are merged
+
+    >>>con.thread_staging(size=64 * 1024)
+
+    See Also:
+        Sender
+    """
+
+    def __init__(self, size: int = DEFAULT_STAGING_SIZE):
+        if size <= 0:
+            raise ValueError("size must be greater than 0")
+        self.size = size
+        self.__local = threading.local()
+        self.__stages: list = []
+        self.__lock = threading.Lock()
+
+    def __stage(self) -> _Stage:
+        stage = getattr(self.__local, "stage", None)
+        if stage is None:
+            stage = _Stage(threading.current_thread())
+            with self.__lock:
+                self.__stages.append(stage)
+            self.__local.stage = stage
+        return stage
+
+    def add(self, msg: bytes) -> tuple:
+        """
+        Stage an event in the buffer of the current thread
+
+        :param msg: Already framed event, as bytes
+        :return: (full, first): True if the staging buffer of the thread
+         reached `size` and must be merged with `take`, and True if it was
+         the first event staged by the thread since its last merge
+        """
+        stage = self.__stage()
+        first = not stage.records
+        stage.records.append(msg)
+        stage.size += len(msg)
+        return stage.size >= self.size, first
+
+    def take(self) -> list:
+        """
+        Take the events staged by the current thread. Like `drain`, it must be
+        called with the buffer lock held, so the events are merged in order
+
+        :return: List of events
+        """
+        return self.__stage().drain()
+
+    def drain(self) -> list:
+        """
+        Take the events staged by every thread, with the buffer lock held.
+        The staging buffers of the threads that ended are discarded once
+        drained
+
+        :return: List of events, in order for each thread
+        """
+        with self.__lock:
+            stages = list(self.__stages)
+        records = []
+        finished = []
+        for stage in stages:
+            records.extend(stage.drain())
+            thread = stage.thread()
+            if thread is None or not thread.is_alive():
+                finished.append(stage)
+        if finished:
+            with self.__lock:
+                self.__stages = [stage for stage in self.__stages if stage not in finished]
+            # An event staged by a thread right before it ended
+            for stage in finished:
+                records.extend(stage.drain())
+        return records
+
+    @property
+    def pending(self) -> int:
+        """Events staged and not yet merged"""
+        with self.__lock:
+            return sum(len(stage.records) for stage in self.__stages)
+
+    @property
+    def threads(self) -> int:
+        """Threads with a staging buffer"""
+        with self.__lock:
+            return len(self.__stages)
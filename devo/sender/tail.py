@@ -0,0 +1,480 @@
+# -*- coding: utf-8 -*-
+"""Follow-mode ingestion of growing files (`tail -F`), with the offsets of the
+files checkpointed so a restart resumes where the previous process stopped"""
+
+import glob
+import json
+import logging
+import os
+import selectors
+import sys
+import time
+from pathlib import Path
+from threading import Event
+from typing import Optional
+
+from .data import Sender
+from .files import DEFAULT_READ_SIZE, send_lines
+from .monitor import WaitSelector
+
+log = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 1.0
+"""Seconds between checks of the files without inotify, and at most between
+checks with it"""
+
+# inotify(7) events of the directories of the followed files
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+
+
+def _inotify_libc():
+    """libc with inotify, only on Linux"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+
+        libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (ImportError, OSError, AttributeError):
+        return None
+    return libc
+
+
+class DirectoryWatch:
+    """
+    Waits for changes in the directories of the followed files. With inotify
+    (Linux), `wait` returns as soon as a file of a watched directory is
+    written, created, moved or removed; otherwise it just waits the timeout,
+    and the files are polled
+
+    :param use_inotify: Use inotify if the platform has it
+    """
+
+    def __init__(self, use_inotify: bool = True):
+        self.__libc = _inotify_libc() if use_inotify else None
+        self.__fd: Optional[int] = None
+        self.__directories: set = set()
+        self.__wake_read, self.__wake_write = os.pipe()
+        os.set_blocking(self.__wake_read, False)
+        if self.__libc is not None:
+            fd = self.__libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self.__fd = fd
+            else:
+                log.warning("Devo-DirectoryWatch|inotify not available, polling the files")
+
+    @property
+    def inotify(self) -> bool:
+        """True if the changes are notified by inotify"""
+        return self.__fd is not None
+
+    def add(self, directory: str) -> None:
+        """
+        Watch a directory, if it is not watched yet
+
+        :param directory: Path of the directory
+        """
+        if self.__fd is None or directory in self.__directories:
+            return
+        if self.__libc.inotify_add_watch(self.__fd, os.fsencode(directory), WATCH_MASK) >= 0:
+            self.__directories.add(directory)
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait for a change in the watched directories, or for `wake`
+
+        :param timeout: Maximum seconds to wait
+        :return: True if it was woken before the timeout
+        """
+        with WaitSelector() as selector:
+            selector.register(self.__wake_read, selectors.EVENT_READ)
+            if self.__fd is not None:
+                selector.register(self.__fd, selectors.EVENT_READ)
+            ready = selector.select(timeout)
+        for fd in (self.__fd, self.__wake_read):
+            # The events themselves do not matter, every file is checked
+            while fd is not None:
+                try:
+                    if not os.read(fd, 65536):
+                        break
+                except (BlockingIOError, OSError):
+                    break
+        return bool(ready)
+
+    def wake(self) -> None:
+        """Make `wait` return now, from another thread"""
+        try:
+            os.write(self.__wake_write, b"\0")
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        for fd in (self.__fd, self.__wake_read, self.__wake_write):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.__fd = None
+
+
+class TailCheckpoint:
+    """
+    Offsets of the followed files, by path: the device and inode of the file
+    and the bytes of it already sent. Saved in a JSON file replaced
+    atomically, so it is never left half written
+
+    :param path: Path of the checkpoint file
+    :param fsync: Force the checkpoint to reach the disk on every save
+    """
+
+    def __init__(self, path, fsync: bool = True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.files: dict = {}
+        """Path of the file to (device, inode, offset)"""
+        try:
+            content = json.loads(self.path.read_text())
+            self.files = {
+                name: (entry["device"], entry["inode"], entry["offset"])
+                for name, entry in content.get("files", {}).items()
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, AttributeError) as error:
+            log.warning("Devo-TailCheckpoint|ignoring the checkpoint %s: %s", self.path, error)
+
+    def save(self) -> None:
+        """Write the checkpoint to a temporary file and replace the old one"""
+        content = {
+            "files": {
+                name: {"device": device, "inode": inode, "offset": offset}
+                for name, (device, inode, offset) in self.files.items()
+            }
+        }
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "w") as file:
+            json.dump(content, file)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+
+
+class _Followed:
+    """A file opened by the follower. `offset` is the position after the
+    last line sent"""
+
+    __slots__ = ("path", "file", "device", "inode", "offset")
+
+    def __init__(self, path: str, offset: int = 0, end: bool = False):
+        self.path = path
+        self.file = open(path, "rb")
+        status = os.fstat(self.file.fileno())
+        self.device, self.inode = status.st_dev, status.st_ino
+        if end:
+            self.offset = status.st_size
+        else:
+            # A file shorter than the offset was truncated
+            self.offset = offset if offset <= status.st_size else 0
+
+    @property
+    def key(self) -> tuple:
+        return self.device, self.inode
+
+    def idle(self, seconds: float) -> bool:
+        """True if the file was not written in the last `seconds`"""
+        return time.time() - os.fstat(self.file.fileno()).st_mtime >= seconds
+
+    def read(self, limit: int, final: bool = False) -> tuple:
+        """
+        Read the complete lines after the offset, up to `limit` bytes
+
+        :param limit: Maximum bytes to read
+        :param final: The file will not grow any more, its last line is
+         complete even without a line break
+        :return: lines, bytes of the lines and True if there is more to read
+        """
+        size = os.fstat(self.file.fileno()).st_size
+        if size < self.offset:
+            log.info("Devo-FileFollower|%s was truncated, reading it from the start", self.path)
+            self.offset = 0
+        if size == self.offset:
+            return [], 0, False
+        self.file.seek(self.offset)
+        data = self.file.read(limit)
+        more = len(data) == limit
+        end = data.rfind(b"\n") + 1
+        if final and not more or end == 0 and more:
+            # The last line of a file that does not grow any more, or a line
+            # longer than the limit
+            end = len(data)
+        lines = data[:end].split(b"\n")
+        if not lines[-1]:
+            lines.pop()
+        return [line[:-1] if line[-1:] == b"\r" else line for line in lines], end, more
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class FileFollower:
+    """
+    Follows files as `tail -F` does and sends their new lines.
+
+    The files are checked when inotify reports a change in their directories
+    (Linux) or every `poll_interval` seconds. New complete lines are sent in
+    batches, through the zip buffer with `zip`, and after each batch the
+    offset of every file is saved in the checkpoint, so a new follower with
+    the same checkpoint resumes after the last line sent.
+
+    Rotated files (renamed and replaced by a new file) are read to their end
+    before following the new file, even if they were rotated while no
+    follower was running, as long as they are in the same directory.
+    Truncated files are read again from the start.
+
+    :param con: Sender
+    :param paths: Paths or globs of the files. The globs are expanded on every
+     check, so new files are followed as they appear
+    :param tag: Tag of the events
+    :param raw: The lines are events to send as they are
+    :param zip: Send the lines through the zip buffer, flushed after each batch
+    :param checkpoint: Path of the checkpoint file, or a TailCheckpoint. None
+     does not save the offsets
+    :param from_start: Send the existing content of the files without a
+     checkpoint. By default only the lines written after starting are sent
+    :param poll_interval: Seconds between checks of the files
+    :param chunk_size: Maximum bytes read of each file in each batch
+    :param use_inotify: Use inotify if the platform has it
+
+    >>>follower = FileFollower(con, ['/var/log/app/*.log'], tag='my.app.devo_sender.test',
+    ...                        checkpoint='/var/lib/app/devo-tail.json')
+    >>>follower.run()  # Until follower.stop()
+    >>>follower.close()
+    """
+
+    def __init__(
+        self,
+        con: Sender,
+        paths,
+        tag=None,
+        raw: bool = False,
+        zip: bool = True,
+        checkpoint=None,
+        from_start: bool = False,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        chunk_size: int = DEFAULT_READ_SIZE,
+        use_inotify: bool = True,
+    ):
+        self.con = con
+        self.patterns = [os.path.abspath(os.path.expanduser(str(path))) for path in paths]
+        self.tag = tag
+        self.raw = raw
+        self.zip = zip
+        self.from_start = from_start
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+        self.checkpoint: Optional[TailCheckpoint] = (
+            checkpoint
+            if checkpoint is None or isinstance(checkpoint, TailCheckpoint)
+            else TailCheckpoint(checkpoint)
+        )
+        self.sent: int = 0
+        """Events sent"""
+        self.watch = DirectoryWatch(use_inotify)
+        self.__followed: dict = {}
+        self.__rotated: dict = {}
+        self.__started = False
+        self.__more = False
+        self.__stop = Event()
+        for pattern in self.patterns:
+            directory = os.path.dirname(pattern)
+            if not glob.has_magic(directory):
+                self.watch.add(directory)
+
+    def poll(self) -> int:
+        """
+        Check the files once and send their new lines, up to `chunk_size`
+        bytes of each file, saving the checkpoint after sending them
+
+        :return: Number of events sent
+        """
+        self.__discover()
+        batches, reads = [], []
+        for path in sorted(set(self.__followed) | set(self.__rotated)):
+            # A rotated file is read to its end before the file that replaced
+            # it, once its writer stops writing to it
+            rotated = self.__rotated.get(path)
+            followed = rotated or self.__followed[path]
+            final = rotated is not None and rotated.idle(self.poll_interval)
+            lines, length, more = followed.read(self.chunk_size, final=final)
+            self.__more = self.__more or more
+            if lines:
+                batches.append(lines)
+            reads.append((followed, length, final and not more))
+
+        sent = send_lines(self.con, batches, self.tag, self.raw, self.zip) if batches else 0
+        changed = False
+        for followed, length, done in reads:
+            followed.offset += length
+            changed = changed or bool(length)
+            if done:
+                followed.close()
+                del self.__rotated[followed.path]
+                if followed.path not in self.__followed and self.checkpoint is not None:
+                    # Removed, a new file with its name is read from the start
+                    self.checkpoint.files.pop(followed.path, None)
+                # The file that replaced it can be read now
+                self.__more = changed = True
+        if changed:
+            self.__save()
+        self.sent += sent
+        return sent
+
+    def run(self, once: bool = False) -> int:
+        """
+        Send the new lines of the files until `stop` is called. The errors
+        sending are logged and the lines are sent again in the next check
+
+        :param once: Return as soon as everything written so far is sent
+        :return: Number of events sent
+        """
+        sent = 0
+        while not self.__stop.is_set():
+            self.__more = False
+            try:
+                sent += self.poll()
+            except Exception as error:
+                log.error("Devo-FileFollower|error sending the new lines: %s", error)
+                if once:
+                    raise
+                self.__more = False
+            if self.__more:
+                continue
+            if once:
+                break
+            self.watch.wait(self.poll_interval)
+        return sent
+
+    def stop(self) -> None:
+        """Make `run` return, from another thread or a signal handler"""
+        self.__stop.set()
+        self.watch.wake()
+
+    def close(self) -> None:
+        """Stop following the files and close them. The checkpoint has the
+        offsets of the last lines sent"""
+        self.stop()
+        for followed in list(self.__followed.values()) + list(self.__rotated.values()):
+            followed.close()
+        self.__followed.clear()
+        self.__rotated.clear()
+        self.watch.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __paths(self) -> list:
+        paths = []
+        for pattern in self.patterns:
+            if glob.has_magic(pattern):
+                paths.extend(path for path in sorted(glob.glob(pattern)) if os.path.isfile(path))
+            elif os.path.isfile(pattern):
+                paths.append(pattern)
+        return paths
+
+    def __discover(self):
+        """Open the new files and detect the rotated and removed ones"""
+        present = set()
+        for path in self.__paths():
+            present.add(path)
+            try:
+                status = os.stat(path)
+            except OSError:
+                present.discard(path)
+                continue
+            followed = self.__followed.get(path)
+            if followed is None:
+                self.__open(path)
+            elif (status.st_dev, status.st_ino) != followed.key and path not in self.__rotated:
+                log.info("Devo-FileFollower|%s was rotated", path)
+                self.__rotated[path] = followed
+                self.__open_new(path)
+        for path in [path for path in self.__followed if path not in present]:
+            if path not in self.__rotated:
+                # Removed: read what is left and wait for a new file
+                self.__rotated[path] = self.__followed.pop(path)
+        self.__started = True
+
+    def __open(self, path: str):
+        try:
+            saved = self.checkpoint.files.get(path) if self.checkpoint is not None else None
+            if path in self.__rotated:
+                # Created again after it was removed. The checkpoint still has
+                # the file being finished, so this one is read from the start
+                followed = _Followed(path)
+            elif saved is None:
+                # The files found after starting are new, read them whole
+                followed = _Followed(path, end=not self.__started and not self.from_start)
+            else:
+                followed = _Followed(path, saved[2])
+                if followed.key != saved[:2]:
+                    followed.offset = 0
+                    self.__resume_rotated(path, saved)
+        except OSError as error:
+            log.warning("Devo-FileFollower|%s cannot be read: %s", path, error)
+            return
+        self.__followed[path] = followed
+
+    def __open_new(self, path: str):
+        try:
+            self.__followed[path] = _Followed(path)
+        except OSError as error:
+            self.__followed.pop(path, None)
+            log.warning("Devo-FileFollower|%s cannot be read: %s", path, error)
+
+    def __resume_rotated(self, path: str, saved: tuple):
+        """The file of the checkpoint was rotated while no follower was
+        running: find it in the directory to send the rest of it"""
+        device, inode, offset = saved
+        directory = os.path.dirname(path)
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            entries = []
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.inode() == inode and entry.stat().st_dev == device:
+                    rotated = _Followed(entry.path, offset)
+                    rotated.path = path
+                    self.__rotated[path] = rotated
+                    log.info("Devo-FileFollower|sending the rest of %s, rotated as %s", path,
+                             entry.path)
+                    return
+            except OSError:
+                continue
+        log.warning("Devo-FileFollower|%s was rotated and the previous file was not found", path)
+
+    def __save(self):
+        if self.checkpoint is None:
+            return
+        files = {}
+        for path in set(self.__followed) | set(self.__rotated):
+            followed = self.__rotated.get(path) or self.__followed.get(path)
+            files[path] = (followed.device, followed.inode, followed.offset)
+        self.checkpoint.files.update(files)
+        self.checkpoint.save()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Single thread that runs callbacks at their deadlines, shared by the
+buffer flushers of every Sender of the process, and the thread pool that
+runs their flushes"""
+
+import heapq
+import itertools
+import logging
+import os
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Lock, Thread
+from typing import Callable, Optional
+
+log = logging.getLogger(__name__)
+
+FLUSH_WORKERS = 4
+"""Threads that run the flushes scheduled in the timer, shared by every
+Sender of the process"""
+
+
+class TimerHandle:
+    """Callback scheduled in a `DeadlineTimer`"""
+
+    __slots__ = ("deadline", "callback", "cancelled")
+
+    def __init__(self, deadline: float, callback: Callable):
+        self.deadline: float = deadline
+        """`time.monotonic()` value at which the callback runs"""
+        self.callback: Callable = callback
+        self.cancelled: bool = False
+
+
+class DeadlineTimer:
+    """
+    Heap of deadlines served by one thread, which sleeps exactly until the
+    nearest one instead of polling. Deadlines can be fractions of a second.
+
+    The callbacks run in the timer thread, one after another, so they must
+    not take long: a callback that blocks delays the ones after it.
+
+    >>>timer = DeadlineTimer()
+    >>>handle = timer.schedule(0.05, flush)
+    >>>timer.cancel(handle)
+
+    See Also:
+        SenderBufferFlusher
+    """
+
+    def __init__(self, name: str = "devo-sender-timer"):
+        self.name = name
+        self.__heap: list = []
+        self.__cancelled: int = 0
+        self.__counter = itertools.count()
+        self.__condition = Condition()
+        self.__thread: Optional[Thread] = None
+        _timers.add(self)
+
+    def __len__(self):
+        with self.__condition:
+            return sum(1 for _, _, handle in self.__heap if not handle.cancelled)
+
+    def schedule(self, delay: float, callback: Callable) -> TimerHandle:
+        """
+        Run a callback after some time
+
+        :param delay: Seconds from now, 0 or negative runs it as soon as possible
+        :param callback: Function without arguments
+        :return: TimerHandle to cancel it
+        """
+        handle = TimerHandle(time.monotonic() + max(delay, 0.0), callback)
+        with self.__condition:
+            heapq.heappush(self.__heap, (handle.deadline, next(self.__counter), handle))
+            # The thread does not survive a fork, it is started again if needed
+            if self.__thread is None or not self.__thread.is_alive():
+                self.__thread = Thread(target=self.__run, name=self.name, daemon=True)
+                self.__thread.start()
+            elif self.__heap[0][2] is handle:
+                self.__condition.notify()
+        return handle
+
+    def cancel(self, handle: Optional[TimerHandle]) -> None:
+        """
+        Cancel a callback not yet run
+
+        :param handle: TimerHandle returned by `schedule`, or None
+        """
+        if handle is None:
+            return
+        with self.__condition:
+            if handle.cancelled:
+                return
+            handle.cancelled = True
+            handle.callback = None
+            self.__cancelled += 1
+            # Cancelled entries are left in the heap, it is only rebuilt
+            # when most of them are cancelled
+            if self.__cancelled > 64 and self.__cancelled * 2 > len(self.__heap):
+                self.__heap = [entry for entry in self.__heap if not entry[2].cancelled]
+                heapq.heapify(self.__heap)
+                self.__cancelled = 0
+
+    def _after_fork(self) -> None:
+        """Discard the deadlines of the parent in a forked child, where the
+        timer thread does not exist. It is started again by `schedule`"""
+        self.__condition = Condition()
+        self.__heap = []
+        self.__cancelled = 0
+        self.__thread = None
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while True:
+                    while self.__heap and self.__heap[0][2].cancelled:
+                        heapq.heappop(self.__heap)
+                        self.__cancelled -= 1
+                    if not self.__heap:
+                        self.__condition.wait()
+                        continue
+                    wait = self.__heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        handle = heapq.heappop(self.__heap)[2]
+                        # Marked as cancelled so cancel() after it runs is a no-op
+                        handle.cancelled = True
+                        callback, handle.callback = handle.callback, None
+                        break
+                    self.__condition.wait(wait)
+            try:
+                callback()
+            except Exception as error:
+                log.error("Devo-DeadlineTimer|error in a scheduled callback: %s", error)
+            del handle, callback
+
+
+_timers: weakref.WeakSet = weakref.WeakSet()
+_shared_timer: Optional[DeadlineTimer] = None
+_shared_timer_lock = Lock()
+_flush_executor: Optional[ThreadPoolExecutor] = None
+
+
+def shared_timer() -> DeadlineTimer:
+    """
+    Timer used by default by the buffer flushers of every Sender
+
+    :return: DeadlineTimer
+    """
+    global _shared_timer
+    with _shared_timer_lock:
+        if _shared_timer is None:
+            _shared_timer = DeadlineTimer()
+        return _shared_timer
+
+
+def flush_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool that runs the flushes of the buffer flushers, so the timer
+    thread only schedules them and a flush blocked by a slow relay does not
+    delay the deadlines of other Senders
+
+    :return: ThreadPoolExecutor
+    """
+    global _flush_executor
+    with _shared_timer_lock:
+        if _flush_executor is None:
+            _flush_executor = ThreadPoolExecutor(
+                max_workers=FLUSH_WORKERS, thread_name_prefix="devo-sender-flush"
+            )
+        return _flush_executor
+
+
+def _after_fork():
+    # The threads of the pool do not exist in a forked child
+    global _shared_timer_lock, _flush_executor
+    _shared_timer_lock = Lock()
+    _flush_executor = None
+    for timer in list(_timers):
+        timer._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
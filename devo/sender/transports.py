@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""Transports of a Sender: how its connections are opened. Besides the TCP
+and SSL connections to a relay, events can be written to a Unix domain
+socket, appended to a file, kept in memory or discarded"""
+
+import errno
+import logging
+from abc import ABC, abstractmethod
+import os
+import socket
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from .relays import RelaySet
+
+
+class SenderTransport(ABC):
+    """
+    Base class of the configurations of a Sender, which open its
+    connections.
+
+    `connect()` returns a connected non-blocking socket, which the Sender
+    watches and closes as any relay connection, or a `Sink`, which takes
+    the bytes written to it without any network involved. Subclasses add
+    other transports by implementing `connect()`.
+
+    See Also:
+        Sender, Sink
+    """
+
+    name: str = "custom"
+    """Name of the transport, in error messages"""
+    address = None
+    """Where the connections are opened"""
+    relays: Optional[RelaySet] = None
+    """Relays to fail over between, if any"""
+    sec_level: Optional[int] = None
+
+    @abstractmethod
+    def connect(self, address, timeout: float, logger: Optional[logging.Logger] = None):
+        """
+        Open a connection. Errors are raised as `OSError` or as
+        `DevoSenderException`
+
+        :param address: Where to connect, the address of the configuration
+         or one of its relays
+        :param timeout: Seconds to wait for the connection
+        :param logger: Logger of the Sender
+        :return: Connected non-blocking socket, or Sink
+        """
+
+
+class Sink:
+    """
+    Connection of the transports that do not use the network. It has the
+    part of the interface of a socket that the Sender uses: `send()` takes
+    all the bytes it is given and there is never anything to read
+    """
+
+    def __init__(self):
+        self.closed = False
+
+    def send(self, data) -> int:
+        """
+        Write bytes
+
+        :param data: Bytes or memoryview
+        :return: Bytes written
+        """
+        if self.closed:
+            raise OSError(errno.EBADF, "The sink is closed")
+        return self._write(data)
+
+    def _write(self, data) -> int:
+        return len(data)
+
+    def recv(self, size: int) -> bytes:
+        """Nothing is ever received, as from a connection closed by the
+        endpoint"""
+        return b""
+
+    def shutdown(self, how: int) -> None:
+        pass
+
+    def fileno(self) -> int:
+        return -1
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FileSink(Sink):
+    """Sink that appends the bytes to a file, without any buffer, so they
+    are exactly the framed events written by the Sender"""
+
+    def __init__(self, path):
+        super().__init__()
+        self.file = open(path, "ab", buffering=0)
+
+    def _write(self, data) -> int:
+        # An unbuffered write can write part of the data, the Sender writes
+        # the rest as with a socket
+        return self.file.write(data)
+
+    def fileno(self) -> int:
+        return -1 if self.closed else self.file.fileno()
+
+    def close(self) -> None:
+        super().close()
+        self.file.close()
+
+
+class MemorySink(Sink):
+    """Sink that appends the bytes to a bytearray"""
+
+    def __init__(self, data: bytearray, lock: Lock):
+        super().__init__()
+        self.data = data
+        self.lock = lock
+
+    def _write(self, data) -> int:
+        with self.lock:
+            self.data.extend(data)
+        return len(data)
+
+
+class NullSink(Sink):
+    """Sink that discards the bytes, only counting them in its
+    configuration"""
+
+    def __init__(self, config: "SenderConfigNull"):
+        super().__init__()
+        self.config = config
+
+    def _write(self, data) -> int:
+        size = len(data)
+        with self.config.lock:
+            self.config.bytes += size
+            self.config.writes += 1
+        return size
+
+
+class SenderConfigUnix(SenderTransport):
+    """
+    Configuration of a Unix domain socket, to hand the events to a local
+    relay or agent without TCP or TLS.
+
+    :param path: (str) Path of the socket
+
+    >>>sender_config = SenderConfigUnix(path='/run/devo-relay.sock')
+
+    See Also:
+        Sender
+    """
+
+    name = "UNIX"
+
+    def __init__(self, path):
+        self.address = str(path)
+        self.hostname = socket.gethostname()
+
+    def connect(self, address, timeout: float, logger: Optional[logging.Logger] = None):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        sock.setblocking(False)
+        return sock
+
+
+class SenderConfigFile(SenderTransport):
+    """
+    Configuration of an append-only file, where the Sender writes exactly
+    the bytes it would send to a relay: syslog framed events and zip frames.
+
+    :param path: (str) Path of the file, created if it does not exist
+
+    >>>sender_config = SenderConfigFile(path='/var/spool/events.log')
+
+    See Also:
+        Sender
+    """
+
+    name = "FILE"
+
+    def __init__(self, path):
+        self.address = str(path)
+        self.hostname = socket.gethostname()
+
+    def connect(self, address, timeout: float, logger: Optional[logging.Logger] = None):
+        Path(address).parent.mkdir(parents=True, exist_ok=True)
+        return FileSink(address)
+
+
+class SenderConfigMemory(SenderTransport):
+    """
+    Configuration that keeps the bytes written by the Sender in memory, in
+    `data`, shared by all its connections.
+
+    >>>sender_config = SenderConfigMemory()
+    >>>con = Sender(config=sender_config)
+    >>>con.send(tag='my.app.devo_sender.test', msg='test of msg')
+    >>>sender_config.data
+
+    See Also:
+        Sender
+    """
+
+    name = "MEMORY"
+
+    def __init__(self):
+        self.address = "memory"
+        self.hostname = socket.gethostname()
+        self.data = bytearray()
+        """Bytes written"""
+        self.lock = Lock()
+
+    def getvalue(self) -> bytes:
+        """
+        Bytes written so far
+
+        :return: bytes
+        """
+        with self.lock:
+            return bytes(self.data)
+
+    def clear(self) -> None:
+        """Discard the bytes written so far"""
+        with self.lock:
+            self.data.clear()
+
+    def __getstate__(self):
+        # Locks cannot be pickled
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def connect(self, address, timeout: float, logger: Optional[logging.Logger] = None):
+        return MemorySink(self.data, self.lock)
+
+
+class SenderConfigNull(SenderTransport):
+    """
+    Configuration that discards the bytes written by the Sender, counting
+    them. It measures the composition, framing and compression of the
+    events without any I/O.
+
+    >>>sender_config = SenderConfigNull()
+    >>>con = Sender(config=sender_config)
+    >>>con.send_many('my.app.devo_sender.test', events, zip=True)
+    >>>sender_config.bytes
+
+    See Also:
+        Sender
+    """
+
+    name = "NULL"
+
+    def __init__(self):
+        self.address = os.devnull
+        self.hostname = socket.gethostname()
+        self.bytes: int = 0
+        """Bytes written"""
+        self.writes: int = 0
+        """Writes done"""
+        self.lock = Lock()
+
+    __getstate__ = SenderConfigMemory.__getstate__
+    __setstate__ = SenderConfigMemory.__setstate__
+
+    def connect(self, address, timeout: float, logger: Optional[logging.Logger] = None):
+        return NullSink(self)
@@ -0,0 +1,69 @@
+"""Zipped events per second sent by 1, 4 and 16 threads sharing a Sender,
+with and without per-thread staging, to a local server that discards them"""
+
+import socket
+import threading
+import time
+
+from devo.sender import Sender, SenderConfigTCP
+
+EVENTS = 200000
+TAG = b"my.app.sdk.benchmark"
+MSG = b"Benchmark event %d with some payload to compress 0123456789abcdef"
+
+
+def discard_server():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(64)
+
+    def serve(conn):
+        with conn:
+            while conn.recv(1 << 16):
+                pass
+
+    def accept():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return server
+
+
+def run(address, threads, staging):
+    con = Sender(config=SenderConfigTCP(address=address))
+    if staging:
+        con.thread_staging()
+    per_thread = EVENTS // threads
+
+    def producer():
+        for index in range(per_thread):
+            con.send(tag=TAG, msg=MSG % index, zip=True)
+
+    workers = [threading.Thread(target=producer) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    con.flush_buffer()
+    elapsed = time.perf_counter() - start
+    con.close()
+    return per_thread * threads / elapsed
+
+
+if __name__ == "__main__":
+    server = discard_server()
+    address = server.getsockname()
+    for threads in (1, 4, 16):
+        shared = run(address, threads, staging=False)
+        staged = run(address, threads, staging=True)
+        print(
+            "%2d threads: %9.0f events/s shared buffer, %9.0f events/s thread staging"
+            % (threads, shared, staged)
+        )
+    server.close()
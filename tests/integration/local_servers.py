@@ -90,5 +90,78 @@ class EchoServer:
         self.server_process.join()
 
 
+class CollectorServer:
+    """Plain TCP server, running in a thread of the test process, that keeps
+    everything it receives. With a path, it listens on a Unix domain socket"""
+
+    def __init__(self, ip="127.0.0.1", port=0, path=None):
+        if path is None:
+            self.server = socket.create_server((ip, port))
+            self.ip, self.port = self.server.getsockname()
+            self.address = (self.ip, self.port)
+        else:
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(path)
+            self.server.listen()
+            self.ip, self.port = path, None
+            self.address = path
+        self.received = bytearray()
+        self.streams = []
+        """Bytes received by each connection"""
+        self.connections = []
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            stream = bytearray()
+            with self.lock:
+                self.connections.append(conn)
+                self.streams.append(stream)
+            threading.Thread(
+                target=self.handle_connection, args=(conn, stream), daemon=True
+            ).start()
+
+    def handle_connection(self, conn, stream):
+        try:
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    break
+                with self.lock:
+                    self.received.extend(data)
+                    stream.extend(data)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def wait_for(self, length, timeout=5):
+        """Wait until at least length bytes are received"""
+        then = time.time()
+        while len(self.received) < length and time.time() - then < timeout:
+            time.sleep(0.01)
+        return bytes(self.received)
+
+    def close_server(self):
+        # Shut it down first, closing it does not stop a thread blocked in accept()
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        with self.lock:
+            for conn in self.connections:
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
 if __name__ == "__main__":
     print("Trying to run module local_servers.py directly...")
@@ -0,0 +1,184 @@
+import asyncio
+import os
+import zlib
+from ssl import CERT_NONE
+
+import pytest
+from local_servers import (EchoServer, find_available_port,
+                           wait_for_ready_server)
+
+from devo.sender import (AsyncSender, DevoSenderException, SenderConfigSSL,
+                         SenderConfigTCP)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.ssl_address = os.getenv("DEVO_SENDER_SERVER", "127.0.0.1")
+    setup.ssl_port = int(os.getenv("DEVO_SENDER_PORT", 4488))
+    setup.my_app = "test.drop.free"
+    setup.my_bapp = b"test.drop.free"
+    setup.test_msg = "Test send msg\n"
+
+    res_path = os.path.dirname(os.path.abspath(__file__)) + os.sep + "resources"
+    certs_path = res_path + os.sep + "local_certs" + os.sep + "keys"
+    setup.local_server_key = f"{certs_path}/server/private/server_key.pem"
+    setup.local_server_cert = f"{certs_path}/server/server_cert.pem"
+    setup.local_server_chain = f"{certs_path}/ca/ca_cert.pem"
+
+    setup.ssl_port = find_available_port(setup.ssl_address, setup.ssl_port)
+    local_ssl_server = EchoServer(
+        setup.ssl_address, setup.ssl_port, setup.local_server_cert, setup.local_server_key, ssl=True
+    )
+    wait_for_ready_server(local_ssl_server.ip, local_ssl_server.port)
+    setup.engine_config = SenderConfigSSL(
+        address=(setup.ssl_address, setup.ssl_port),
+        key=setup.local_server_key,
+        cert=setup.local_server_cert,
+        chain=setup.local_server_chain,
+        check_hostname=False,
+        verify_mode=CERT_NONE,
+    )
+
+    yield setup
+
+    local_ssl_server.close_server()
+
+
+async def _collecting_server():
+    """Local TCP server that stores everything it receives"""
+    received = bytearray()
+
+    async def handle_connection(reader, writer):
+        while data := await reader.read(65536):
+            received.extend(data)
+        writer.close()
+
+    server = await asyncio.start_server(handle_connection, "127.0.0.1", 0)
+    return server, received
+
+
+def test_async_ssl_send(setup):
+    async def scenario():
+        async with AsyncSender(setup.engine_config) as con:
+            for _ in range(10):
+                assert await con.send(tag=setup.my_app, msg=setup.test_msg) == 1
+            assert await con.send_many(setup.my_app, [setup.test_msg] * 10) == 10
+            for _ in range(10):
+                await con.send(tag=setup.my_bapp, msg=setup.test_msg.encode(), zip=True)
+            assert await con.flush() == 10
+            assert con.reconnection == 1
+
+    asyncio.run(scenario())
+
+
+def test_async_framing():
+    async def scenario():
+        server, received = await _collecting_server()
+        port = server.sockets[0].getsockname()[1]
+        con = AsyncSender(SenderConfigTCP(address=("127.0.0.1", port)))
+        await con.send(tag="my.app", msg="plain", hostname="host")
+        await con.send(tag="my.app", msg="multi\nline", hostname="host", multiline=True)
+        await con.send_many(b"my.app", [b"one", b"two"], hostname=b"host")
+        await con.aclose()
+        await asyncio.sleep(0.1)
+        server.close()
+        return bytes(received)
+
+    assert asyncio.run(scenario()) == (
+        b"<14>Jan  1 00:00:00 host my.app: plain\n"
+        b"44 <14>Jan  1 00:00:00 host my.app: multi\nline\n"
+        b"<14>Jan  1 00:00:00 host my.app: one\n"
+        b"<14>Jan  1 00:00:00 host my.app: two\n"
+    )
+
+
+def test_async_zip_buffer_timeout():
+    async def scenario():
+        server, received = await _collecting_server()
+        port = server.sockets[0].getsockname()[1]
+        con = AsyncSender(SenderConfigTCP(address=("127.0.0.1", port)), buffer_timeout=0.1)
+        await con.send(tag=b"my.app", msg=b"zipped", hostname=b"host", zip=True)
+        assert con.buffer.events == 1
+        await asyncio.sleep(0.3)
+        assert con.buffer.events == 0
+        await con.aclose()
+        await asyncio.sleep(0.1)
+        server.close()
+        return bytes(received)
+
+    assert zlib.decompress(asyncio.run(scenario()), 31) == (
+        b"<14>Jan  1 00:00:00 host my.app: zipped\n"
+    )
+
+
+def test_async_zip_str_and_bytes():
+    async def scenario():
+        server, received = await _collecting_server()
+        port = server.sockets[0].getsockname()[1]
+        con = AsyncSender(SenderConfigTCP(address=("127.0.0.1", port)))
+        assert await con.send(tag="my.app", msg="text", hostname="host", zip=True) == 0
+        assert await con.send(tag=b"my.app", msg=b"bytes", hostname=b"host", zip=True) == 0
+        assert await con.send_many("my.app", ["one", "two"], hostname="host", zip=True) == 0
+        assert con.buffer.events == 4
+        assert await con.flush() == 4
+        await con.aclose()
+        await asyncio.sleep(0.1)
+        server.close()
+        return bytes(received)
+
+    assert zlib.decompress(asyncio.run(scenario()), 31) == (
+        b"<14>Jan  1 00:00:00 host my.app: text\n"
+        b"<14>Jan  1 00:00:00 host my.app: bytes\n"
+        b"<14>Jan  1 00:00:00 host my.app: one\n"
+        b"<14>Jan  1 00:00:00 host my.app: two\n"
+    )
+
+
+def test_async_connection_error():
+    async def scenario():
+        port = find_available_port("127.0.0.1", 5600)
+        con = AsyncSender(SenderConfigTCP(address=("127.0.0.1", port)), timeout=2)
+        with pytest.raises(DevoSenderException):
+            await con.send(tag="my.app", msg="lost")
+
+    asyncio.run(scenario())
+
+
+def test_async_flush_error_keeps_events():
+    async def scenario():
+        port = find_available_port("127.0.0.1", 5650)
+        con = AsyncSender(SenderConfigTCP(address=("127.0.0.1", port)), timeout=2)
+        await con.send(tag="my.app", msg="first", hostname="host", zip=True)
+        with pytest.raises(DevoSenderException):
+            await con.flush()
+        assert con.buffer.events == 1
+
+        # The relay is back: the kept event is sent before the new one
+        received = bytearray()
+
+        async def handle_connection(reader, writer):
+            while data := await reader.read(65536):
+                received.extend(data)
+            writer.close()
+
+        server = await asyncio.start_server(handle_connection, "127.0.0.1", port)
+        await con.send(tag="my.app", msg="second", hostname="host", zip=True)
+        assert await con.flush() == 2
+        await con.aclose()
+        await asyncio.sleep(0.1)
+        server.close()
+        return bytes(received)
+
+    assert zlib.decompress(asyncio.run(scenario()), 31) == (
+        b"<14>Jan  1 00:00:00 host my.app: first\n"
+        b"<14>Jan  1 00:00:00 host my.app: second\n"
+    )
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -1,7 +1,10 @@
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 from mock import Mock
 from devo.sender.data import SenderBufferFlusher
+from devo.sender.timer import DeadlineTimer
 
 
 def test_initialize_timestamp():
@@ -9,7 +12,7 @@ def test_initialize_timestamp():
     now = time.time()
     timestamp = flusher.initialize_timestamp()
     assert isinstance(timestamp, float)
-    assert timestamp - now <= SenderBufferFlusher.DEFAULT_INTERNAL_WAIT_VALUE
+    assert 0 <= timestamp - now <= 1.0
 
 
 def test_wait():
@@ -67,5 +70,99 @@ def test_flush_after_buffer_timeout():
     assert not flusher._SenderBufferFlusher__running_flag
 
 
+def test_sub_second_buffer_timeout():
+    flushed = threading.Event()
+    flusher = SenderBufferFlusher()
+    flusher.buffer_timeout = 0.05
+    flusher.flush_buffer_func = flushed.set
+    flusher.start()
+    start = time.time()
+    flusher.initialize_timestamp()
+    assert flushed.wait(1)
+    assert time.time() - start < 0.5
+    flusher.stop()
+
+
+def test_wait_cancels_flush():
+    flusher = SenderBufferFlusher()
+    flusher.buffer_timeout = 0.05
+    flusher.flush_buffer_func = Mock(name="flush_buffer_func")
+    flusher.start()
+    flusher.initialize_timestamp()
+    flusher.wait()
+    time.sleep(0.2)
+    flusher.stop()
+    assert not flusher.flush_buffer_func.called
+
+
+def test_flushers_share_timer():
+    timer = DeadlineTimer(name="test-flushers-timer")
+    calls = []
+    flushers = []
+    for index in range(50):
+        flusher = SenderBufferFlusher(timer=timer)
+        flusher.buffer_timeout = 0.01 * (index % 5 + 1)
+        flusher.flush_buffer_func = lambda index=index: calls.append(index)
+        flusher.start()
+        flusher.initialize_timestamp()
+        flushers.append(flusher)
+    time.sleep(0.5)
+    assert sorted(calls) == list(range(50))
+    assert sum(thread.name == timer.name for thread in threading.enumerate()) == 1
+
+
+def test_flush_runs_outside_timer():
+    timer = DeadlineTimer(name="test-flush-outside-timer")
+    release = threading.Event()
+    blocked, flushed = threading.Event(), threading.Event()
+    threads = []
+
+    def blocking_flush():
+        threads.append(threading.current_thread().name)
+        blocked.set()
+        release.wait(5)
+
+    slow = SenderBufferFlusher(timer=timer)
+    slow.buffer_timeout = 0.01
+    slow.flush_buffer_func = blocking_flush
+    fast = SenderBufferFlusher(timer=timer)
+    fast.buffer_timeout = 0.05
+    fast.flush_buffer_func = flushed.set
+    try:
+        for flusher in (slow, fast):
+            flusher.start()
+            flusher.initialize_timestamp()
+        # A blocked flush does not delay the deadlines of other flushers
+        assert blocked.wait(1)
+        assert flushed.wait(1)
+        assert threads[0].startswith("devo-sender-flush")
+    finally:
+        release.set()
+        slow.stop()
+        fast.stop()
+
+
+def test_flush_with_executor():
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="test-flush")
+    flushed = threading.Event()
+    threads = []
+
+    def flush():
+        threads.append(threading.current_thread().name)
+        flushed.set()
+
+    flusher = SenderBufferFlusher(executor=executor)
+    flusher.buffer_timeout = 0.01
+    flusher.flush_buffer_func = flush
+    flusher.start()
+    flusher.initialize_timestamp()
+    try:
+        assert flushed.wait(1)
+        assert threads[0].startswith("test-flush")
+    finally:
+        flusher.stop()
+        executor.shutdown()
+
+
 if __name__ == "__main__":
     pytest.main()
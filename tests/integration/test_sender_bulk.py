@@ -0,0 +1,153 @@
+import gzip
+import os
+import tempfile
+import time
+
+import pytest
+from click.testing import CliRunner
+from local_servers import CollectorServer
+
+from devo.sender import DevoSenderException, SenderConfigTCP
+from devo.sender.bulk import bulk_send
+from devo.sender.scripts.sender_cli import bulk
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.my_app = "test.drop.free"
+    setup.directory = tempfile.TemporaryDirectory()
+    setup.path = setup.directory.name
+    setup.lines = {}
+    for number in range(3):
+        path = os.path.join(setup.path, "events-%d.log" % number)
+        lines = [b"file %d line %d" % (number, index) for index in range(3000)]
+        with open(path, "wb") as file:
+            file.write(b"header\n" + b"\n".join(lines) + b"\n")
+        setup.lines[path] = lines
+    path = os.path.join(setup.path, "events-3.log.gz")
+    lines = [b"file 3 line %d" % index for index in range(3000)]
+    with gzip.open(path, "wb") as file:
+        file.write(b"header\n" + b"\n".join(lines) + b"\n")
+    setup.lines[path] = lines
+    setup.events = sorted(line for lines in setup.lines.values() for line in lines)
+    yield setup
+    setup.directory.cleanup()
+
+
+def received_events(server, count, zip, timeout=10):
+    """Events received by every connection, without their syslog header"""
+    then = time.time()
+    while True:
+        with server.lock:
+            streams = [bytes(stream) for stream in server.streams]
+        try:
+            lines = [
+                line.split(b": ", 1)[1]
+                for stream in streams
+                for line in (gzip.decompress(stream) if zip else stream).splitlines()
+            ]
+        except (EOFError, OSError):
+            lines = []
+        if len(lines) >= count or time.time() - then > timeout:
+            return sorted(lines)
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("zip", [False, True])
+def test_bulk_send(setup, zip):
+    server = CollectorServer()
+    reports, files = [], []
+    try:
+        progress = bulk_send(
+            [os.path.join(setup.path, "*.log"), os.path.join(setup.path, "*.gz")],
+            config=SenderConfigTCP(address=server.address),
+            tag=setup.my_app,
+            zip=zip,
+            header=True,
+            processes=3,
+            shard_size=10000,
+            chunk_size=4096,
+            interval=0.01,
+            on_progress=reports.append,
+            on_file=lambda path, progress: files.append(path),
+        )
+    finally:
+        server.close_server()
+
+    assert received_events(server, len(setup.events), zip) == setup.events
+    assert not progress.failed
+    assert progress.events == len(setup.events)
+    assert progress.read_bytes == progress.total_bytes
+    assert sorted(files) == sorted(setup.lines)
+    assert all(progress.completion(path) == 1.0 for path in setup.lines)
+    assert reports and reports[-1] is progress
+    # Every worker has its own connection
+    assert len(server.streams) == 3
+    if zip:
+        assert progress.compression_ratio > 1
+    else:
+        assert progress.compression_ratio is None
+
+
+def test_bulk_send_failed_shards(setup):
+    server = CollectorServer()
+    try:
+        progress = bulk_send(
+            [setup.path],
+            config=SenderConfigTCP(address=server.address),
+            processes=2,
+            shard_size=10000,
+        )
+    finally:
+        server.close_server()
+
+    # Without a tag, the lines cannot be sent
+    assert progress.failed and len(progress.failed) == progress.shards
+    assert progress.completed_files == len(setup.lines)
+
+
+def test_bulk_send_without_files(setup):
+    with pytest.raises(DevoSenderException):
+        bulk_send([os.path.join(setup.path, "*.missing")], config=SenderConfigTCP(address=("localhost", 1)))
+
+
+def test_cli_bulk(setup):
+    server = CollectorServer()
+    runner = CliRunner()
+    result = runner.invoke(
+        bulk,
+        [
+            setup.path,
+            "--type",
+            "TCP",
+            "--address",
+            server.ip,
+            "--port",
+            server.port,
+            "--tag",
+            setup.my_app,
+            "--header",
+            True,
+            "--processes",
+            2,
+            "--shard-size",
+            1,
+            "--no-verify-certificates",
+        ],
+    )
+    server.close_server()
+
+    assert result.exception is None, result.output
+    assert int(result.output.split("Sended: ")[-1]) == len(setup.events)
+    assert result.output.count("Completed: ") == len(setup.lines)
+    assert "4/4 files" in result.output
+    assert received_events(server, len(setup.events), True) == setup.events
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,339 @@
+import gzip
+import os
+import tempfile
+import time
+import zlib
+
+import pytest
+from click.testing import CliRunner
+from local_servers import CollectorServer
+
+from devo.sender import Sender, SenderConfigTCP
+from devo.sender.data import DevoSenderException
+from devo.sender.files import send_file, send_gzip_file, send_multiline_file
+from devo.sender.scripts.sender_cli import data
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.my_app = "test.drop.free"
+    setup.path = tempfile.mkdtemp()
+    setup.lines = [b"event %d %s" % (index, os.urandom(16).hex().encode()) for index in range(5000)]
+    setup.events = [b"<14>Jan  1 00:00:00 host my.app.test: " + line + b"\n" for line in setup.lines]
+
+    # Archive of syslog events with several members, as written by a rotating logger
+    setup.framed = os.path.join(setup.path, "framed.log.gz")
+    with open(setup.framed, "wb") as file:
+        for start in range(0, 5000, 2000):
+            file.write(gzip.compress(b"".join(setup.events[start:start + 2000])))
+
+    setup.plain = os.path.join(setup.path, "plain.log")
+    with open(setup.plain, "wb") as file:
+        file.write(b"header\r\n" + b"\r\n".join(setup.lines) + b"\r\n")
+
+    setup.bare = os.path.join(setup.path, "bare.log.gz")
+    with gzip.open(setup.bare, "wb") as file:
+        file.write(b"\n".join(setup.lines) + b"\n")
+
+    # Stack trace bigger than the reads of the file, without the last line break
+    setup.multiline = os.path.join(setup.path, "multiline.log")
+    setup.trace = b"Traceback:\n" + b"\n".join(b"  at " + line for line in setup.lines[:2000])
+    with open(setup.multiline, "wb") as file:
+        file.write(setup.trace)
+    yield setup
+
+
+def wait_for_lines(server, count, zip, timeout=5):
+    then = time.time()
+    while True:
+        received = bytes(server.received)
+        try:
+            lines = (gzip.decompress(received) if zip else received).splitlines()
+        except (EOFError, OSError):
+            lines = []
+        if len(lines) >= count or time.time() - then > timeout:
+            return lines
+        time.sleep(0.01)
+
+
+def test_framed_gzip_sent_as_it_is(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        assert send_gzip_file(con, setup.framed, chunk_size=4096) == 5000
+    finally:
+        con.close()
+        server.close_server()
+
+    with open(setup.framed, "rb") as file:
+        content = file.read()
+    assert server.wait_for(len(content)) == content
+
+
+@pytest.mark.parametrize("zip", [False, True])
+def test_bare_gzip_lines(setup, zip):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        assert send_gzip_file(con, setup.bare, tag=setup.my_app, zip=zip) == 5000
+    finally:
+        con.close()
+        server.close_server()
+
+    events = wait_for_lines(server, 5000, zip)
+    assert len(events) == 5000
+    assert events[0].endswith(b"test.drop.free: " + setup.lines[0])
+
+
+def test_cli_framed_gzip(setup):
+    server = CollectorServer()
+    runner = CliRunner()
+    result = runner.invoke(
+        data,
+        [
+            "--debug",
+            "--type",
+            "TCP",
+            "--address",
+            server.ip,
+            "--port",
+            server.port,
+            "--file",
+            setup.framed,
+            "--no-verify-certificates",
+        ],
+    )
+    server.close_server()
+
+    assert result.exception is None
+    assert int(result.output.split("Sended: ")[-1]) == 5000
+    with open(setup.framed, "rb") as file:
+        content = file.read()
+    assert server.wait_for(len(content)) == content
+
+
+@pytest.mark.parametrize("zip", [False, True])
+def test_plain_file(setup, zip):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        sent = send_file(con, setup.plain, tag=setup.my_app, zip=zip, header=True, chunk_size=4096)
+        assert sent == 5000
+    finally:
+        con.close()
+        server.close_server()
+
+    events = wait_for_lines(server, 5000, zip)
+    assert len(events) == 5000
+    assert events[0].endswith(b"test.drop.free: " + setup.lines[0])
+    assert events[-1].endswith(b"test.drop.free: " + setup.lines[-1])
+
+
+def test_zipped_frames_bounded(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    con.buffer_size(size=20000)
+    try:
+        assert send_file(con, setup.plain, tag=setup.my_app, zip=True, header=True) == 5000
+    finally:
+        con.close()
+        server.close_server()
+
+    events = wait_for_lines(server, 5000, True)
+    assert len(events) == 5000
+    # The buffer is sent as it fills, not only by the last flush
+    received = bytes(server.received)
+    frames = 0
+    while received:
+        inflater = zlib.decompressobj(31)
+        inflater.decompress(received)
+        received = inflater.unused_data
+        frames += 1
+    assert frames > 1
+
+
+def test_zipped_str_events(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        assert con.send(tag=setup.my_app, msg="str event", zip=True) == 0
+        assert con.send_many(setup.my_app, ["str one"], zip=True) == 0
+        assert con.send_many(setup.my_app.encode(), [b"bytes two"], zip=True) == 0
+        assert con.flush_buffer() == 3
+    finally:
+        con.close()
+        server.close_server()
+
+    events = wait_for_lines(server, 3, True)
+    assert [event.split(b": ", 1)[1] for event in events] == [b"str event", b"str one", b"bytes two"]
+
+
+def test_cli_zipped_file(setup):
+    server = CollectorServer()
+    runner = CliRunner()
+    result = runner.invoke(
+        data,
+        [
+            "--debug",
+            "--type",
+            "TCP",
+            "--address",
+            server.ip,
+            "--port",
+            server.port,
+            "--file",
+            setup.plain,
+            "--header",
+            True,
+            "--zip",
+            "--tag",
+            setup.my_app,
+            "--no-verify-certificates",
+        ],
+    )
+    server.close_server()
+
+    assert result.exception is None
+    assert int(result.output.split("Sended: ")[-1]) == 5000
+    assert len(wait_for_lines(server, 5000, True)) == 5000
+
+
+@pytest.mark.parametrize("raw", [False, True])
+def test_cli_empty_lines_and_line_breaks(setup, raw):
+    path = os.path.join(setup.path, "gaps.log")
+    with open(path, "wb") as file:
+        file.write(b"first\r\n\r\nsecond\n\n\nthird")
+    server = CollectorServer()
+    runner = CliRunner()
+    result = runner.invoke(
+        data,
+        [
+            "--debug",
+            "--type",
+            "TCP",
+            "--address",
+            server.ip,
+            "--port",
+            server.port,
+            "--file",
+            path,
+            "--tag",
+            setup.my_app,
+            "--no-verify-certificates",
+        ]
+        + (["--raw"] if raw else []),
+    )
+    server.close_server()
+
+    # Empty lines are skipped and every event ends in a line break, also
+    # the last one and the ones read with "\r\n"
+    assert result.exception is None
+    assert int(result.output.split("Sended: ")[-1]) == 3
+    received = server.wait_for(18 if raw else 100)
+    if raw:
+        assert received == b"first\nsecond\nthird\n"
+    else:
+        events = received.split(b"\n")
+        assert [event.split(b": ", 1)[1] for event in events[:-1]] == [
+            b"first",
+            b"second",
+            b"third",
+        ]
+        assert events[-1] == b""
+
+
+def read_frame(data):
+    """Split the first octet counted frame of data"""
+    count, rest = data.split(b" ", 1)
+    return rest[:int(count)], rest[int(count):]
+
+
+def test_multiline_file(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        assert send_multiline_file(con, setup.multiline, tag=setup.my_app, chunk_size=4096) == 1
+        con.send(tag=setup.my_app, msg="next event")
+    finally:
+        con.close()
+        server.close_server()
+
+    event, rest = read_frame(server.wait_for(len(setup.trace) + 200))
+    assert event.startswith(b"<")
+    assert event.split(b": ", 1)[1] == setup.trace + b"\n"
+    assert rest.endswith(b"next event\n")
+
+
+def test_multiline_file_raw(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        assert send_multiline_file(con, setup.multiline, raw=True, chunk_size=4096) == 1
+    finally:
+        con.close()
+        server.close_server()
+
+    event, rest = read_frame(server.wait_for(len(setup.trace) + 10))
+    assert event == setup.trace
+    assert rest == b""
+
+
+def test_multiline_stream_length(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        # The bytes after the length of the frame are not sent
+        assert con.send_multiline_stream(6, [b"one\n", b"two\nthree"]) == 1
+        con.send_raw(b"after")
+        server.wait_for(len(b"6 one\ntwafter"))
+        with pytest.raises(DevoSenderException):
+            con.send_multiline_stream(10, [b"short"])
+        # A partial frame is not completed by the next write
+        assert con.socket is None
+        con.send_raw(b"again")
+        server.wait_for(len(b"6 one\ntwafter10 shortagain"))
+    finally:
+        con.close()
+        server.close_server()
+
+    # What was written of the short event is dropped with its connection
+    assert server.streams[0] == b"6 one\ntwafter10 short"
+    assert server.streams[1] == b"again"
+
+
+def test_cli_multiline_file(setup):
+    server = CollectorServer()
+    runner = CliRunner()
+    result = runner.invoke(
+        data,
+        [
+            "--debug",
+            "--type",
+            "TCP",
+            "--address",
+            server.ip,
+            "--port",
+            server.port,
+            "--file",
+            setup.multiline,
+            "--multiline",
+            "--tag",
+            setup.my_app,
+            "--no-verify-certificates",
+        ],
+    )
+    server.close_server()
+
+    assert result.exception is None
+    assert int(result.output.split("Sended: ")[-1]) == 1
+    event, _ = read_frame(server.wait_for(len(setup.trace) + 100))
+    assert event.split(b": ", 1)[1] == setup.trace + b"\n"
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,123 @@
+import gzip
+import os
+import time
+
+import pytest
+from local_servers import CollectorServer
+
+from devo.sender import DevoSenderException, ParallelSender, Sender, SenderConfigTCP
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.my_app = b"test.drop.free"
+    setup.test_msg = b"Test send msg %d"
+    yield setup
+
+
+def _wait_for_streams(server, count, timeout=5):
+    then = time.time()
+    while time.time() - then < timeout:
+        with server.lock:
+            if sum(stream.count(b"\n") for stream in server.streams) >= count:
+                break
+        time.sleep(0.01)
+    with server.lock:
+        return [bytes(stream) for stream in server.streams]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_sender_reconnects_after_fork(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        assert con.send(tag=setup.my_app, msg=setup.test_msg % 1) == 1
+        assert con.send(tag=setup.my_app, msg=b"buffered in the parent", zip=True) == 0
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                if (
+                    con.send(tag=setup.my_app, msg=setup.test_msg % 2) == 1
+                    and con.buffer.events == 0
+                    and con.send(tag=setup.my_app, msg=b"zipped in the child", zip=True) == 0
+                    and con.flush_buffer() == 1
+                ):
+                    code = 0
+                con.close()
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        # The connection of the parent is still usable
+        assert con.send(tag=setup.my_app, msg=setup.test_msg % 3) == 1
+        assert con.flush_buffer() == 1
+    finally:
+        con.close()
+        server.close_server()
+
+    streams = _wait_for_streams(server, 3)
+    assert len(streams) == 2
+    parent, child = streams
+    assert b"Test send msg 1\n" in parent and b"Test send msg 3\n" in parent
+    assert b"buffered in the parent" in gzip.decompress(parent[parent.index(b"\x1f\x8b"):])
+    assert child.startswith(b"<")
+    assert b"Test send msg 2\n" in child
+    assert b"zipped in the child" in gzip.decompress(child[child.index(b"\x1f\x8b"):])
+    assert b"parent" not in gzip.decompress(child[child.index(b"\x1f\x8b"):])
+
+
+def test_parallel_sender(setup):
+    server = CollectorServer()
+    con = ParallelSender(
+        config=SenderConfigTCP(address=server.address), processes=3, batch_size=100
+    )
+    try:
+        for index in range(1000):
+            assert con.send(tag=setup.my_app, msg=setup.test_msg % index, zip=True) == 1
+        assert con.send_many(tag=setup.my_app, msgs=[b"many 1", b"many 2"]) == 2
+        assert con.flush(timeout=10)
+        assert con.stats == {"processes": 3, "sent": 1002, "errors": 0}
+    finally:
+        con.close(timeout=10)
+        server.close_server()
+
+    streams = _wait_for_streams(server, 2)
+    assert len(streams) == 3
+    lines = []
+    for stream in streams:
+        start = stream.find(b"\x1f\x8b")
+        lines.extend(stream[:start].splitlines() if start >= 0 else stream.splitlines())
+        if start >= 0:
+            lines.extend(gzip.decompress(stream[start:]).splitlines())
+    assert len(lines) == 1002
+    numbers = sorted(
+        int(line.rsplit(b" ", 1)[1]) for line in lines if b"Test send msg" in line
+    )
+    assert numbers == list(range(1000))
+
+
+def test_parallel_sender_worker_error():
+    with pytest.raises(DevoSenderException):
+        ParallelSender(
+            config=SenderConfigTCP(address=("127.0.0.1", 1)), processes=2, timeout=1
+        )
+
+
+def test_parallel_sender_closed(setup):
+    server = CollectorServer()
+    con = ParallelSender(config=SenderConfigTCP(address=server.address), processes=1)
+    con.close()
+    con.close()
+    server.close_server()
+    with pytest.raises(DevoSenderException):
+        con.send(tag=setup.my_app, msg=setup.test_msg % 1)
+
+
+if __name__ == "__main__":
+    pytest.main()
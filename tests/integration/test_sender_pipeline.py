@@ -0,0 +1,194 @@
+import gzip
+import os
+import threading
+import time
+
+import pytest
+from local_servers import CollectorServer
+
+from devo.sender import DevoSenderException, Sender, SenderConfigTCP
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.my_app = b"test.drop.free"
+    setup.test_msg = b"Test send msg %d"
+    setup.random_msg = b"Test send msg %d %s"
+    yield setup
+
+
+def test_pipelined_zip_from_threads(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address), inflight_buffers=2)
+    con.buffer_size(size=2000)
+
+    def producer(thread):
+        for index in range(2000):
+            msg = setup.random_msg % (thread * 10000 + index, os.urandom(32).hex().encode())
+            con.send(tag=setup.my_app, msg=msg, zip=True)
+
+    threads = [threading.Thread(target=producer, args=(thread,)) for thread in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        con.flush_buffer()
+    finally:
+        con.close()
+        server.close_server()
+
+    # Several gzip members, one per buffer
+    received = server.wait_for(1)
+    assert received.count(b"\x1f\x8b\x08") > 4
+    events = gzip.decompress(received).splitlines()
+    assert len(events) == 8000
+    assert len(set(events)) == 8000
+
+
+def test_pipelined_flush_error(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address), inflight_buffers=1)
+    try:
+        assert con.send(tag=setup.my_app, msg=setup.test_msg % 1, zip=True) == 0
+        assert con.flush_buffer() == 1
+
+        # The relay goes away: the error of the worker is raised by the flush
+        server.close_server()
+        time.sleep(0.2)
+        assert con.send(tag=setup.my_app, msg=setup.test_msg % 2, zip=True) == 0
+        with pytest.raises(DevoSenderException):
+            con.flush_buffer()
+        assert con.flush_buffer() == 0
+    finally:
+        con.close()
+
+
+def test_parallel_compression(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    assert con.parallel_compression(workers=4, chunk_size=8192)
+    con.compression_level(cl=9)
+    con.buffer_size(size=10 ** 6)
+    try:
+        for index in range(5000):
+            msg = setup.random_msg % (index, os.urandom(16).hex().encode())
+            assert con.send(tag=setup.my_app, msg=msg, zip=True) == 0
+        assert con.flush_buffer() == 5000
+    finally:
+        con.close()
+        server.close_server()
+
+    received = server.wait_for(1)
+    assert received.count(b"\x1f\x8b\x08") > 4
+    assert len(gzip.decompress(received).splitlines()) == 5000
+
+
+def test_autotune_zip(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address), inflight_buffers=2)
+    con.buffer_size(size=2000)
+    assert con.autotune_zip(latency_target=5.0, window=2, max_length=100000)
+    try:
+        for index in range(3000):
+            msg = setup.random_msg % (index, os.urandom(16).hex().encode())
+            con.send(tag=setup.my_app, msg=msg, zip=True)
+        con.flush_buffer()
+        # Buffers filled much faster than the target: the threshold grows
+        assert con.buffer.length > 2000
+        assert con.autotuner.decisions
+        assert con.autotune_zip(latency_target=None)
+        assert con.autotuner is None
+    finally:
+        con.close()
+        server.close_server()
+
+    received = server.wait_for(1)
+    assert len(gzip.decompress(received).splitlines()) == 3000
+
+
+def test_sub_second_buffer_timeout(setup):
+    server = CollectorServer()
+    con = Sender(
+        config=SenderConfigTCP(address=server.address),
+        buffer_timeout=0.05,
+        use_buffer_flusher=True,
+    )
+    try:
+        start = time.time()
+        assert con.send(tag=setup.my_app, msg=setup.test_msg % 1, zip=True) == 0
+        received = server.wait_for(1, timeout=2)
+        assert time.time() - start < 1
+        assert gzip.decompress(received).endswith(b"Test send msg 1\n")
+        # The buffer is cleared right after it is written
+        while con.buffer.events and time.time() - start < 2:
+            time.sleep(0.01)
+        assert con.buffer.events == 0
+    finally:
+        con.close()
+        server.close_server()
+
+
+@pytest.mark.parametrize("inflight_buffers", [0, 2])
+def test_thread_staging(setup, inflight_buffers):
+    server = CollectorServer()
+    con = Sender(
+        config=SenderConfigTCP(address=server.address), inflight_buffers=inflight_buffers
+    )
+    con.buffer_size(size=5000)
+    assert con.thread_staging(size=4096)
+
+    def producer(thread):
+        for index in range(1000):
+            msg = setup.random_msg % (thread * 10000 + index, os.urandom(16).hex().encode())
+            con.send(tag=setup.my_app, msg=msg, zip=True)
+
+    threads = [threading.Thread(target=producer, args=(thread,)) for thread in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        con.flush_buffer()
+        assert con.staging.pending == 0
+    finally:
+        con.close()
+        server.close_server()
+
+    received = server.wait_for(1)
+    lines = gzip.decompress(received).splitlines()
+    assert len(lines) == 8000
+    # Events of each thread keep their order
+    for thread in range(8):
+        numbers = [
+            int(line.split(b"Test send msg ")[1].split(b" ")[0]) for line in lines
+        ]
+        own = [number for number in numbers if number // 10000 == thread]
+        assert own == sorted(own)
+
+
+def test_thread_staging_buffer_timeout(setup):
+    server = CollectorServer()
+    con = Sender(
+        config=SenderConfigTCP(address=server.address),
+        buffer_timeout=0.05,
+        use_buffer_flusher=True,
+    )
+    assert con.thread_staging()
+    try:
+        assert con.send(tag=setup.my_app, msg=setup.test_msg % 1, zip=True) == 0
+        assert con.buffer.events == 0
+        received = server.wait_for(1, timeout=2)
+        assert gzip.decompress(received).endswith(b"Test send msg 1\n")
+    finally:
+        con.close()
+        server.close_server()
+
+
+if __name__ == "__main__":
+    pytest.main()
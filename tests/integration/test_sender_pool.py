@@ -0,0 +1,163 @@
+import gzip
+import threading
+from unittest import mock
+
+import pytest
+from local_servers import CollectorServer, find_available_port
+
+from devo.sender import (DevoSenderException, PoolSelection, SenderConfigTCP,
+                         SenderPool)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.my_app = "test.drop.free"
+    setup.test_msg = "Test send msg"
+    setup.first_server = CollectorServer()
+    setup.second_server = CollectorServer()
+    setup.closed_address = ("127.0.0.1", find_available_port("127.0.0.1", 4500))
+    setup.tcp_config = SenderConfigTCP(address=setup.first_server.address)
+
+    yield setup
+
+    setup.first_server.close_server()
+    setup.second_server.close_server()
+
+
+def _events(data: bytes) -> int:
+    return data.count(b"\n")
+
+
+def test_pool_round_robin_between_addresses(setup):
+    first_before = len(setup.first_server.received)
+    second_before = len(setup.second_server.received)
+    pool = SenderPool(
+        config=setup.tcp_config,
+        connections=2,
+        addresses=[setup.first_server.address, setup.second_server.address],
+    )
+    try:
+        for _ in range(10):
+            assert pool.send(tag=setup.my_app, msg=setup.test_msg) == 1
+        assert [member["sent"] for member in pool.stats] == [5, 5]
+    finally:
+        pool.close()
+
+    first = setup.first_server.wait_for(first_before + 1)[first_before:]
+    second = setup.second_server.wait_for(second_before + 1)[second_before:]
+    assert _events(first) + _events(second) == 10
+    assert _events(first) == 5
+
+
+def test_pool_least_loaded_from_threads(setup):
+    pool = SenderPool(
+        config=setup.tcp_config, connections=3, selection=PoolSelection.LEAST_LOADED
+    )
+    try:
+
+        def worker():
+            pool.send_many(setup.my_app, [setup.test_msg] * 50)
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sum(member["sent"] for member in pool.stats) == 6
+        assert all(member["in_flight"] == 0 for member in pool.stats)
+    finally:
+        pool.close()
+
+
+def test_pool_skips_failed_connection(setup):
+    before = len(setup.first_server.received)
+    pool = SenderPool(
+        config=setup.tcp_config,
+        connections=2,
+        addresses=[setup.closed_address, setup.first_server.address],
+        retry_wait=60,
+    )
+    try:
+        assert not pool.stats[0]["connected"]
+        assert pool.stats[0]["failures"] == 1
+        for _ in range(4):
+            assert pool.send(tag=setup.my_app, msg=setup.test_msg) == 1
+        assert pool.stats[1]["sent"] == 4
+    finally:
+        pool.close()
+    received = setup.first_server.wait_for(before + 1)[before:]
+    assert _events(received) == 4
+
+
+def test_pool_without_connections(setup):
+    with pytest.raises(DevoSenderException):
+        SenderPool(
+            config=SenderConfigTCP(address=setup.closed_address), connections=2, retry_wait=60
+        )
+
+
+def test_pool_shared_zip_buffer(setup):
+    before = len(setup.second_server.received)
+    pool = SenderPool(
+        config=SenderConfigTCP(address=setup.second_server.address), connections=2
+    )
+    try:
+        for _ in range(10):
+            assert (
+                pool.send(tag=setup.my_app.encode(), msg=setup.test_msg.encode(), zip=True) == 0
+            )
+        assert pool.flush_buffer() == 10
+        assert pool.flush_buffer() == 0
+    finally:
+        pool.close()
+    received = setup.second_server.wait_for(before + 1)[before:]
+    assert _events(gzip.decompress(received)) == 10
+
+
+def test_pool_shared_zip_buffer_str(setup):
+    before = len(setup.second_server.received)
+    pool = SenderPool(
+        config=SenderConfigTCP(address=setup.second_server.address), connections=2
+    )
+    try:
+        for _ in range(10):
+            assert pool.send(tag=setup.my_app, msg=setup.test_msg, zip=True) == 0
+        assert pool.flush_buffer() == 10
+    finally:
+        pool.close()
+    received = setup.second_server.wait_for(before + 1)[before:]
+    events = gzip.decompress(received).splitlines()
+    assert len(events) == 10
+    assert all(
+        event.endswith(b"%s: %s" % (setup.my_app.encode(), setup.test_msg.encode()))
+        for event in events
+    )
+
+
+def test_pool_flush_error_keeps_events(setup):
+    before = len(setup.second_server.received)
+    pool = SenderPool(config=SenderConfigTCP(address=setup.second_server.address), connections=1)
+    try:
+        for _ in range(5):
+            pool.send(tag=setup.my_app, msg=setup.test_msg, zip=True)
+        with mock.patch.object(
+            pool.members[0], "connect", side_effect=DevoSenderException("Relay down")
+        ):
+            with pytest.raises(DevoSenderException):
+                pool.flush_buffer()
+        assert pool.buffer.events == 5
+        pool.send(tag=setup.my_app, msg=setup.test_msg, zip=True)
+        assert pool.flush_buffer() == 6
+    finally:
+        pool.close()
+    received = setup.second_server.wait_for(before + 1)[before:]
+    assert _events(gzip.decompress(received)) == 6
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,302 @@
+import gzip
+import logging
+import os
+import threading
+import time
+from ssl import CERT_NONE
+from unittest import mock
+
+import pytest
+from local_servers import (CollectorServer, EchoServer, find_available_port,
+                           wait_for_ready_server)
+
+from devo.common import get_log
+from devo.sender import (DevoSenderException, OverflowPolicy, QueuedHandler,
+                         QueuedSender, Sender, SenderConfigMemory, SenderConfigSSL,
+                         SenderConfigTCP)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.ssl_address = os.getenv("DEVO_SENDER_SERVER", "127.0.0.1")
+    setup.ssl_port = int(os.getenv("DEVO_SENDER_PORT", 4488))
+    setup.my_app = "test.drop.free"
+    setup.test_msg = "Test send msg\n"
+
+    res_path = os.path.dirname(os.path.abspath(__file__)) + os.sep + "resources"
+    certs_path = res_path + os.sep + "local_certs" + os.sep + "keys"
+    setup.local_server_key = f"{certs_path}/server/private/server_key.pem"
+    setup.local_server_cert = f"{certs_path}/server/server_cert.pem"
+    setup.local_server_chain = f"{certs_path}/ca/ca_cert.pem"
+
+    setup.ssl_port = find_available_port(setup.ssl_address, setup.ssl_port)
+    local_ssl_server = EchoServer(
+        setup.ssl_address, setup.ssl_port, setup.local_server_cert, setup.local_server_key, ssl=True
+    )
+    wait_for_ready_server(local_ssl_server.ip, local_ssl_server.port)
+    setup.engine_config = SenderConfigSSL(
+        address=(setup.ssl_address, setup.ssl_port),
+        key=setup.local_server_key,
+        cert=setup.local_server_cert,
+        chain=setup.local_server_chain,
+        check_hostname=False,
+        verify_mode=CERT_NONE,
+    )
+
+    yield setup
+
+    local_ssl_server.close_server()
+
+
+def _blocked_con():
+    """Mocked Sender whose writes wait until the returned event is set"""
+    release = threading.Event()
+    con = mock.Mock()
+    con.buffer.events = 0
+    con.send_raw_many.side_effect = lambda *args, **kwargs: release.wait()
+    return con, release
+
+
+def _written(con):
+    """Records written through the mocked Sender, in order"""
+    return [record for call in con.send_raw_many.call_args_list for record in call.args[0]]
+
+
+def test_queued_send(setup):
+    con = QueuedSender(config=setup.engine_config, queue_size=100)
+    for _ in range(50):
+        assert con.send(tag=setup.my_app, msg=setup.test_msg) == 1
+    for _ in range(50):
+        assert con.send(tag=setup.my_app.encode(), msg=setup.test_msg.encode(), zip=True) == 1
+    assert con.flush(timeout=10)
+    assert con.stats["sent"] == 100
+    assert con.con.reconnection == 1
+    assert con.stats["errors"] == 0
+    con.close()
+
+
+def test_queued_drop_newest():
+    mocked, release = _blocked_con()
+    con = QueuedSender(con=mocked, queue_size=2, overflow_policy=OverflowPolicy.DROP_NEWEST)
+    con.send_raw(b"first\n")
+    # Wait for the writer to take the first event and get stuck with it
+    while len(con):
+        time.sleep(0.01)
+    assert con.send_raw(b"second\n") == 1
+    assert con.send_raw(b"third\n") == 1
+    assert con.send_raw(b"fourth\n") == 0
+    assert con.dropped == 1
+    release.set()
+    con.close()
+    assert _written(mocked) == [
+        b"first\n",
+        b"second\n",
+        b"third\n",
+    ]
+
+
+def test_queued_drop_oldest():
+    mocked, release = _blocked_con()
+    con = QueuedSender(con=mocked, queue_size=2, overflow_policy=OverflowPolicy.DROP_OLDEST)
+    con.send_raw(b"first\n")
+    while len(con):
+        time.sleep(0.01)
+    for record in (b"second\n", b"third\n", b"fourth\n"):
+        assert con.send_raw(record) == 1
+    assert con.dropped == 1
+    release.set()
+    con.close()
+    assert _written(mocked) == [
+        b"first\n",
+        b"third\n",
+        b"fourth\n",
+    ]
+
+
+def test_queued_block_timeout():
+    mocked, release = _blocked_con()
+    con = QueuedSender(con=mocked, queue_size=1, block_timeout=0.1)
+    con.send_raw(b"first\n")
+    while len(con):
+        time.sleep(0.01)
+    assert con.send_raw(b"second\n") == 1
+    then = time.time()
+    assert con.send_raw(b"third\n") == 0
+    assert time.time() - then >= 0.1
+    assert con.dropped == 1
+    release.set()
+    con.close()
+
+
+def test_queued_retry_and_close_timeout():
+    mocked = mock.Mock()
+    mocked.buffer.events = 0
+    mocked.send_raw_many.side_effect = DevoSenderException("Relay down")
+    con = QueuedSender(con=mocked, retry_wait=0.05)
+    con.send_raw(b"first\n")
+    con.send_raw(b"second\n")
+    time.sleep(0.3)
+    con.close(timeout=0.1)
+    assert con.errors >= 1
+    assert con.dropped == 2
+    assert con.sent == 0
+    with pytest.raises(DevoSenderException):
+        con.send_raw(b"third\n")
+
+
+class ThreadFormatter(logging.Formatter):
+    """Formatter that records the threads that format"""
+
+    def __init__(self):
+        super().__init__("%(message)s")
+        self.threads = set()
+
+    def format(self, record):
+        self.threads.add(threading.current_thread().name)
+        return super().format(record)
+
+
+def test_queued_flush_retried(setup):
+    config = SenderConfigMemory()
+    con = Sender(config=config)
+    send_raw = con.send_raw
+    failures = [DevoSenderException("Relay down")]
+
+    def failing_send_raw(record, *args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return send_raw(record, *args, **kwargs)
+
+    con.send_raw = failing_send_raw
+    queued = QueuedSender(con=con, retry_wait=0.05)
+    try:
+        for index in range(10):
+            queued.send(tag=setup.my_app, msg="zipped %d" % index, zip=True)
+        assert queued.stats["sent"] == 0
+        assert queued.flush(timeout=10)
+        assert queued.stats == {"queued": 0, "sent": 10, "dropped": 0, "errors": 1}
+    finally:
+        queued.close()
+
+    # The batch was kept by the failed flush and sent once by the retry
+    events = gzip.decompress(config.getvalue()).splitlines()
+    assert [event.split(b": ", 1)[1] for event in events] == [
+        b"zipped %d" % index for index in range(10)
+    ]
+
+
+@pytest.mark.parametrize("zip", [False, True])
+def test_queued_bad_event(setup, zip):
+    config = SenderConfigMemory()
+    queued = QueuedSender(con=Sender(config=config), retry_wait=0.05)
+    try:
+        queued.send(tag=setup.my_app, msg="good 0", zip=zip)
+        queued.send(tag=setup.my_app, msg=None, zip=zip)
+        queued.send(tag=setup.my_app, msg="good 1", zip=zip)
+        queued.send(tag=setup.my_app, msg="good 2", zip=zip)
+        # The writer thread is still alive and the error is not retried
+        assert queued.flush(timeout=5)
+        assert queued.stats == {"queued": 0, "sent": 3, "dropped": 1, "errors": 1}
+    finally:
+        queued.close(timeout=5)
+
+    data = config.getvalue()
+    events = (gzip.decompress(data) if zip else data).splitlines()
+    assert [event.split(b": ", 1)[1] for event in events] == [b"good 0", b"good 1", b"good 2"]
+
+
+def test_queued_error_not_retried(setup):
+    mocked = mock.Mock()
+    mocked.buffer.events = 0
+    mocked.send_many.side_effect = [ValueError("Wrong severity"), 1]
+    queued = QueuedSender(con=mocked, retry_wait=0.05)
+    try:
+        queued.send(tag=setup.my_app, msg="wrong", severity="x")
+        assert queued.flush(timeout=5)
+        queued.send(tag=setup.my_app, msg="right")
+        assert queued.flush(timeout=5)
+        assert queued.stats == {"queued": 0, "sent": 1, "dropped": 1, "errors": 1}
+    finally:
+        queued.close(timeout=5)
+    assert mocked.send_many.call_count == 2
+
+
+def test_queued_handler(setup):
+    server = CollectorServer()
+    handler = QueuedHandler(config=SenderConfigTCP(address=server.address), tag=setup.my_app)
+    formatter = ThreadFormatter()
+    handler.setFormatter(formatter)
+    logger = get_log(name="DevoQueuedLogger", handler=handler, level=logging.DEBUG)
+    try:
+        logger.info("first %s", "record")
+        logger.error("second record")
+        assert handler.queue.flush(timeout=10)
+        assert formatter.threads == {"devo-sender-writer"}
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+        server.close_server()
+
+    events = gzip.decompress(server.wait_for(1)).splitlines()
+    assert [event.split(b": ", 1)[1] for event in events] == [b"first record\0", b"second record\0"]
+    assert events[0].startswith(b"<14>") and events[1].startswith(b"<11>")
+    assert handler.stats["sent"] == 2
+
+
+def test_queued_handler_drops():
+    release = threading.Event()
+    mocked = mock.Mock()
+    mocked.buffer.events = 0
+    mocked.send_many.side_effect = lambda *args, **kwargs: release.wait()
+    handler = QueuedHandler(con=mocked, queue_size=2)
+    logger = get_log(name="DevoQueuedLoggerDrops", handler=handler, level=logging.DEBUG)
+    try:
+        logger.info("first")
+        while handler.stats["queued"]:
+            time.sleep(0.01)
+        # The relay is stuck: the records are queued or dropped, without waiting
+        then = time.time()
+        for index in range(100):
+            logger.info("record %d", index)
+        assert time.time() - then < 1
+        assert handler.stats["dropped"] == 98
+        release.set()
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    msgs = [msg for call in mocked.send_many.call_args_list for msg in call.args[1]]
+    assert msgs == ["first\0", "record 0\0", "record 1\0"]
+
+
+def test_queued_handler_close_timeout():
+    mocked = mock.Mock()
+    mocked.buffer.events = 0
+    mocked.send_many.side_effect = DevoSenderException("Relay down")
+    handler = QueuedHandler(con=mocked, retry_wait=0.05, close_timeout=0.1)
+    handler.emit(logging.makeLogRecord({"msg": "lost"}))
+    then = time.time()
+    handler.close()
+    assert time.time() - then < 1
+    assert handler.stats["dropped"] == 1
+
+
+def test_for_logging_queued(setup):
+    handler = Sender.for_logging(config=setup.engine_config, tag=setup.my_app, queued=True,
+                                 queue_size=100)
+    try:
+        assert isinstance(handler, QueuedHandler)
+        assert handler.tag == setup.my_app
+        assert handler.facility == logging.INFO
+        assert handler.queue.queue_size == 100
+    finally:
+        handler.close()
+
+
+if __name__ == "__main__":
+    pytest.main()
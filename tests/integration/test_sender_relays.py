@@ -0,0 +1,119 @@
+import os
+import time
+from ssl import CERT_NONE
+
+import pytest
+from local_servers import (EchoServer, find_available_port,
+                           wait_for_ready_server)
+
+from devo.sender import RelaySet, Sender, SenderConfigSSL
+from devo.sender.relays import CircuitState
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.ssl_address = "127.0.0.1"
+    setup.my_app = "test.drop.free"
+    setup.test_msg = "Test send msg\n"
+
+    res_path = os.path.dirname(os.path.abspath(__file__)) + os.sep + "resources"
+    certs_path = res_path + os.sep + "local_certs" + os.sep + "keys"
+    setup.local_server_key = f"{certs_path}/server/private/server_key.pem"
+    setup.local_server_cert = f"{certs_path}/server/server_cert.pem"
+    setup.local_server_chain = f"{certs_path}/ca/ca_cert.pem"
+
+    setup.servers = {}
+    port = 4600
+    for _ in range(3):
+        port = find_available_port(setup.ssl_address, port + 1)
+        setup.servers[port] = start_server(setup, port)
+    setup.ports = list(setup.servers)
+
+    yield setup
+
+    for server in setup.servers.values():
+        if server is not None:
+            server.close_server()
+
+
+def start_server(setup, port):
+    server = EchoServer(
+        setup.ssl_address, port, setup.local_server_cert, setup.local_server_key, ssl=True
+    )
+    wait_for_ready_server(server.ip, server.port)
+    return server
+
+
+def kill_server(setup, port):
+    setup.servers[port].close_server()
+    setup.servers[port] = None
+
+
+def engine_config(setup, relays):
+    return SenderConfigSSL(
+        address=relays,
+        key=setup.local_server_key,
+        cert=setup.local_server_cert,
+        chain=setup.local_server_chain,
+        check_hostname=False,
+        verify_mode=CERT_NONE,
+    )
+
+
+def test_relays_failover(setup):
+    first, second, third = setup.ports
+    kill_server(setup, first)
+    relays = RelaySet(
+        [(setup.ssl_address, port) for port in setup.ports],
+        failure_threshold=1,
+        probe_interval=None,
+    )
+    con = Sender(config=engine_config(setup, relays))
+    try:
+        assert con._sender_config.address == (setup.ssl_address, second)
+        assert relays.endpoints[0].state == CircuitState.OPEN
+        assert relays.endpoints[1].latency is not None
+        assert con.send(tag=setup.my_app, msg=setup.test_msg) == 1
+
+        # The relay in use is killed: the next send reconnects to the last one
+        kill_server(setup, second)
+        time.sleep(0.2)
+        assert con.send(tag=setup.my_app, msg=setup.test_msg) == 1
+        assert con._sender_config.address == (setup.ssl_address, third)
+        assert relays.endpoints[1].state == CircuitState.OPEN
+    finally:
+        con.close()
+
+
+def test_relays_background_probe(setup):
+    first = setup.ports[0]
+    relays = RelaySet(
+        [(setup.ssl_address, port) for port in setup.ports],
+        failure_threshold=1,
+        reset_timeout=60,
+        probe_interval=0.1,
+        probe_timeout=1,
+    )
+    con = Sender(config=engine_config(setup, relays))
+    try:
+        # Killed by test_relays_failover
+        assert relays.endpoints[0].state == CircuitState.OPEN
+
+        setup.servers[first] = start_server(setup, first)
+        then = time.time()
+        while relays.endpoints[0].state != CircuitState.CLOSED and time.time() - then < 5:
+            time.sleep(0.05)
+        assert relays.endpoints[0].state == CircuitState.CLOSED
+        assert relays.endpoints[0] in relays.candidates()
+    finally:
+        relays.stop()
+        con.close()
+
+
+if __name__ == "__main__":
+    pytest.main()
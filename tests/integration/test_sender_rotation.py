@@ -0,0 +1,139 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+from local_servers import CollectorServer
+
+from devo.sender import Sender, SenderConfigTCP
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.my_app = b"test.drop.free"
+    setup.msg = b"rotation test msg"
+    yield setup
+
+
+def wait_until(condition, timeout=5):
+    then = time.time()
+    while not condition() and time.time() - then < timeout:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_rotation_before_max_age(setup):
+    """The replacement is connected before the maximum age of the connection
+    and the next write switches to it"""
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address), inactivity_timeout=60)
+    con.socket_max_connection = 1500
+    try:
+        assert con.connection_rotation(lead=1.0)
+        con.send(tag=setup.my_app, msg=setup.msg)
+        first = con.socket
+        # The replacement is opened in the background, without sending
+        assert wait_until(lambda: len(server.streams) == 2)
+        assert con.socket is first
+
+        config, connecting = con._sender_config, []
+        connect = config.connect
+
+        def record(*args, **kwargs):
+            connecting.append(threading.current_thread())
+            return connect(*args, **kwargs)
+
+        with mock.patch.object(config, "connect", side_effect=record):
+            con.send(tag=setup.my_app, msg=setup.msg)
+        # It switched to the replacement, without connecting in the send
+        assert threading.current_thread() not in connecting
+        assert con.socket is not first
+        # The old connection is drained and closed in the background
+        assert wait_until(lambda: first.fileno() == -1)
+    finally:
+        con.close()
+        server.close_server()
+
+    assert server.wait_for(2 * len(setup.msg)).count(setup.msg) == 2
+    assert setup.msg in server.streams[0] and setup.msg in server.streams[1]
+    assert len(server.streams) == 2
+
+
+def test_rotation_after_inactivity(setup):
+    """An idle connection is replaced by one opened before its inactivity
+    timeout"""
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address), inactivity_timeout=2)
+    try:
+        assert con.connection_rotation(lead=1.0)
+        con.send(tag=setup.my_app, msg=setup.msg)
+        first = con.socket
+        assert wait_until(lambda: len(server.streams) == 2)
+        time.sleep(2.2 - (time.time() - con.last_message))
+
+        con.send(tag=setup.my_app, msg=setup.msg)
+        assert con.socket is not first
+        assert len(server.streams) == 2
+    finally:
+        con.close()
+        server.close_server()
+
+    assert server.wait_for(2 * len(setup.msg)).count(setup.msg) == 2
+
+
+def test_rotation_not_needed(setup):
+    """A connection far from its deadlines is not replaced"""
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        assert con.connection_rotation(lead=1.0)
+        first = con.socket
+        for _ in range(10):
+            con.send(tag=setup.my_app, msg=setup.msg)
+        time.sleep(0.2)
+        assert con.socket is first
+        assert len(server.streams) == 1
+    finally:
+        con.close()
+        server.close_server()
+
+
+def test_rotation_close_discards_replacement(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address), inactivity_timeout=60)
+    con.socket_max_connection = 1000
+    assert con.connection_rotation(lead=0.8)
+    assert wait_until(lambda: len(server.streams) == 2)
+    con.close()
+    assert con.socket is None
+
+    # The next send connects again, without the discarded replacement
+    con.send(tag=setup.my_app, msg=setup.msg)
+    assert len(server.streams) == 3
+    con.close()
+    server.close_server()
+    assert server.wait_for(len(setup.msg)).count(setup.msg) == 1
+
+
+def test_rotation_disabled(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address), inactivity_timeout=60)
+    con.socket_max_connection = 1000
+    try:
+        assert con.connection_rotation(lead=0.8)
+        assert con.connection_rotation(lead=None)
+        time.sleep(0.5)
+        assert len(server.streams) == 1
+        assert con.rotation_lead is None
+    finally:
+        con.close()
+        server.close_server()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -1,7 +1,10 @@
+import copy
 import os
+import pickle
 import select
 import socket
 import tempfile
+import time
 from pathlib import Path
 from ssl import CERT_NONE, SSLSocket, SSLWantReadError
 from unittest import mock
@@ -15,7 +18,7 @@ from OpenSSL import SSL, crypto
 from devo.common import Configuration, get_log
 from devo.common.loadenv.load_env import load_env_file
 from devo.sender import (DevoSenderException, Sender, SenderConfigSSL,
-                         SenderConfigTCP)
+                         SenderConfigTCP, SenderPool)
 from devo.sender.data import open_file
 
 TEST_FACILITY = 10
@@ -228,6 +231,69 @@ def test_ssl_zip_send(setup):
         pytest.fail("Problems with test: %s" % str(error))
 
 
+def _read_all(con, length: int):
+    data = b""
+    while len(data) < length:
+        data += _read(con, length - len(data))
+    return data
+
+
+def test_ssl_send_many(setup):
+    """
+    Test that sends a batch of messages with a single write
+    """
+    engine_config = SenderConfigSSL(
+        address=(setup.ssl_address, setup.ssl_port),
+        key=setup.local_server_key,
+        cert=setup.local_server_cert,
+        chain=setup.local_server_chain,
+        check_hostname=False,
+        verify_mode=CERT_NONE,
+    )
+    con = Sender(engine_config)
+    msgs = ["%s %d" % (setup.test_msg.strip(), i) for i in range(setup.default_numbers_sendings)]
+    assert con.send_many(tag=setup.my_app, msgs=msgs, hostname="host") == len(msgs)
+    expected = "".join("<14>Jan  1 00:00:00 host %s: %s\n" % (setup.my_app, msg) for msg in msgs)
+    assert _read_all(con, len(expected)) == expected.encode("utf-8")
+
+    records = [b"<14>Jan  1 00:00:00 host test.drop.free: raw\n"] * 3
+    assert con.send_raw_many(records) == 3
+    assert _read_all(con, len(b"".join(records))) == b"".join(records)
+    assert con.send_raw_many([]) == 0
+    con.close()
+
+
+def test_reconnect_after_endpoint_close(setup):
+    """
+    Test that a connection closed by the endpoint is flagged by the
+    connection monitor and the next send reconnects
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(5)
+    con = Sender(SenderConfigTCP(address=server.getsockname()), timeout=5)
+    first, _ = server.accept()
+    con.send(tag=setup.my_app, msg=setup.test_msg)
+    assert first.recv(5000)
+    watch = con._Sender__watch
+    assert not watch.triggered
+
+    first.close()
+    for _ in range(200):
+        if watch.triggered:
+            break
+        time.sleep(0.01)
+    assert watch.triggered
+
+    con.send(tag=setup.my_app, msg=setup.test_msg)
+    second, _ = server.accept()
+    assert second.recv(5000)
+    assert con._Sender__watch is not watch
+    second.close()
+    server.close()
+    con.close()
+
+
 def test_multiline_send(setup):
     """
     Test that tries to send a multiple line message through
@@ -744,5 +810,158 @@ def test_open_file(setup):
         open_file(55, mode="r", encoding="utf-8")
 
 
+def test_ssl_context_cached(setup):
+    """
+    Test that the SSL context is created once and created again when the
+    configuration changes
+    """
+    engine_config = SenderConfigSSL(
+        address=(setup.ssl_address, setup.ssl_port),
+        key=setup.local_server_key,
+        cert=setup.local_server_cert,
+        chain=setup.local_server_chain,
+        check_hostname=False,
+        verify_mode=CERT_NONE,
+    )
+    context = engine_config.ssl_context()
+    assert engine_config.ssl_context() is context
+
+    engine_config.sec_level = 1
+    changed = engine_config.ssl_context()
+    assert changed is not context
+    assert engine_config.ssl_context() is changed
+
+    engine_config.reset_ssl_context()
+    assert engine_config.ssl_context() is not changed
+
+    # The cached context is not copied with the configuration
+    copied = pickle.loads(pickle.dumps(engine_config))
+    assert copied.ssl_context() is not engine_config.ssl_context()
+
+    # But it is shared with its shallow copies
+    assert copy.copy(engine_config).ssl_context() is engine_config.ssl_context()
+
+
+def test_ssl_session_resumed(setup):
+    """
+    Test that a reconnection resumes the TLS session of the previous one
+    """
+    engine_config = SenderConfigSSL(
+        address=(setup.ssl_address, setup.ssl_port),
+        key=setup.local_server_key,
+        cert=setup.local_server_cert,
+        chain=setup.local_server_chain,
+        check_hostname=False,
+        verify_mode=CERT_NONE,
+    )
+    con = Sender(engine_config)
+    con.send(tag=setup.my_app, msg=setup.test_msg)
+    assert len(_read(con, 5000)) > 0
+    assert not con.socket.session_reused
+    con.close()
+
+    con.send(tag=setup.my_app, msg=setup.test_msg)
+    assert len(_read(con, 5000)) > 0
+    assert con.socket.session_reused
+    con.close()
+
+
+def test_ssl_pool_shares_context(setup):
+    """
+    Test that the connections of a pool share the SSL context of the
+    configuration and resume the TLS sessions of each other
+    """
+    engine_config = SenderConfigSSL(
+        address=(setup.ssl_address, setup.ssl_port),
+        key=setup.local_server_key,
+        cert=setup.local_server_cert,
+        chain=setup.local_server_chain,
+        check_hostname=False,
+        verify_mode=CERT_NONE,
+    )
+    pool = SenderPool(config=engine_config, connections=2)
+    try:
+        pool.send(tag=setup.my_app, msg=setup.test_msg)
+        first = pool.members[0].sender
+        assert len(_read(first, 5000)) > 0
+        assert first.socket.context is engine_config.ssl_context()
+        assert not first.socket.session_reused
+        # The session is kept when the connection is closed, and the next
+        # connection of the other member resumes it
+        pool.members[1].close()
+        pool.members[0].close()
+        second = pool.members[1].connect()
+        assert second.socket.context is engine_config.ssl_context()
+        assert second.socket.session_reused
+    finally:
+        pool.close()
+
+
+def test_ssl_connection_rotation(setup):
+    """
+    Test that the replacement of an SSL connection is opened in the
+    background, resuming the TLS session, and used by the next write
+    """
+    engine_config = SenderConfigSSL(
+        address=(setup.ssl_address, setup.ssl_port),
+        key=setup.local_server_key,
+        cert=setup.local_server_cert,
+        chain=setup.local_server_chain,
+        check_hostname=False,
+        verify_mode=CERT_NONE,
+    )
+    con = Sender(engine_config, inactivity_timeout=60)
+    con.socket_max_connection = 1500
+    assert con.connection_rotation(lead=1.0)
+    for _ in range(2):
+        con.send(tag=setup.my_app, msg=setup.test_msg)
+        assert len(_read(con, 5000)) > 0
+    first = con.socket
+    time.sleep(1.0)
+
+    con.send(tag=setup.my_app, msg=setup.test_msg)
+    assert con.socket is not first
+    assert con.socket.session_reused
+    assert len(_read(con, 5000)) > 0
+    con.close()
+
+
+def test_ssl_pkcs_send(setup):
+    """
+    Test that a PKCS#12 file is converted in memory, without setting the
+    key, cert and chain files of the configuration
+    """
+    from cryptography import x509
+    from cryptography.hazmat.primitives.serialization import (
+        BestAvailableEncryption, load_pem_private_key, pkcs12)
+
+    with open(setup.local_server_key, "rb") as file:
+        key = load_pem_private_key(file.read(), None)
+    with open(setup.local_server_cert, "rb") as file:
+        cert = x509.load_pem_x509_certificate(file.read())
+    with open(setup.local_server_chain, "rb") as file:
+        chain = x509.load_pem_x509_certificate(file.read())
+    pfx_path = os.path.join(tempfile.mkdtemp(), "server.pfx")
+    with open(pfx_path, "wb") as file:
+        file.write(
+            pkcs12.serialize_key_and_certificates(
+                b"server", key, cert, [chain], BestAvailableEncryption(b"secret")
+            )
+        )
+
+    engine_config = SenderConfigSSL(
+        address=(setup.ssl_address, setup.ssl_port),
+        pkcs={"path": pfx_path, "password": "secret"},
+        check_hostname=False,
+        verify_mode=CERT_NONE,
+    )
+    con = Sender(engine_config)
+    con.send(tag=setup.my_app, msg=setup.test_msg)
+    assert len(_read(con, 5000)) > 0
+    con.close()
+    assert engine_config.key is None and engine_config.cert is None
+    os.remove(pfx_path)
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,73 @@
+import gzip
+import os
+import tempfile
+
+import pytest
+from local_servers import CollectorServer, find_available_port
+
+from devo.sender import Sender, SenderConfigTCP, Spool
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.my_app = "test.drop.free"
+    setup.test_msg = "Test send msg"
+    setup.temp_dir = tempfile.TemporaryDirectory()
+    yield setup
+
+    setup.temp_dir.cleanup()
+
+
+def test_spool_delivery(setup):
+    server = CollectorServer()
+    con = Sender(
+        config=SenderConfigTCP(address=server.address),
+        spool=os.path.join(setup.temp_dir.name, "delivery"),
+    )
+    try:
+        for _ in range(10):
+            assert con.send(tag=setup.my_app, msg=setup.test_msg) == 1
+        assert con.send_many(setup.my_app, [setup.test_msg] * 10) == 10
+        assert con.send(tag=setup.my_app.encode(), msg=setup.test_msg.encode(), zip=True) == 0
+        assert con.flush_buffer() == 1
+        assert con.flush_spool(timeout=10)
+    finally:
+        con.close()
+        server.close_server()
+
+    received = server.wait_for(1)
+    zipped = received[received.index(b"\x1f\x8b"):]
+    assert received.count(b"\n") - zipped.count(b"\n") == 20
+    assert gzip.decompress(zipped).count(setup.test_msg.encode()) == 1
+
+
+def test_spool_relay_outage_and_restart(setup):
+    path = os.path.join(setup.temp_dir.name, "outage")
+    port = find_available_port("127.0.0.1", 4700)
+    config = SenderConfigTCP(address=("127.0.0.1", port))
+
+    # The relay is down: the events are kept on disk, even after closing
+    con = Sender(config=config, spool=path)
+    for _ in range(10):
+        assert con.send(tag=setup.my_app, msg=setup.test_msg) == 1
+    assert not con.flush_spool(timeout=0.5)
+    con.close()
+
+    server = CollectorServer(port=port)
+    spool = Spool(path)
+    con = Sender(config=config, spool=spool)
+    try:
+        assert con.flush_spool(timeout=10)
+    finally:
+        con.close()
+        server.close_server()
+    assert server.wait_for(1).count(setup.test_msg.encode()) == 10
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,280 @@
+import gc
+import gzip
+import os
+import tempfile
+import threading
+import time
+import warnings
+
+import pytest
+from click.testing import CliRunner
+from local_servers import CollectorServer
+
+from devo.sender import Sender, SenderConfigTCP
+from devo.sender.scripts.sender_cli import tail
+from devo.sender.tail import FileFollower, TailCheckpoint
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.my_app = "test.drop.free"
+    yield setup
+
+
+@pytest.fixture()
+def directory():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+
+def write(path, lines, mode="ab"):
+    with open(path, mode) as file:
+        file.write(b"".join(line + b"\n" for line in lines))
+
+
+def received_lines(server, count, zip=True, timeout=5):
+    """Events received, without their syslog header"""
+    then = time.time()
+    while True:
+        with server.lock:
+            streams = [bytes(stream) for stream in server.streams]
+        try:
+            lines = [
+                line.split(b": ", 1)[1]
+                for stream in streams
+                for line in (gzip.decompress(stream) if zip else stream).splitlines()
+            ]
+        except (EOFError, OSError):
+            lines = []
+        if len(lines) >= count or time.time() - then > timeout:
+            return lines
+        time.sleep(0.01)
+
+
+class Following:
+    """Runs a FileFollower in a thread"""
+
+    def __init__(self, follower):
+        self.follower = follower
+        self.thread = threading.Thread(target=follower.run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.follower.stop()
+        self.thread.join(5)
+        self.follower.close()
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_follow_new_lines(setup, directory, use_inotify):
+    path = os.path.join(directory, "app.log")
+    write(path, [b"old %d" % index for index in range(10)])
+    checkpoint = os.path.join(directory, "checkpoint.json")
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    following = Following(
+        FileFollower(con, [path], tag=setup.my_app, checkpoint=checkpoint, poll_interval=0.05,
+                     use_inotify=use_inotify)
+    )
+    try:
+        time.sleep(0.2)
+        write(path, [b"new %d" % index for index in range(100)])
+        with open(path, "ab") as file:
+            # Not sent until the line is complete
+            file.write(b"partial")
+        assert received_lines(server, 100) == [b"new %d" % index for index in range(100)]
+        write(path, [b" line"])
+        assert received_lines(server, 101)[-1] == b"partial line"
+    finally:
+        following.close()
+        con.close()
+        server.close_server()
+
+    assert following.follower.sent == 101
+    status = os.stat(path)
+    assert TailCheckpoint(checkpoint).files[path] == (status.st_dev, status.st_ino, status.st_size)
+
+
+def test_resume_from_checkpoint(setup, directory):
+    path = os.path.join(directory, "app.log")
+    checkpoint = os.path.join(directory, "checkpoint.json")
+    write(path, [b"first %d" % index for index in range(100)])
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        with FileFollower(con, [path], tag=setup.my_app, checkpoint=checkpoint,
+                          from_start=True) as follower:
+            assert follower.run(once=True) == 100
+        write(path, [b"second %d" % index for index in range(50)])
+        # A new follower resumes after the lines already sent
+        with FileFollower(con, [path], tag=setup.my_app, checkpoint=checkpoint,
+                          from_start=True) as follower:
+            assert follower.run(once=True) == 50
+            assert follower.run(once=True) == 0
+    finally:
+        con.close()
+        server.close_server()
+
+    expected = [b"first %d" % index for index in range(100)]
+    expected += [b"second %d" % index for index in range(50)]
+    assert received_lines(server, 150) == expected
+
+
+def test_rotation(setup, directory):
+    path = os.path.join(directory, "app.log")
+    write(path, [])
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    following = Following(FileFollower(con, [path], tag=setup.my_app, poll_interval=0.05))
+    try:
+        time.sleep(0.2)
+        write(path, [b"before %d" % index for index in range(10)])
+        assert len(received_lines(server, 10)) == 10
+        with open(path, "ab") as writer:
+            os.rename(path, path + ".1")
+            # The writer has not reopened the file yet
+            writer.write(b"late\n")
+        write(path, [b"after %d" % index for index in range(10)], mode="wb")
+        lines = received_lines(server, 21)
+    finally:
+        following.close()
+        con.close()
+        server.close_server()
+
+    expected = [b"before %d" % index for index in range(10)] + [b"late"]
+    assert lines == expected + [b"after %d" % index for index in range(10)]
+
+
+def test_rotation_while_stopped(setup, directory):
+    path = os.path.join(directory, "app.log")
+    checkpoint = os.path.join(directory, "checkpoint.json")
+    write(path, [b"one"])
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        with FileFollower(con, [path], tag=setup.my_app, checkpoint=checkpoint,
+                          from_start=True) as follower:
+            assert follower.run(once=True) == 1
+        write(path, [b"two"])
+        os.rename(path, path + ".1")
+        write(path, [b"three"])
+        past = time.time() - 10
+        os.utime(path + ".1", (past, past))
+        with FileFollower(con, [path], tag=setup.my_app, checkpoint=checkpoint) as follower:
+            assert follower.run(once=True) == 2
+    finally:
+        con.close()
+        server.close_server()
+
+    assert received_lines(server, 3) == [b"one", b"two", b"three"]
+
+
+def test_rename_then_create(setup, directory):
+    path = os.path.join(directory, "app.log")
+    checkpoint = os.path.join(directory, "checkpoint.json")
+    write(path, [b"one"])
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            with FileFollower(con, [path], tag=setup.my_app, checkpoint=checkpoint,
+                              from_start=True, poll_interval=60) as follower:
+                assert follower.run(once=True) == 1
+                os.rename(path, path + ".1")
+                write(path + ".1", [b"two"])
+                # Removed, its writer may still add lines
+                assert follower.run(once=True) == 1
+                write(path, [b"three"])
+                assert follower.run(once=True) == 0
+                past = time.time() - 120
+                os.utime(path + ".1", (past, past))
+                assert follower.run(once=True) == 1
+            gc.collect()
+    finally:
+        con.close()
+        server.close_server()
+
+    assert received_lines(server, 3) == [b"one", b"two", b"three"]
+    assert not [warning for warning in caught if issubclass(warning.category, ResourceWarning)]
+
+
+def test_truncation(setup, directory):
+    path = os.path.join(directory, "app.log")
+    checkpoint = os.path.join(directory, "checkpoint.json")
+    write(path, [b"long line before truncating %d" % index for index in range(10)])
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    try:
+        with FileFollower(con, [path], tag=setup.my_app, checkpoint=checkpoint, zip=False,
+                          from_start=True) as follower:
+            assert follower.run(once=True) == 10
+            # copytruncate
+            write(path, [b"truncated"], mode="wb")
+            assert follower.run(once=True) == 1
+    finally:
+        con.close()
+        server.close_server()
+
+    assert received_lines(server, 11, zip=False)[-1] == b"truncated"
+
+
+def test_new_files_of_glob(setup, directory):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address))
+    write(os.path.join(directory, "a.log"), [b"existing"])
+    try:
+        with FileFollower(con, [os.path.join(directory, "*.log")], tag=setup.my_app) as follower:
+            assert follower.run(once=True) == 0
+            # Files that appear after starting are sent whole
+            write(os.path.join(directory, "b.log"), [b"new file"])
+            write(os.path.join(directory, "a.log"), [b"appended"])
+            assert follower.run(once=True) == 2
+    finally:
+        con.close()
+        server.close_server()
+
+    assert sorted(received_lines(server, 2)) == [b"appended", b"new file"]
+
+
+def test_cli_tail_once(setup, directory):
+    path = os.path.join(directory, "app.log")
+    checkpoint = os.path.join(directory, "checkpoint.json")
+    write(path, [b"event %d" % index for index in range(20)])
+    server = CollectorServer()
+    runner = CliRunner()
+    arguments = [
+        path,
+        "--debug",
+        "--type",
+        "TCP",
+        "--address",
+        server.ip,
+        "--port",
+        server.port,
+        "--tag",
+        setup.my_app,
+        "--checkpoint",
+        checkpoint,
+        "--from-start",
+        "--once",
+        "--no-verify-certificates",
+    ]
+    result = runner.invoke(tail, arguments)
+    assert result.exception is None, result.output
+    assert int(result.output.split("Sended: ")[-1]) == 20
+    # Nothing new
+    result = runner.invoke(tail, arguments)
+    assert int(result.output.split("Sended: ")[-1]) == 0
+    server.close_server()
+
+    assert received_lines(server, 20) == [b"event %d" % index for index in range(20)]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,215 @@
+import asyncio
+import gzip
+import os
+import pickle
+import re
+import tempfile
+import time
+
+import pytest
+from local_servers import CollectorServer
+
+from devo.sender import (AsyncSender, DevoSenderException, Sender, SenderConfigFile,
+                         SenderConfigMemory, SenderConfigNull, SenderConfigUnix,
+                         SenderTransport, Sink)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.my_app = b"test.drop.free"
+    setup.path = tempfile.mkdtemp()
+    setup.msgs = [b"transport test msg %d" % index for index in range(1000)]
+    yield setup
+
+
+def send_events(con, setup):
+    """Plain, multiline and zipped events"""
+    con.send(tag=setup.my_app, msg=b"plain event")
+    con.send(tag=setup.my_app, msg=b"multiline\nevent", multiline=True)
+    con.send_many(setup.my_app, setup.msgs, zip=True)
+    con.flush_buffer()
+
+
+def plain_and_zipped(data):
+    """The events written before the zip frames, and the zipped ones"""
+    start = data.index(b"\x1f\x8b")
+    return data[:start], gzip.decompress(data[start:]).splitlines()
+
+
+def test_memory_transport(setup):
+    config = SenderConfigMemory()
+    con = Sender(config=config)
+    send_events(con, setup)
+    con.close()
+
+    plain, zipped = plain_and_zipped(config.getvalue())
+    assert b": plain event\n" in plain and plain.endswith(b": multiline\nevent\n")
+    assert [event.split(b": ", 1)[1] for event in zipped] == setup.msgs
+    assert con.reconnection == 0
+
+    # The next send opens another sink on the same data
+    con.send(tag=setup.my_app, msg=b"after close")
+    con.close()
+    assert config.getvalue().endswith(b": after close\n")
+    config.clear()
+    assert config.data == b""
+
+
+def test_file_transport(setup):
+    path = os.path.join(setup.path, "events", "framed.log")
+    memory = SenderConfigMemory()
+    for config in (SenderConfigFile(path=path), memory):
+        con = Sender(config=config)
+        send_events(con, setup)
+        con.close()
+
+    # The file has exactly the bytes that would be sent to a relay
+    with open(path, "rb") as file:
+        written = file.read()
+    written_plain, written_zipped = plain_and_zipped(written)
+    plain, zipped = plain_and_zipped(memory.getvalue())
+    timestamps = re.compile(rb"<14>\w{3} [ \d]\d \d\d:\d\d:\d\d ")
+    assert timestamps.sub(b"", written_plain) == timestamps.sub(b"", plain)
+    assert written_zipped == zipped
+
+    # Appended by the next connections
+    con = Sender(config=SenderConfigFile(path=path))
+    con.send_raw(b"appended\n")
+    con.close()
+    with open(path, "rb") as file:
+        assert file.read() == written + b"appended\n"
+
+
+def test_null_transport(setup):
+    config = SenderConfigNull()
+    con = Sender(config=config)
+    con.send_many(setup.my_app, setup.msgs, zip=True)
+    con.flush_buffer()
+    con.close()
+    assert config.bytes == con.zipped_bytes > 0
+    assert config.writes >= 1
+
+    # The configuration can be sent to other processes
+    copy = pickle.loads(pickle.dumps(config))
+    assert copy.bytes == config.bytes
+    assert copy.lock is not config.lock
+
+
+def test_unix_transport(setup):
+    path = os.path.join(setup.path, "relay.sock")
+    server = CollectorServer(path=path)
+    con = Sender(config=SenderConfigUnix(path=path))
+    try:
+        con.send(tag=setup.my_app, msg=b"unix event")
+        con.send_many(setup.my_app, setup.msgs[:10])
+    finally:
+        con.close()
+        server.close_server()
+
+    events = server.wait_for(11 * 40).splitlines()
+    assert [event.split(b": ", 1)[1] for event in events] == [b"unix event"] + setup.msgs[:10]
+
+
+def test_unix_transport_not_available(setup):
+    with pytest.raises(DevoSenderException) as error:
+        Sender(config=SenderConfigUnix(path=os.path.join(setup.path, "missing.sock")))
+    assert "UNIX" in str(error.value)
+
+
+def test_async_unix_transport(setup):
+    path = os.path.join(setup.path, "async.sock")
+    server = CollectorServer(path=path)
+
+    async def scenario():
+        async with AsyncSender(SenderConfigUnix(path=path)) as con:
+            await con.send(tag=setup.my_app, msg=b"async unix event")
+
+    try:
+        asyncio.run(scenario())
+        assert server.wait_for(20).endswith(b": async unix event\n")
+    finally:
+        server.close_server()
+
+
+def test_async_sink_not_supported(setup):
+    async def scenario():
+        con = AsyncSender(SenderConfigNull())
+        await con.connect()
+
+    with pytest.raises(DevoSenderException):
+        asyncio.run(scenario())
+
+
+def test_transports_from_dict(setup):
+    path = os.path.join(setup.path, "dict.log")
+    assert isinstance(Sender._from_dict({"type": "NULL"}), SenderConfigNull)
+    config = Sender._from_dict({"type": "FILE", "address": path, "port": 443})
+    assert isinstance(config, SenderConfigFile)
+    assert config.address == path
+    config = Sender._from_dict({"address": "/run/relay.sock"}, con_type="UNIX")
+    assert isinstance(config, SenderConfigUnix)
+    assert config.address == "/run/relay.sock"
+
+
+def test_custom_transport(setup):
+
+    class ListSink(Sink):
+        def __init__(self, writes):
+            super().__init__()
+            self.writes = writes
+
+        def _write(self, data):
+            self.writes.append(bytes(data))
+            return len(data)
+
+    class ListTransport(SenderTransport):
+        name = "LIST"
+
+        def __init__(self):
+            self.writes = []
+
+        def connect(self, address, timeout, logger=None):
+            return ListSink(self.writes)
+
+    config = ListTransport()
+    con = Sender(config=config)
+    con.send(tag=setup.my_app, msg=b"custom event")
+    con.close()
+    assert len(config.writes) == 1 and config.writes[0].endswith(b": custom event\n")
+
+
+def test_transport_without_connect(setup):
+
+    class Incomplete(SenderTransport):
+        name = "INCOMPLETE"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_sink_rotation(setup):
+    config = SenderConfigMemory()
+    con = Sender(config=config, inactivity_timeout=60)
+    con.socket_max_connection = 1000
+    try:
+        assert con.connection_rotation(lead=0.5)
+        con.send(tag=setup.my_app, msg=b"first")
+        first = con.socket
+        time.sleep(1.1)
+        con.send(tag=setup.my_app, msg=b"second")
+        assert con.socket is not first
+    finally:
+        con.close()
+    assert [event.split(b": ", 1)[1] for event in config.getvalue().splitlines()] == [
+        b"first",
+        b"second",
+    ]
+
+
+if __name__ == "__main__":
+    pytest.main()
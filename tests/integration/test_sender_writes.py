@@ -0,0 +1,73 @@
+import gzip
+import os
+import socket
+
+import pytest
+from local_servers import CollectorServer
+
+from devo.sender import DevoSenderException, Sender, SenderConfigTCP
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.my_app = b"test.drop.free"
+    yield setup
+
+
+@pytest.mark.parametrize("max_write_size", [None, 1000, 1024 * 1024])
+def test_big_multiline_event(setup, max_write_size):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address), max_write_size=max_write_size)
+    event = b"\n".join(os.urandom(64).hex().encode() for _ in range(40000))
+    try:
+        assert con.send(tag=setup.my_app, msg=event, multiline=True) == 1
+    finally:
+        con.close()
+        server.close_server()
+
+    received = server.wait_for(len(event))
+    length, _, record = received.partition(b" ")
+    assert int(length) == len(record)
+    assert record.endswith(event + b"\n")
+
+
+def test_big_zip_frame(setup):
+    server = CollectorServer()
+    con = Sender(config=SenderConfigTCP(address=server.address), max_write_size=4096)
+    con.buffer_size(size=10 * 1024 * 1024)
+    try:
+        for index in range(20000):
+            msg = b"%d %s" % (index, os.urandom(32).hex().encode())
+            con.send(tag=setup.my_app, msg=msg, zip=True)
+        assert con.flush_buffer() == 20000
+    finally:
+        con.close()
+        server.close_server()
+
+    received = server.wait_for(1)
+    assert len(gzip.decompress(received).splitlines()) == 20000
+
+
+def test_partial_write_timeout_disconnects(setup):
+    # The connections are accepted by the kernel but nothing is ever read
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    con = Sender(config=SenderConfigTCP(address=listener.getsockname()), timeout=0.5)
+    try:
+        with pytest.raises(DevoSenderException):
+            con.send(tag=setup.my_app, msg=os.urandom(32 * 1024 * 1024).hex().encode())
+        # Part of the event was written, the connection cannot be used again
+        assert con.socket is None
+    finally:
+        con.close()
+        listener.close()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,67 @@
+import pytest
+
+from devo.sender.adaptive import ZipAutotuner, ZipSample
+
+
+def _observe(autotuner, sample, length, level):
+    for _ in range(autotuner.window):
+        result = autotuner.observe(sample, length, level)
+    return result
+
+
+def test_autotune_waits_for_window():
+    autotuner = ZipAutotuner(latency_target=1.0, window=3)
+    sample = ZipSample(10, 1000, 100, 5.0, 0.01, 0.01)
+    assert autotuner.observe(sample, 20000, 6) == (20000, 6)
+    assert autotuner.observe(sample, 20000, 6) == (20000, 6)
+    assert autotuner.observe(sample, 20000, 6) != (20000, 6)
+
+
+def test_autotune_latency_over_target():
+    autotuner = ZipAutotuner(latency_target=1.0, min_length=8000, window=2)
+    sample = ZipSample(10, 10000, 1000, 4.0, 0.001, 0.001)
+    length, _ = _observe(autotuner, sample, 20000, 6)
+    assert length == 10000
+    length, _ = _observe(autotuner, sample, length, 6)
+    assert length == 8000
+    assert len(autotuner.decisions) == 2
+
+
+def test_autotune_latency_under_target():
+    autotuner = ZipAutotuner(latency_target=1.0, max_length=25000, window=1)
+    sample = ZipSample(10, 10000, 1000, 0.1, 0.001, 0.001)
+    assert autotuner.observe(sample, 10000, 6)[0] == 15000
+    assert autotuner.observe(sample, 15000, 6)[0] == 22500
+    assert autotuner.observe(sample, 22500, 6)[0] == 25000
+
+
+def test_autotune_level():
+    autotuner = ZipAutotuner(latency_target=1.0, min_level=2, max_level=7, window=1)
+    slow_write = ZipSample(10, 10000, 1000, 0.6, 0.001, 0.1)
+    assert autotuner.observe(slow_write, 10000, 7) == (10000, 7)
+    assert autotuner.observe(slow_write, 10000, -1) == (10000, 7)
+    slow_compression = ZipSample(10, 10000, 1000, 0.6, 0.1, 0.001)
+    assert autotuner.observe(slow_compression, 10000, 3) == (10000, 2)
+    assert autotuner.observe(slow_compression, 10000, 2) == (10000, 2)
+    random_data = ZipSample(10, 10000, 9950, 0.6, 0.001, 0.1)
+    assert autotuner.observe(random_data, 10000, 5) == (10000, 4)
+
+
+def test_autotune_backlog():
+    autotuner = ZipAutotuner(latency_target=1.0, window=1, inflight=2)
+    sample = ZipSample(10, 10000, 1000, 0.6, 0.001, 0.1, queue_depth=2)
+    assert autotuner.observe(sample, 10000, 6) == (10000, 5)
+    assert "waiting" in autotuner.decisions[-1]["reasons"][0]
+
+
+def test_autotune_wrong_limits():
+    with pytest.raises(ValueError):
+        ZipAutotuner(latency_target=0)
+    with pytest.raises(ValueError):
+        ZipAutotuner(min_length=10, max_length=5)
+    with pytest.raises(ValueError):
+        ZipAutotuner(min_level=5, max_level=10)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,106 @@
+import gzip
+import zlib
+
+import pytest
+
+from devo.sender.compression import ParallelZipBatch
+from devo.sender.data import SenderBuffer, ZipBatch
+
+
+def test_zip_batch_is_a_valid_gzip_member():
+    batch = ZipBatch()
+    events = [b"<14>Jan  1 00:00:00 host my.app: event %d\n" % i for i in range(1000)]
+    for event in events:
+        batch.add(event)
+
+    assert batch.raw_length == sum(len(event) for event in events)
+    assert batch.text == b"".join(events)
+    assert zlib.decompress(batch.finish(), 31) == b"".join(events)
+
+
+def test_buffer_counts_compressed_bytes():
+    buffer = SenderBuffer()
+    event = b"<14>Jan  1 00:00:00 host my.app: %s\n"
+    for i in range(20000):
+        buffer.add(event % (str(i).encode() * 10))
+        buffer.events += 1
+
+    assert 0 < buffer.compressed_length < buffer.raw_length
+    record = buffer.take()
+    assert buffer.raw_length == 0
+    assert buffer.compressed_length == 0
+    assert zlib.decompress(record, 31).count(b"\n") == 20000
+
+
+def test_buffer_text_buffer_roundtrip():
+    buffer = SenderBuffer()
+    buffer.add(b"first\n")
+    buffer.add(b"second\n")
+    assert buffer.text_buffer == b"first\nsecond\n"
+
+    buffer.text_buffer = b"recovered\n"
+    assert buffer.text_buffer == b"recovered\n"
+    assert zlib.decompress(buffer.take(), 31) == b"recovered\n"
+
+
+def test_buffer_clear():
+    buffer = SenderBuffer()
+    buffer.add(b"event\n")
+    buffer.events += 1
+    buffer.clear()
+    assert buffer.events == 0
+    assert buffer.text_buffer == b""
+
+
+def test_buffer_compression_level():
+    buffer = SenderBuffer()
+    buffer.compression_level = 9
+    buffer.add(b"event\n" * 100)
+    assert buffer.compression_level == 9
+    assert zlib.decompress(buffer.take(), 31) == b"event\n" * 100
+    with pytest.raises(ValueError):
+        buffer.compression_level = 42
+    assert buffer.compression_level == 9
+
+
+def test_parallel_zip_batch_members():
+    batch = ParallelZipBatch(compression_level=9, workers=4, chunk_size=4096)
+    events = [b"<14>Jan  1 00:00:00 host my.app: event %d\n" % i for i in range(5000)]
+    for event in events:
+        batch.add(event)
+
+    assert batch.raw_length == sum(len(event) for event in events)
+    assert batch.text == b"".join(events)
+    members = batch.members()
+    assert len(members) > 10
+    # Every member is a complete gzip member, split at event boundaries
+    for member in members:
+        assert zlib.decompress(member, 31).endswith(b"\n")
+    assert gzip.decompress(b"".join(members)) == b"".join(events)
+    assert batch.length <= sum(len(member) for member in members)
+
+
+def test_parallel_zip_batch_empty():
+    assert gzip.decompress(ParallelZipBatch(workers=2).finish()) == b""
+
+
+def test_buffer_parallel():
+    buffer = SenderBuffer()
+    buffer.parallel(workers=2, chunk_size=1024)
+    assert buffer.compression_workers == 2
+    for i in range(2000):
+        buffer.add(b"event %d\n" % i)
+    assert buffer.compressed_length > 0
+    batch = buffer.swap()
+    assert isinstance(batch, ParallelZipBatch)
+    assert gzip.decompress(batch.finish()).count(b"\n") == 2000
+
+    buffer.parallel(workers=0)
+    assert isinstance(buffer.swap(), ZipBatch)
+    with pytest.raises(ValueError):
+        buffer.parallel(workers=2, chunk_size=0)
+
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,84 @@
+import gzip
+import os
+import random
+import tempfile
+
+import pytest
+
+from devo.sender.bulk import LineRange, find_files, plan_shards
+from devo.sender.data import DevoSenderException
+from devo.sender.files import read_lines
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.directory = tempfile.TemporaryDirectory()
+    setup.path = setup.directory.name
+    setup.lines = [b"line %d %s" % (index, b"x" * (index % 97)) for index in range(2000)]
+
+    setup.plain = os.path.join(setup.path, "events.log")
+    with open(setup.plain, "wb") as file:
+        file.write(b"\n".join(setup.lines) + b"\n")
+    setup.unterminated = os.path.join(setup.path, "unterminated.log")
+    with open(setup.unterminated, "wb") as file:
+        file.write(b"\r\n".join(setup.lines))
+    os.mkdir(os.path.join(setup.path, "archive"))
+    setup.gzip = os.path.join(setup.path, "archive", "events.log.gz")
+    with gzip.open(setup.gzip, "wb") as file:
+        file.write(b"\n".join(setup.lines) + b"\n")
+    yield setup
+    setup.directory.cleanup()
+
+
+def read_range(path, start, end, chunk_size=64):
+    with open(path, "rb") as file:
+        return [line for lines in read_lines(LineRange(file, start, end), chunk_size) for line in lines]
+
+
+@pytest.mark.parametrize("name", ["plain", "unterminated"])
+def test_ranges_read_every_line_once(setup, name):
+    path = getattr(setup, name)
+    size = os.path.getsize(path)
+    rng = random.Random(7)
+    for _ in range(20):
+        offsets = sorted({0, size} | {rng.randrange(size) for _ in range(rng.randrange(1, 30))})
+        lines = []
+        for start, end in zip(offsets, offsets[1:]):
+            lines += read_range(path, start, end)
+        assert lines == setup.lines
+
+
+def test_range_on_line_boundaries(setup):
+    first = len(setup.lines[0]) + 1
+    assert read_range(setup.plain, 0, first) == setup.lines[:1]
+    assert read_range(setup.plain, first, first + 1) == setup.lines[1:2]
+    # A range inside a line reads nothing: the line is of the previous range
+    assert read_range(setup.plain, 1, first) == []
+
+
+def test_plan_shards(setup):
+    size = os.path.getsize(setup.plain)
+    shards = plan_shards([setup.plain, setup.gzip], shard_size=10000)
+    plain = [shard for shard in shards if shard.path == setup.plain]
+    assert len(plain) == -(-size // 10000)
+    assert plain[0].start == 0 and plain[-1].end == size
+    assert all(left.end == right.start for left, right in zip(plain, plain[1:]))
+    # Gzip files are not split
+    assert [(shard.start, shard.end) for shard in shards if shard.path == setup.gzip] == [(0, None)]
+    assert len(plan_shards([setup.plain], shard_size=None)) == 1
+
+
+def test_find_files(setup):
+    assert find_files([setup.path]) == sorted([setup.plain, setup.unterminated, setup.gzip])
+    assert find_files([os.path.join(setup.path, "**", "*.gz"), setup.gzip]) == [setup.gzip]
+    with pytest.raises(DevoSenderException):
+        find_files([os.path.join(setup.path, "*.missing")])
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,66 @@
+import time
+from unittest import mock
+
+import pytest
+
+from devo.sender.data import Sender, SenderChannel, local_hostname
+
+
+def _sender():
+    sender = mock.Mock()
+    sender.send_raw.return_value = 1
+    sender.send_raw_many.side_effect = lambda records, multiline=False: len(records)
+    sender.fill_buffer.return_value = 0
+    return sender
+
+
+def test_channel_header():
+    channel = SenderChannel(_sender(), "my.app", hostname="my-pc", severity=3)
+    assert channel.header == b"<11>Jan  1 00:00:00 my-pc my.app: "
+    assert channel.header == Sender.compose_mem(b"my.app", hostname=b"my-pc", severity=3, bytes=True)
+
+
+def test_channel_default_hostname():
+    channel = SenderChannel(_sender(), b"my.app")
+    assert channel.hostname == local_hostname(bytes=True)
+
+
+def test_channel_send():
+    sender = _sender()
+    channel = SenderChannel(sender, "my.app", hostname="my-pc")
+    assert channel.send("10 €") == 1
+    sender.send_raw.assert_called_once_with(
+        b"<14>Jan  1 00:00:00 my-pc my.app: 10 \xe2\x82\xac\n", multiline=False
+    )
+    channel.send(b"zipped", zip=True)
+    sender.fill_buffer.assert_called_once_with(b"<14>Jan  1 00:00:00 my-pc my.app: zipped\n")
+
+
+def test_channel_send_many():
+    sender = _sender()
+    channel = SenderChannel(sender, "my.app", hostname="my-pc")
+    assert channel.send_many([b"one\n", "two"]) == 2
+    sender.send_raw_many.assert_called_once_with(
+        [b"<14>Jan  1 00:00:00 my-pc my.app: one\n", b"<14>Jan  1 00:00:00 my-pc my.app: two\n"],
+        multiline=False,
+    )
+
+
+def test_channel_timestamp():
+    channel = SenderChannel(_sender(), "my.app", hostname="my-pc", timestamp=True)
+    with mock.patch("devo.sender.data.time.time", return_value=1718288971.75):
+        header = channel.header
+        assert channel.header is header
+    assert header == b"<14>%s my-pc my.app: " % SenderChannel.rfc3164_date(1718288971)
+    assert header[4:7] == time.strftime("%b", time.localtime(1718288971)).encode()
+    with mock.patch("devo.sender.data.time.time", return_value=1718288972.1):
+        assert channel.header != header
+
+
+def test_rfc3164_date_pads_day_with_space():
+    seconds = time.mktime((2024, 1, 5, 3, 4, 5, 0, 0, -1))
+    assert SenderChannel.rfc3164_date(seconds) == b"Jan  5 03:04:05"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
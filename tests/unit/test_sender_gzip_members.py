@@ -0,0 +1,64 @@
+import gzip
+import io
+import os
+
+import pytest
+
+from devo.sender import DevoSenderException
+from devo.sender.files import GzipMemberReader, is_syslog_framed
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.events = [
+        b"<14>Jan  1 00:00:00 host my.app.test: event %d %s\n" % (index, os.urandom(16).hex().encode())
+        for index in range(3000)
+    ]
+    setup.members = [
+        gzip.compress(b"".join(setup.events[start:start + 1000])) for start in (0, 1000, 2000)
+    ]
+    yield setup
+
+
+def read_members(data, chunk_size):
+    reader = GzipMemberReader(io.BytesIO(data), chunk_size)
+    return reader, [b"".join(member) for member in reader]
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1000, 1024 * 1024])
+def test_members_as_they_are(setup, chunk_size):
+    reader, members = read_members(b"".join(setup.members), chunk_size)
+    assert members == setup.members
+    assert reader.members == 3
+    assert reader.events == 3000
+
+
+def test_zero_padding(setup):
+    reader, members = read_members(setup.members[0] + b"\x00" * 512, 100)
+    assert members == setup.members[:1]
+    assert reader.events == 1000
+
+
+def test_truncated_member(setup):
+    with pytest.raises(DevoSenderException):
+        read_members(setup.members[0][:-20], 100)
+
+
+def test_corrupt_member(setup):
+    with pytest.raises(DevoSenderException):
+        read_members(setup.members[0][:30] + b"not deflate" * 10, 100)
+
+
+def test_syslog_framed():
+    assert is_syslog_framed(b"<14>Jan  1 00:00:00 host my.app.test: event")
+    assert not is_syslog_framed(b"2026-01-01 00:00:00 INFO event")
+    assert not is_syslog_framed(b"")
+
+
+if __name__ == "__main__":
+    pytest.main()
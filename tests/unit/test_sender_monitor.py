@@ -0,0 +1,78 @@
+import selectors
+import socket
+import time
+
+import pytest
+
+from devo.sender.monitor import ConnectionMonitor, wait_for_socket
+
+
+def _wait_triggered(watch, timeout=2.0):
+    then = time.time()
+    while not watch.triggered and time.time() - then < timeout:
+        time.sleep(0.01)
+    return watch.triggered
+
+
+def test_monitor_is_shared():
+    assert ConnectionMonitor.get() is ConnectionMonitor.get()
+
+
+def test_monitor_flags_eof():
+    local, remote = socket.socketpair()
+    monitor = ConnectionMonitor.get()
+    watch = monitor.watch(local)
+    time.sleep(0.05)
+    assert not watch.triggered
+    remote.close()
+    assert _wait_triggered(watch)
+    monitor.unwatch(watch)
+    local.close()
+
+
+def test_monitor_rearm():
+    local, remote = socket.socketpair()
+    monitor = ConnectionMonitor.get()
+    watch = monitor.watch(local)
+    remote.send(b"data")
+    assert _wait_triggered(watch)
+    assert local.recv(10) == b"data"
+    monitor.rearm(watch)
+    assert not watch.triggered
+    time.sleep(0.05)
+    assert not watch.triggered
+    remote.send(b"more")
+    assert _wait_triggered(watch)
+    monitor.unwatch(watch)
+    local.close()
+    remote.close()
+
+
+def test_monitor_replaces_stale_watch():
+    local, remote = socket.socketpair()
+    monitor = ConnectionMonitor.get()
+    stale = monitor.watch(local)
+    fileno = local.fileno()
+    # Closed without unwatching it, the descriptor number is reused
+    local.close()
+    reused = socket.socket()
+    if reused.fileno() == fileno:
+        watch = monitor.watch(reused)
+        assert stale.triggered
+        monitor.unwatch(watch)
+    reused.close()
+    remote.close()
+
+
+def test_wait_for_socket():
+    local, remote = socket.socketpair()
+    assert wait_for_socket(local, selectors.EVENT_WRITE, 0)
+    assert not wait_for_socket(local, selectors.EVENT_READ, 0)
+    remote.send(b"data")
+    assert wait_for_socket(local, selectors.EVENT_READ, 1)
+    local.close()
+    remote.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
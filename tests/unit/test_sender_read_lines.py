@@ -0,0 +1,49 @@
+import io
+
+import pytest
+
+from devo.sender.files import read_lines
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.lines = [b"line %d %s" % (index, b"x" * (index % 17)) for index in range(1000)]
+    yield setup
+
+
+def collect(data, chunk_size):
+    return [line for lines in read_lines(io.BytesIO(data), chunk_size) for line in lines]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64, 1024 * 1024])
+def test_lines(setup, chunk_size):
+    assert collect(b"\n".join(setup.lines) + b"\n", chunk_size) == setup.lines
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64, 1024 * 1024])
+def test_crlf_lines(setup, chunk_size):
+    assert collect(b"\r\n".join(setup.lines) + b"\r\n", chunk_size) == setup.lines
+
+
+def test_last_line_without_break(setup):
+    assert collect(b"\n".join(setup.lines), 64) == setup.lines
+    assert collect(b"one\ntwo\r", 64) == [b"one", b"two"]
+
+
+def test_empty_lines_kept():
+    assert collect(b"one\n\ntwo\n", 3) == [b"one", b"", b"two"]
+    assert collect(b"", 3) == []
+
+
+def test_batches_per_read():
+    batches = list(read_lines(io.BytesIO(b"a\nb\nc\nd\n"), 4))
+    assert batches == [[b"a", b"b"], [b"c", b"d"]]
+
+
+if __name__ == "__main__":
+    pytest.main()
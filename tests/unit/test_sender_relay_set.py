@@ -0,0 +1,147 @@
+import pickle
+import socket
+
+import pytest
+
+from devo.sender import DevoSenderException, RelaySet, Sender, SenderConfigTCP
+from devo.sender.relays import CircuitState
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.addresses = [("relay-1", 443), ("relay-2", 443), ("relay-3", 443)]
+    yield setup
+
+
+def test_relays_keep_configured_order(setup):
+    relays = RelaySet(setup.addresses, probe_interval=None)
+    assert [endpoint.address for endpoint in relays.candidates()] == setup.addresses
+
+
+def test_relays_prefer_lower_latency(setup):
+    relays = RelaySet(setup.addresses, probe_interval=None)
+    first, second, third = relays.endpoints
+    relays.record_success(first, 0.05)
+    relays.record_success(second, 0.01)
+    relays.record_success(third, 0.02)
+    assert relays.candidates() == [second, third, first]
+
+    relays.record_success(second, 0.5)
+    assert relays.candidates()[0] is third
+
+
+def test_relays_probe_latency_apart(setup):
+    relays = RelaySet(setup.addresses, probe_interval=None)
+    first, second, third = relays.endpoints
+    relays.record_success(first, 0.05)
+    second.probed(0.001, relays.smoothing)
+    third.probed(0.0001, relays.smoothing)
+    # The connected endpoint goes first, a fast probe without handshake
+    # does not beat it
+    assert relays.candidates() == [first, third, second]
+
+    first.probed(0.0001, relays.smoothing)
+    assert first.latency == 0.05
+    assert relays.stats[0]["probe_latency"] == 0.0001
+
+
+def test_relays_circuit_breaker(setup):
+    relays = RelaySet(setup.addresses, failure_threshold=2, reset_timeout=60, probe_interval=None)
+    first = relays.endpoints[0]
+    error = OSError("refused")
+
+    relays.record_failure(first, error)
+    assert first.state == CircuitState.CLOSED
+    assert first in relays.candidates()
+
+    relays.record_failure(first, error)
+    assert first.state == CircuitState.OPEN
+    assert first not in relays.candidates()
+
+    # After the reset timeout a single trial is allowed, and one failure
+    # opens the circuit again
+    first.opened_at -= 60
+    assert relays.candidates()[-1] is first
+    assert first.state == CircuitState.HALF_OPEN
+    relays.record_failure(first, error)
+    assert first.state == CircuitState.OPEN
+
+    relays.record_success(first, 0.01)
+    assert first.state == CircuitState.CLOSED
+    assert first.failures == 0
+
+
+def test_relays_all_open(setup):
+    relays = RelaySet(setup.addresses, failure_threshold=1, reset_timeout=60, probe_interval=None)
+    for endpoint in relays.endpoints:
+        relays.record_failure(endpoint, OSError("refused"))
+    # There is always something to try, the one opened first goes first
+    assert relays.candidates() == relays.endpoints
+
+
+def test_relays_probe(setup):
+    server = socket.create_server(("127.0.0.1", 0))
+    address = server.getsockname()
+    relays = RelaySet([address, ("127.0.0.1", 1)], failure_threshold=1, probe_interval=None)
+    try:
+        alive, closed = relays.endpoints
+        relays.record_failure(alive, OSError("refused"))
+        assert alive.state == CircuitState.OPEN
+
+        assert relays.probe(alive)
+        assert alive.state == CircuitState.CLOSED
+        # The probe does not measure what the connections do
+        assert alive.latency is None
+        assert alive.probe_latency is not None
+
+        assert not relays.probe(closed)
+        assert closed.state == CircuitState.OPEN
+    finally:
+        server.close()
+
+
+def test_config_with_relays(setup):
+    config = SenderConfigTCP(address=setup.addresses)
+    assert config.address == setup.addresses[0]
+    assert len(config.relays) == 3
+
+    config = SenderConfigTCP(address=setup.addresses[0])
+    assert config.relays is None
+
+    with pytest.raises(DevoSenderException):
+        SenderConfigTCP(address=["relay-1"])
+    with pytest.raises(DevoSenderException):
+        SenderConfigTCP(address=[])
+
+
+def test_config_from_dict_with_relays(setup):
+    config = Sender._from_dict(
+        {"address": ["relay-1", "relay-2:8443", ["relay-3", 444]], "port": 443}, con_type="TCP"
+    )
+    assert [endpoint.address for endpoint in config.relays.endpoints] == [
+        ("relay-1", 443),
+        ("relay-2", 8443),
+        ("relay-3", 444),
+    ]
+
+    config = Sender._from_dict({"address": ["relay-1", 443]}, con_type="TCP")
+    assert config.address == ("relay-1", 443)
+    assert config.relays is None
+
+
+def test_relay_set_pickle():
+    relays = RelaySet([("relay-1", 443), ("relay-2", 443)])
+    relays.record_success(relays.endpoints[1], 0.1)
+    copy = pickle.loads(pickle.dumps(SenderConfigTCP(address=relays))).relays
+    assert copy.stats == relays.stats
+    copy.start()
+    copy.stop()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,143 @@
+import os
+import tempfile
+import threading
+from unittest import mock
+
+import pytest
+
+from devo.sender import FsyncPolicy, Spool
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.temp_dir = tempfile.TemporaryDirectory()
+    setup.counter = 0
+    setup.record = b"<14>Jan  1 00:00:00 localhost test.keep.free: event\n"
+    yield setup
+
+    setup.temp_dir.cleanup()
+
+
+def _path(setup):
+    setup.counter += 1
+    return os.path.join(setup.temp_dir.name, "spool-%d" % setup.counter)
+
+
+def _segments(path):
+    return sorted(name for name in os.listdir(path) if name.endswith(".seg"))
+
+
+def test_spool_read_and_commit(setup):
+    spool = Spool(_path(setup))
+    spool.append(setup.record)
+    spool.append_many([setup.record, b"zipped"], zip=True)
+    spool.append("multiline\nevent", multiline=True)
+    assert spool.pending > 0
+
+    records = spool.read(timeout=0)
+    assert [record.payload for record in records] == [
+        setup.record, setup.record, b"zipped", b"multiline\nevent"
+    ]
+    assert [(record.zip, record.multiline) for record in records] == [
+        (False, False), (True, False), (True, False), (False, True)
+    ]
+
+    # Not committed records are read again
+    spool.commit(records[1].position)
+    assert [record.payload for record in spool.read(timeout=0)] == [
+        b"zipped", b"multiline\nevent"
+    ]
+    spool.commit(records[-1].position)
+    assert spool.pending == 0
+    assert spool.read(timeout=0) == []
+    assert spool.wait_empty(timeout=0)
+    spool.close()
+
+
+def test_spool_replay_after_restart(setup):
+    path = _path(setup)
+    spool = Spool(path, fsync=FsyncPolicy.INTERVAL)
+    spool.append_many([b"one", b"two", b"three"])
+    spool.commit(spool.read(max_bytes=1, timeout=0)[0].position)
+    spool.close()
+
+    spool = Spool(path)
+    assert [record.payload for record in spool.read(timeout=0)] == [b"two", b"three"]
+    spool.close()
+
+
+def test_spool_discards_incomplete_record(setup):
+    path = _path(setup)
+    spool = Spool(path)
+    spool.append_many([b"one", b"two"])
+    spool.close()
+    segment = os.path.join(path, _segments(path)[-1])
+    with open(segment, "ab") as file:
+        file.write(b"\x10\x00\x00\x00torn")
+
+    spool = Spool(path)
+    assert [record.payload for record in spool.read(timeout=0)] == [b"one", b"two"]
+    spool.append(b"three")
+    assert [record.payload for record in spool.read(timeout=0)][-1] == b"three"
+    spool.close()
+
+
+def test_spool_segments_and_max_bytes(setup):
+    path = _path(setup)
+    spool = Spool(path, segment_size=1000, max_bytes=4000, fsync=FsyncPolicy.NONE)
+    for _ in range(20):
+        spool.append(b"x" * 491)
+    # Two records of 500 bytes (header included) per segment
+    assert spool.size <= 4000
+    assert len(_segments(path)) == 4
+    assert spool.dropped_bytes == 6000
+    assert len(spool.read(max_bytes=10 ** 6, timeout=0)) == 8
+
+    # Committed segments are deleted
+    records = spool.read(max_bytes=10 ** 6, timeout=0)
+    spool.commit(records[-1].position)
+    assert len(_segments(path)) == 1
+    assert spool.pending == 0
+    spool.close()
+
+
+def test_spool_default_fsync_interval(setup):
+    spool = Spool(_path(setup))
+    assert spool.fsync == FsyncPolicy.INTERVAL
+    with mock.patch("devo.sender.spool.os.fsync") as fsync:
+        for _ in range(100):
+            spool.append(setup.record)
+        assert fsync.call_count <= 1
+        spool.sync()
+        assert fsync.call_count >= 1
+    spool.close()
+
+
+def test_spool_read_while_appending(setup):
+    spool = Spool(_path(setup), segment_size=1000, fsync=FsyncPolicy.NONE)
+
+    def append():
+        for index in range(500):
+            spool.append(b"%d" % index)
+
+    thread = threading.Thread(target=append)
+    thread.start()
+    payloads = []
+    while len(payloads) < 500:
+        records = spool.read(max_bytes=100, timeout=5)
+        assert records
+        payloads.extend(record.payload for record in records)
+        spool.commit(records[-1].position)
+    thread.join()
+    assert payloads == [b"%d" % index for index in range(500)]
+    assert spool.pending == 0
+    spool.close()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import pytest
+
+from devo.sender.tail import TailCheckpoint
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup():
+
+    class Fixture:
+        pass
+
+    setup = Fixture()
+    setup.directory = tempfile.TemporaryDirectory()
+    setup.path = setup.directory.name
+    yield setup
+    setup.directory.cleanup()
+
+
+def test_checkpoint_saved_and_loaded(setup):
+    path = os.path.join(setup.path, "saved.json")
+    checkpoint = TailCheckpoint(path)
+    assert checkpoint.files == {}
+    checkpoint.files["/var/log/app.log"] = (2049, 1234, 5678)
+    checkpoint.save()
+    assert TailCheckpoint(path).files == {"/var/log/app.log": (2049, 1234, 5678)}
+    # Replaced atomically, no temporary file is left
+    assert os.listdir(setup.path) == ["saved.json"]
+
+
+def test_corrupt_checkpoint_ignored(setup):
+    path = os.path.join(setup.path, "corrupt.json")
+    with open(path, "w") as file:
+        file.write('{"files": {"/var/log/app.log": {"inode": ')
+    assert TailCheckpoint(path).files == {}
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from devo.sender.staging import ThreadStaging
+
+
+def test_staging_per_thread():
+    staging = ThreadStaging(size=10)
+    assert staging.add(b"one\n") == (False, True)
+    assert staging.add(b"two\n") == (False, False)
+
+    def other():
+        assert staging.add(b"three\n") == (False, True)
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    thread.join()
+    assert staging.threads == 2
+    assert staging.pending == 3
+    assert staging.take() == [b"one\n", b"two\n"]
+    assert staging.pending == 1
+
+
+def test_staging_full():
+    staging = ThreadStaging(size=10)
+    assert staging.add(b"12345\n") == (False, True)
+    assert staging.add(b"12345\n") == (True, False)
+    assert staging.take() == [b"12345\n", b"12345\n"]
+    assert staging.add(b"1\n") == (False, True)
+
+
+def test_staging_drain_finished_threads():
+    staging = ThreadStaging()
+    threads = [
+        threading.Thread(target=staging.add, args=(b"event %d\n" % index,))
+        for index in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    staging.add(b"main\n")
+    assert sorted(staging.drain()) == sorted([b"event %d\n" % index for index in range(5)] + [b"main\n"])
+    assert staging.threads == 1
+    assert staging.pending == 0
+
+
+def test_staging_wrong_size():
+    with pytest.raises(ValueError):
+        ThreadStaging(size=0)
+
+
+if __name__ == "__main__":
+    pytest.main()
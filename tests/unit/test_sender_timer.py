@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from devo.sender.timer import DeadlineTimer, shared_timer
+
+
+def test_timer_runs_in_deadline_order():
+    timer = DeadlineTimer()
+    calls = []
+    done = threading.Event()
+    timer.schedule(0.06, lambda: calls.append(3) or done.set())
+    timer.schedule(0.02, lambda: calls.append(1))
+    timer.schedule(0.04, lambda: calls.append(2))
+    assert done.wait(2)
+    assert calls == [1, 2, 3]
+
+
+def test_timer_sub_second_precision():
+    timer = DeadlineTimer()
+    fired = []
+    done = threading.Event()
+    start = time.monotonic()
+    timer.schedule(0.05, lambda: fired.append(time.monotonic() - start) or done.set())
+    assert done.wait(2)
+    assert 0.05 <= fired[0] < 0.5
+
+
+def test_timer_cancel():
+    timer = DeadlineTimer()
+    calls = []
+    handle = timer.schedule(0.02, lambda: calls.append(1))
+    timer.cancel(handle)
+    timer.cancel(handle)
+    timer.cancel(None)
+    assert len(timer) == 0
+    time.sleep(0.1)
+    assert calls == []
+
+
+def test_timer_cancel_many():
+    timer = DeadlineTimer()
+    handles = [timer.schedule(60, lambda: None) for _ in range(200)]
+    for handle in handles[:150]:
+        timer.cancel(handle)
+    assert len(timer) == 50
+
+
+def test_timer_callback_error():
+    timer = DeadlineTimer()
+    done = threading.Event()
+
+    def fail():
+        raise ValueError("error")
+
+    timer.schedule(0, fail)
+    timer.schedule(0.01, done.set)
+    assert done.wait(2)
+
+
+def test_shared_timer():
+    assert shared_timer() is shared_timer()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,82 @@
+import threading
+import time
+import zlib
+
+import pytest
+
+from devo.sender.data import ZipBatch
+from devo.sender.pipeline import ZipPipeline
+
+
+def _batch(events):
+    batch = ZipBatch()
+    for index in range(events):
+        batch.add(b"event %d\n" % index)
+    return batch
+
+
+def test_pipeline_sends_in_order():
+    sent = []
+    pipeline = ZipPipeline(lambda batch, events: sent.append(batch.finish()), inflight=2)
+    for events in (1, 2, 3):
+        pipeline.submit(_batch(events), events)
+    pipeline.join()
+    assert [zlib.decompress(record, 31).count(b"\n") for record in sent] == [1, 2, 3]
+    assert pipeline.sent == 6
+    pipeline.stop()
+
+
+def test_pipeline_backpressure():
+    release = threading.Event()
+    pipeline = ZipPipeline(lambda batch, events: release.wait(), inflight=2)
+    pipeline.submit(_batch(1), 1)
+    pipeline.submit(_batch(1), 1)
+
+    submitted = threading.Event()
+
+    def producer():
+        pipeline.submit(_batch(1), 1)
+        submitted.set()
+
+    threading.Thread(target=producer, daemon=True).start()
+    # The third buffer waits until one of the two in flight is sent
+    assert not submitted.wait(0.2)
+    release.set()
+    assert submitted.wait(5)
+    pipeline.join()
+    assert pipeline.sent == 3
+    pipeline.stop()
+
+
+def test_pipeline_errors():
+    def send(batch, events):
+        raise ConnectionError("relay down")
+
+    pipeline = ZipPipeline(send, inflight=1)
+    pipeline.submit(_batch(5), 5)
+    pipeline.join()
+    assert pipeline.errors == 1
+    assert isinstance(pipeline.last_error, ConnectionError)
+    assert pipeline.sent == 0
+    pipeline.stop()
+
+
+def test_pipeline_stop_sends_pending():
+    sent = []
+
+    def send(batch, events):
+        time.sleep(0.05)
+        sent.append(batch.finish())
+
+    pipeline = ZipPipeline(send, inflight=3)
+    for _ in range(3):
+        pipeline.submit(_batch(1), 1)
+    pipeline.stop()
+    assert len(sent) == 3
+
+    with pytest.raises(ValueError):
+        ZipPipeline(send, inflight=0)
+
+
+if __name__ == "__main__":
+    pytest.main()